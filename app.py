@@ -1,17 +1,23 @@
+import time
+APP_START = time.perf_counter()
+
 import streamlit as st
 import sys
 from pathlib import Path
 import tempfile
 import os
 from PIL import Image
-import time
 
 # Agregar src al path
 sys.path.append(str(Path(__file__).parent / 'src'))
 
-from compliance_checker import EPPComplianceChecker
-from video_analyzer import VideoEPPAnalyzer
-from chatbot_final import ChatbotEPP
+# Solo módulos livianos al inicio; compliance_checker, video_analyzer y
+# chatbot_final (ultralytics/torch) se importan en el primer uso
+from metrics import METRICS
+from startup import ModelLoader
+from reports import render_streamlit
+from exporters import ResultExporter
+from history_store import HistoryStore
 
 # ============================================
 # CONFIGURACIÓN DE LA PÁGINA
@@ -129,12 +135,53 @@ if 'last_analysis' not in st.session_state:
     st.session_state.last_analysis = None
 if 'chat_history' not in st.session_state:
     st.session_state.chat_history = []
+if 'video_timeline' not in st.session_state:
+    st.session_state.video_timeline = None
+
+MODEL_PATH = 'runs/detect/train10/weights/best.pt'
+
+# Carga + calentamiento del modelo compartido, en segundo plano desde el arranque
+# (EPP_WARMUP=sync para bloquear hasta que esté listo, EPP_WARMUP=off para cargar al primer uso)
+@st.cache_resource
+def init_model_loader():
+    loader = ModelLoader(MODEL_PATH)
+    mode = os.environ.get('EPP_WARMUP', 'background')
+    if mode != 'off':
+        loader.start(background=(mode != 'sync'))
+    return loader
+
+def get_model():
+    return init_model_loader().get()
+
+# Historial compartido de análisis (SQLite)
+@st.cache_resource
+def init_history():
+    return HistoryStore('results/history.db')
+
+# Zonas de seguridad de la cámara (EPP_ZONES, EPP_CAMERA); None si no hay configuración
+@st.cache_resource
+def init_zones():
+    from safety_zones import load_zones
+    return load_zones(os.environ.get('EPP_ZONES', 'config/zones.json'), os.environ.get('EPP_CAMERA', 'default'))
 
 # Inicializar chatbot una sola vez
 @st.cache_resource
 def init_chatbot():
-    model_path = 'runs/detect/train10/weights/best.pt'
-    return ChatbotEPP(model_path)
+    from chatbot_final import ChatbotEPP
+    return ChatbotEPP(MODEL_PATH, history=init_history(), model=get_model())
+
+# Endpoint Prometheus opcional (EPP_METRICS_PORT=9108)
+@st.cache_resource
+def init_metrics_server():
+    port = os.environ.get('EPP_METRICS_PORT')
+    return METRICS.serve(port=int(port)) if port else None
+
+init_metrics_server()
+init_model_loader()
+
+# Tiempo de arranque del script (solo la primera ejecución del proceso)
+if 'startup_seconds' not in st.session_state:
+    st.session_state.startup_seconds = time.perf_counter() - APP_START
 
 # ============================================
 # HEADER
@@ -209,16 +256,16 @@ with tab1:
                     tmp_path = tmp_file.name
                 
                 # Analizar
-                checker = EPPComplianceChecker('runs/detect/train10/weights/best.pt')
+                from compliance_checker import EPPComplianceChecker
+                model = get_model()
+                checker = EPPComplianceChecker(MODEL_PATH, model=model, history=init_history(), zones=init_zones())
                 results = checker.detect_compliance(tmp_path)
                 
                 # Guardar en sesión
                 st.session_state.last_analysis = results
                 
-                # Obtener imagen con detecciones
-                from ultralytics import YOLO
-                model = YOLO('runs/detect/train10/weights/best.pt')
-                detection_results = model.predict(tmp_path, conf=0.25, save=False)
+                # Obtener imagen con detecciones (mismo modelo ya cargado)
+                detection_results = model.predict(tmp_path, conf=0.25, save=False, verbose=False)
                 annotated_image = detection_results[0].plot()
                 
                 # Mostrar resultado
@@ -233,38 +280,7 @@ with tab1:
             st.markdown("---")
             st.subheader("📊 Estadísticas de Cumplimiento")
             
-            col1, col2, col3, col4 = st.columns(4)
-            
-            with col1:
-                st.metric(
-                    "👥 Personas",
-                    results['total_persons'],
-                    help="Total de personas detectadas"
-                )
-            
-            with col2:
-                st.metric(
-                    "✅ Cumplimiento",
-                    results['summary']['compliant'],
-                    help="Personas que cumplen normativas"
-                )
-            
-            with col3:
-                st.metric(
-                    "❌ Violaciones",
-                    results['summary']['non_compliant'],
-                    delta=f"-{results['summary']['non_compliant']}",
-                    delta_color="inverse",
-                    help="Personas con violaciones"
-                )
-            
-            with col4:
-                compliance_rate = (results['summary']['compliant'] / results['total_persons'] * 100) if results['total_persons'] > 0 else 0
-                st.metric(
-                    "📈 Tasa",
-                    f"{compliance_rate:.0f}%",
-                    help="Porcentaje de cumplimiento"
-                )
+            render_streamlit(checker.generate_report(results, renderer=None), st)
             
             # Reporte detallado
             st.markdown("---")
@@ -309,6 +325,19 @@ with tab2:
         st.subheader("📥 Video Original")
         st.video(uploaded_video)
         
+        motion_gating = st.checkbox(
+            "🎚️ Omitir frames sin movimiento",
+            value=False,
+            help="Para cámaras fijas: reutiliza las detecciones del último frame analizado mientras la escena no cambie"
+        )
+        keyframe_interval = st.slider(
+            "🔁 Detectar cada N frames",
+            min_value=1,
+            max_value=30,
+            value=1,
+            help="Entre keyframes las cajas se propagan con flujo óptico; 1 = detectar en todos los frames"
+        )
+        
         # Botón analizar
         if st.button("🔍 Analizar Video", key="analyze_video"):
             
@@ -328,8 +357,25 @@ with tab2:
                 
                 try:
                     # Analizar
-                    analyzer = VideoEPPAnalyzer('runs/detect/train10/weights/best.pt')
-                    output_video_path = analyzer.analyze_video(temp_video_path, output_dir=output_dir)
+                    from video_analyzer import VideoEPPAnalyzer
+                    motion_gate = None
+                    if motion_gating:
+                        from motion_gate import MotionGate
+                        motion_gate = MotionGate()
+                    propagator = None
+                    if keyframe_interval > 1:
+                        from box_propagation import BoxPropagator
+                        propagator = BoxPropagator(keyframe_interval=keyframe_interval)
+                    # Decodificación en un hilo aparte (EPP_DECODER=opencv|pyav|ffmpeg|auto);
+                    # EPP_DECODE_PROCESS=1 la pasa a otro proceso con memoria compartida
+                    decoder_options = {'backend': os.environ.get('EPP_DECODER', 'opencv'), 'prefetch': 8,
+                                       'process': os.environ.get('EPP_DECODE_PROCESS') == '1'}
+                    analyzer = VideoEPPAnalyzer(MODEL_PATH, model=get_model(), history=init_history(),
+                                                motion_gate=motion_gate, propagator=propagator,
+                                                decoder_options=decoder_options, zones=init_zones())
+                    results_dir = os.path.join(output_dir, f"{video_name_without_ext}_results")
+                    exporter = ResultExporter(results_dir, formats=('json', 'csv'))
+                    output_video_path = analyzer.analyze_video(temp_video_path, output_dir=output_dir, exporter=exporter)
                     
                     if output_video_path and os.path.exists(output_video_path):
                         st.success("✅ Video analizado correctamente")
@@ -338,21 +384,16 @@ with tab2:
                         st.markdown("---")
                         st.subheader("📊 Estadísticas del Video")
                         
-                        col1, col2, col3, col4 = st.columns(4)
-                        
-                        with col1:
-                            st.metric("🎬 Frames", analyzer.total_frames)
-                        
-                        with col2:
-                            st.metric("✅ Cumplimiento", analyzer.compliant_frames)
-                        
-                        with col3:
-                            st.metric("❌ Violaciones", len(analyzer.violations))
-                        
-                        with col4:
-                            compliance_rate = (analyzer.compliant_frames / analyzer.total_frames * 100) if analyzer.total_frames > 0 else 0
-                            st.metric("📈 Tasa", f"{compliance_rate:.1f}%")
-                        
+                        render_streamlit(analyzer.report, st)
+                        # Resúmenes precalculados para la línea de tiempo (sobreviven a los reruns)
+                        st.session_state.video_timeline = {
+                            'video': uploaded_video.name,
+                            'rollup': analyzer.rollup
+                        }
+                        if (motion_gate is not None or propagator is not None) and analyzer.total_frames:
+                            st.caption(f"🎚️ Inferencia en {analyzer.inferred_frames} de {analyzer.total_frames} frames "
+                                       f"({analyzer.inferred_frames / analyzer.total_frames:.0%})")
+
                         # Detalle de violaciones
                         if analyzer.violations:
                             st.markdown("---")
@@ -387,6 +428,21 @@ with tab2:
                             )
                         
                         st.info("💡 Descarga el video para verlo con las detecciones y cajas dibujadas")
+                        
+                        # Resultados exportados (por frame y por evento)
+                        col1, col2 = st.columns(2)
+                        for col, table in ((col1, 'frames'), (col2, 'events')):
+                            table_path = os.path.join(results_dir, f"{table}.csv")
+                            if os.path.exists(table_path):
+                                with open(table_path, 'rb') as f:
+                                    col.download_button(
+                                        label=f"📄 Descargar {table}.csv",
+                                        data=f.read(),
+                                        file_name=f"{video_name_without_ext}_{table}.csv",
+                                        mime="text/csv",
+                                        key=f"download_{table}",
+                                        use_container_width=True
+                                    )
                     
                     else:
                         st.error("❌ Error: No se pudo generar el video analizado")
@@ -405,6 +461,63 @@ with tab2:
                     except Exception as e:
                         print(f"No se pudo eliminar directorio temporal: {e}")
         
+        # ============================================
+        # LÍNEA DE TIEMPO (desde los rollups, sin recorrer violaciones)
+        # ============================================
+        timeline = st.session_state.video_timeline
+        if timeline and timeline['video'] == uploaded_video.name and timeline['rollup'].duration:
+            import numpy as np
+            import plotly.graph_objects as go
+            from plotly.subplots import make_subplots
+            
+            rollup = timeline['rollup']
+            st.markdown("---")
+            st.subheader("🕒 Línea de Tiempo de Cumplimiento")
+            
+            # Por segundo hasta 10 minutos; por minuto en videos más largos
+            resolution = 1 if rollup.duration <= 600 else 60
+            series = rollup.series(resolution)
+            unit = 's' if resolution == 1 else 'min'
+            x = series['start'] / resolution
+            frames = np.maximum(series['frames'], 1)
+            
+            fig = make_subplots(rows=2, cols=1, shared_xaxes=True, row_heights=[0.4, 0.6], vertical_spacing=0.05)
+            fig.add_trace(go.Scatter(x=x, y=series['compliance_rate'], mode='lines', name='Cumplimiento %',
+                                     line=dict(color='#667eea')), row=1, col=1)
+            fig.add_trace(go.Heatmap(
+                x=x,
+                y=['Violación', 'Sin casco', 'Sin chaleco', 'Sin guantes', 'Sin gafas'],
+                z=[series['violations'] / frames] + [
+                    series[name] / frames
+                    for name in ('missing_helmets', 'missing_vests', 'missing_gloves', 'missing_goggles')
+                ],
+                colorscale='Reds',
+                showscale=False,
+                hovertemplate=f"%{{y}} · %{{x}}{unit}: %{{z:.2f}}<extra></extra>"
+            ), row=2, col=1)
+            fig.update_yaxes(range=[0, 100], title_text='%', row=1, col=1)
+            fig.update_xaxes(title_text=f"Tiempo ({unit})", row=2, col=1)
+            fig.update_layout(height=360, margin=dict(l=10, r=10, t=10, b=10), showlegend=False)
+            st.plotly_chart(fig, use_container_width=True)
+            
+            # Saltar a un tramo con violaciones en el video original
+            segments = rollup.violation_segments()
+            if segments:
+                def describe(seg):
+                    missing = [label for label, key in (('casco', 'missing_helmets'), ('chaleco', 'missing_vests'),
+                                                        ('guantes', 'missing_gloves'), ('gafas', 'missing_goggles'))
+                               if seg[key]]
+                    return (f"⏱️ {int(seg['start']) // 60:02d}:{int(seg['start']) % 60:02d} – "
+                            f"{int(seg['end']) // 60:02d}:{int(seg['end']) % 60:02d} · {', '.join(missing) or 'EPP'}")
+                
+                choice = st.selectbox(
+                    f"⚠️ Tramos con violaciones ({len(segments)})",
+                    range(len(segments)),
+                    format_func=lambda i: describe(segments[i]),
+                    key="violation_segment"
+                )
+                st.video(uploaded_video, start_time=int(segments[choice]['start']))
+        
         # Información adicional
         with st.expander("ℹ️ Información del proceso"):
             st.markdown("""
@@ -487,12 +600,60 @@ with tab3:
         - ¿Qué EPP le falta?
         - ¿Qué detectaste en la imagen?
         
+        **Sobre el historial:**
+        - ¿Cuántas violaciones de casco hoy?
+        - ¿Qué video tuvo más violaciones esta semana?
+        
         **Sobre normativas generales:**
         - ¿Cuáles son los EPP obligatorios?
         - ¿Qué es un casco de seguridad?
         - ¿Cuándo usar chaleco reflectivo?
         """)
 
+# ============================================
+# PANEL DE RENDIMIENTO (al final para reflejar esta ejecución)
+# ============================================
+with st.sidebar:
+    with st.expander("🚀 Arranque"):
+        loader = init_model_loader()
+        st.caption(f"Script: {st.session_state.startup_seconds:.2f} s")
+        if loader.ready and loader.error is None:
+            for phase, seconds in loader.timings.items():
+                st.caption(f"{phase}: {seconds:.2f} s")
+        elif loader.error is not None:
+            st.caption(f"❌ Error cargando el modelo: {loader.error}")
+        else:
+            st.caption("⏳ Cargando y calentando el modelo...")
+    
+    with st.expander("⏱️ Rendimiento por etapa"):
+        snapshot = METRICS.snapshot()
+        
+        if snapshot['stages']:
+            st.dataframe(
+                [{
+                    'Componente': s['labels'].get('component', ''),
+                    'Etapa': s['labels'].get('stage', ''),
+                    'Llamadas': s['count'],
+                    'Media (ms)': round(s['mean'] * 1000, 2),
+                    'Máx (ms)': round(s['max'] * 1000, 2),
+                    'Total (s)': round(s['sum'], 2)
+                } for s in snapshot['stages']],
+                hide_index=True,
+                use_container_width=True
+            )
+            for c in snapshot['counters']:
+                st.caption(f"{c['labels'].get('component', '')} · {c['name']}: {c['value']}")
+            
+            st.download_button(
+                label="📤 Exportar (Prometheus)",
+                data=METRICS.to_prometheus(),
+                file_name="epp_metrics.prom",
+                mime="text/plain",
+                key="download_metrics"
+            )
+        else:
+            st.caption("Aún no hay mediciones. Analiza una imagen o video.")
+
 # ============================================
 # FOOTER
 # ============================================
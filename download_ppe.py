@@ -1,19 +1,436 @@
+import argparse
+import hashlib
 import os
+import shutil
+import struct
+import urllib.error
 import urllib.request
 import zipfile
+import zlib
+from concurrent.futures import ProcessPoolExecutor
 
 # URL del dataset Construction-PPE
 url = "https://github.com/ultralytics/assets/releases/download/v0.0.0/construction-ppe.zip"
 zip_path = "construction-ppe.zip"
 extract_path = "datasets/"
 
-print("Descargando Construction-PPE dataset...")
-urllib.request.urlretrieve(url, zip_path)
+# Tamaño de cada bloque descargado
+CHUNK_SIZE = 1024 * 1024
 
-print("Extrayendo archivos...")
-with zipfile.ZipFile(zip_path, 'r') as zip_ref:
-    zip_ref.extractall(extract_path)
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.bmp', '.webp')
 
-print("Dataset descargado exitosamente en:", extract_path)
-os.remove(zip_path)
-print("Archivo ZIP eliminado.")
+
+# ============================================
+# EXTRACCIÓN EN STREAMING
+# ============================================
+class StreamingZipExtractor:
+    """
+    Extrae un ZIP a medida que llegan los bytes (sin esperar al final)
+
+    Recorre las cabeceras locales del ZIP en orden; soporta archivos
+    almacenados o comprimidos con deflate, con o sin data descriptor.
+    Si encuentra algo no soportado marca `failed` y la extracción se
+    completa al final con zipfile.
+    """
+
+    LOCAL_HEADER = b'PK\x03\x04'
+    CENTRAL_HEADER = b'PK\x01\x02'
+    DESCRIPTOR = b'PK\x07\x08'
+
+    def __init__(self, dest):
+        self.dest = os.path.abspath(dest)
+        self.buffer = bytearray()
+        self.done = False
+        self.failed = None
+        self.files = 0
+        self._entry = None
+
+    def feed(self, data):
+        if self.done or self.failed:
+            return
+        self.buffer.extend(data)
+        try:
+            while self._step():
+                pass
+        except (ValueError, zlib.error, OSError) as e:
+            self.failed = str(e)
+            self._close_entry()
+
+    def _target(self, name):
+        path = os.path.abspath(os.path.join(self.dest, name))
+        if not path.startswith(self.dest + os.sep) and path != self.dest:
+            raise ValueError(f"Ruta insegura en el ZIP: {name}")
+        return path
+
+    def _step(self):
+        """Avanza lo posible con el buffer actual; False si faltan bytes"""
+        if self._entry is None:
+            return self._read_header()
+        return self._read_data()
+
+    def _read_header(self):
+        if len(self.buffer) < 4:
+            return False
+        signature = bytes(self.buffer[:4])
+        if signature == self.CENTRAL_HEADER:
+            self.done = True
+            return False
+        if signature != self.LOCAL_HEADER:
+            raise ValueError("Cabecera ZIP inesperada")
+        if len(self.buffer) < 30:
+            return False
+
+        (_, _, flags, method, _, _, crc, csize, usize, name_len, extra_len) = \
+            struct.unpack('<IHHHHHIIIHH', bytes(self.buffer[:30]))
+        header_len = 30 + name_len + extra_len
+        if len(self.buffer) < header_len:
+            return False
+
+        name = bytes(self.buffer[30:30 + name_len]).decode('utf-8' if flags & 0x800 else 'cp437')
+        if csize == 0xFFFFFFFF or usize == 0xFFFFFFFF:
+            raise ValueError("ZIP64 no soportado en streaming")
+        if method not in (0, 8):
+            raise ValueError(f"Método de compresión no soportado: {method}")
+        has_descriptor = bool(flags & 0x08)
+        if method == 0 and has_descriptor:
+            raise ValueError("Archivo almacenado con data descriptor")
+
+        del self.buffer[:header_len]
+
+        path = self._target(name)
+        if name.endswith('/'):
+            os.makedirs(path, exist_ok=True)
+            handle = None
+        else:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            handle = open(path, 'wb')
+
+        self._entry = {
+            'name': name,
+            'handle': handle,
+            'method': method,
+            'remaining': None if has_descriptor else csize,
+            'descriptor': has_descriptor,
+            'crc': crc,
+            'crc_actual': 0,
+            'inflater': zlib.decompressobj(-15) if method == 8 else None,
+        }
+        return True
+
+    def _write(self, data):
+        entry = self._entry
+        entry['crc_actual'] = zlib.crc32(data, entry['crc_actual'])
+        if entry['handle'] is not None:
+            entry['handle'].write(data)
+
+    def _read_data(self):
+        entry = self._entry
+
+        # Bytes de datos disponibles para esta entrada
+        if entry['remaining'] is not None:
+            take = min(entry['remaining'], len(self.buffer))
+        else:
+            take = len(self.buffer)
+        if take == 0 and (entry['remaining'] or entry['remaining'] is None):
+            return False
+
+        chunk = bytes(self.buffer[:take])
+        del self.buffer[:take]
+
+        if entry['inflater'] is not None:
+            self._write(entry['inflater'].decompress(chunk))
+            if entry['inflater'].eof:
+                # Lo que sobró pertenece a la siguiente entrada
+                unused = entry['inflater'].unused_data
+                self.buffer[:0] = unused
+                if entry['remaining'] is not None:
+                    entry['remaining'] = 0
+        else:
+            self._write(chunk)
+
+        if entry['remaining'] is not None and entry['remaining'] > 0 and not (
+                entry['inflater'] is not None and entry['inflater'].eof):
+            entry['remaining'] -= take
+            if entry['remaining'] > 0:
+                return False
+
+        if entry['inflater'] is not None and not entry['inflater'].eof:
+            return False
+
+        if entry['descriptor']:
+            return self._read_descriptor()
+        return self._finish_entry(entry['crc'])
+
+    def _read_descriptor(self):
+        if len(self.buffer) < 16:
+            return False
+        offset = 4 if bytes(self.buffer[:4]) == self.DESCRIPTOR else 0
+        crc, = struct.unpack('<I', bytes(self.buffer[offset:offset + 4]))
+        del self.buffer[:offset + 12]
+        return self._finish_entry(crc)
+
+    def _finish_entry(self, expected_crc):
+        entry = self._entry
+        self._close_entry()
+        if entry['crc_actual'] != expected_crc:
+            raise ValueError(f"CRC inválido en {entry['name']}")
+        if not entry['name'].endswith('/'):
+            self.files += 1
+        return True
+
+    def close(self):
+        """Cierra el archivo de una entrada a medias (descarga incompleta)"""
+        self._close_entry()
+
+    def _close_entry(self):
+        if self._entry is not None and self._entry['handle'] is not None:
+            self._entry['handle'].close()
+        self._entry = None
+
+
+# ============================================
+# DESCARGA REANUDABLE
+# ============================================
+def _promote(staging, dest):
+    """Mueve el contenido extraído y verificado a su destino final"""
+    os.makedirs(dest, exist_ok=True)
+    for name in os.listdir(staging):
+        target = os.path.join(dest, name)
+        if os.path.isdir(target) and not os.path.islink(target):
+            shutil.rmtree(target)
+        elif os.path.exists(target):
+            os.remove(target)
+        os.replace(os.path.join(staging, name), target)
+    shutil.rmtree(staging)
+
+
+def download(url, dest, sha256=None, extract_to=None, chunk_size=CHUNK_SIZE):
+    """
+    Descarga `url` a `dest` por bloques, reanudando desde `dest.part`
+
+    Args:
+        url: URL del archivo
+        dest: Ruta final del archivo
+        sha256: Hash esperado (opcional); si no coincide se lanza ValueError
+        extract_to: Directorio donde extraer el ZIP mientras se descarga (se
+            extrae en `extract_to.partial` y solo se mueve tras verificar el hash)
+
+    Returns:
+        tuple: (ruta, sha256 calculado, extractor o None)
+    """
+    part_path = dest + '.part'
+    offset = os.path.getsize(part_path) if os.path.exists(part_path) else 0
+
+    request = urllib.request.Request(url)
+    if offset:
+        request.add_header('Range', f'bytes={offset}-')
+
+    try:
+        response = urllib.request.urlopen(request)
+    except urllib.error.HTTPError as e:
+        # 416: el .part ya está completo
+        if e.code != 416:
+            raise
+        response = None
+
+    if response is not None and offset and response.status != 206:
+        print("⚠️  El servidor no soporta reanudar, se descarga desde cero")
+        offset = 0
+
+    digest = hashlib.sha256()
+    extractor = None
+    if extract_to:
+        # El .part se vuelve a procesar entero, así que la extracción empieza de cero
+        staging = os.path.normpath(extract_to) + '.partial'
+        shutil.rmtree(staging, ignore_errors=True)
+        extractor = StreamingZipExtractor(staging)
+
+    # Reprocesar lo ya descargado (hash + extracción) desde disco
+    if offset:
+        print(f"↩️  Reanudando desde {offset / (1024*1024):.1f} MB")
+        with open(part_path, 'rb') as f:
+            while True:
+                data = f.read(chunk_size)
+                if not data:
+                    break
+                digest.update(data)
+                if extractor:
+                    extractor.feed(data)
+
+    if response is not None:
+        total = response.headers.get('Content-Length')
+        total = int(total) + offset if total else None
+        received = offset
+
+        with response, open(part_path, 'ab' if offset else 'wb') as f:
+            while True:
+                data = response.read(chunk_size)
+                if not data:
+                    break
+                f.write(data)
+                digest.update(data)
+                if extractor:
+                    extractor.feed(data)
+                received += len(data)
+                if total:
+                    print(f"\r⬇️  {received / (1024*1024):.1f} / {total / (1024*1024):.1f} MB", end='')
+        print()
+
+    computed = digest.hexdigest()
+    if extractor:
+        extractor.close()
+    if sha256 and computed.lower() != sha256.lower():
+        os.remove(part_path)
+        if extractor:
+            shutil.rmtree(staging, ignore_errors=True)
+        raise ValueError(f"Checksum inválido: esperado {sha256}, obtenido {computed}")
+
+    os.replace(part_path, dest)
+    if extractor:
+        # Extracción incompleta: se descarta y main() extrae desde el ZIP verificado
+        if extractor.done and not extractor.failed:
+            _promote(staging, extract_to)
+        else:
+            shutil.rmtree(staging, ignore_errors=True)
+    return dest, computed, extractor
+
+
+# ============================================
+# VERIFICACIÓN DE INTEGRIDAD
+# ============================================
+def _check_pair(args):
+    """Verifica una imagen y su archivo de etiquetas YOLO"""
+    image_path, label_path, nc = args
+    errors = []
+
+    try:
+        from PIL import Image
+        with Image.open(image_path) as img:
+            img.verify()
+    except Exception as e:
+        errors.append(f"imagen corrupta ({e})")
+
+    if not os.path.exists(label_path):
+        errors.append("sin etiquetas")
+    else:
+        with open(label_path, 'r') as f:
+            for n, line in enumerate(f, 1):
+                parts = line.split()
+                if not parts:
+                    continue
+                if len(parts) != 5:
+                    errors.append(f"línea {n}: {len(parts)} columnas")
+                    continue
+                try:
+                    class_id = int(parts[0])
+                    coords = [float(x) for x in parts[1:]]
+                except ValueError:
+                    errors.append(f"línea {n}: valor no numérico")
+                    continue
+                if not 0 <= class_id < nc:
+                    errors.append(f"línea {n}: clase {class_id} fuera de rango")
+                if any(c < 0 or c > 1 for c in coords):
+                    errors.append(f"línea {n}: coordenadas no normalizadas")
+
+    return image_path, errors
+
+
+def verify_dataset(data_yaml, root=None, workers=None):
+    """
+    Verifica en paralelo imágenes y etiquetas de cada split del YAML
+
+    Args:
+        data_yaml: Configuración del dataset (p. ej. ppe_data.yaml)
+        root: Directorio raíz del dataset (por defecto `path` del YAML)
+        workers: Procesos a usar (por defecto todos los núcleos)
+
+    Returns:
+        dict: {split: {'images': n, 'errors': {imagen: [errores]}}}
+    """
+    import yaml
+
+    with open(data_yaml, 'r', encoding='utf-8') as f:
+        config = yaml.safe_load(f)
+
+    root = root or config.get('path', '.')
+    nc = config.get('nc') or len(config['names'])
+
+    tasks = {}
+    for split in ('train', 'val', 'test'):
+        if not config.get(split):
+            continue
+        images_dir = os.path.join(root, config[split])
+        labels_dir = os.path.join(root, config[split].replace('images', 'labels', 1))
+        if not os.path.isdir(images_dir):
+            tasks[split] = None
+            continue
+        tasks[split] = [
+            (os.path.join(images_dir, name),
+             os.path.join(labels_dir, os.path.splitext(name)[0] + '.txt'),
+             nc)
+            for name in sorted(os.listdir(images_dir))
+            if name.lower().endswith(IMAGE_EXTENSIONS)
+        ]
+
+    report = {}
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        for split, pairs in tasks.items():
+            if pairs is None:
+                report[split] = {'images': 0, 'errors': {'<split>': ['directorio no encontrado']}}
+                continue
+            errors = {}
+            for image_path, image_errors in pool.map(_check_pair, pairs, chunksize=32):
+                if image_errors:
+                    errors[image_path] = image_errors
+            report[split] = {'images': len(pairs), 'errors': errors}
+
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Descarga y verifica el dataset Construction-PPE")
+    parser.add_argument('--url', default=url, help="URL del ZIP (p. ej. un servidor local)")
+    parser.add_argument('--zip', default=zip_path, help="Ruta del ZIP descargado")
+    parser.add_argument('--dest', default=extract_path, help="Directorio de extracción")
+    parser.add_argument('--sha256', default=None, help="Checksum esperado del ZIP")
+    parser.add_argument('--data', default='ppe_data.yaml', help="YAML para la verificación")
+    parser.add_argument('--root', default=None, help="Raíz del dataset para verificar (por defecto --dest)")
+    parser.add_argument('--workers', type=int, default=None)
+    parser.add_argument('--keep-zip', action='store_true', help="No eliminar el ZIP al terminar")
+    parser.add_argument('--verify-only', action='store_true', help="Solo verificar el dataset existente")
+    args = parser.parse_args()
+
+    if not args.verify_only:
+        print("Descargando Construction-PPE dataset...")
+        path, computed, extractor = download(args.url, args.zip, sha256=args.sha256, extract_to=args.dest)
+        print(f"🔐 SHA-256: {computed}")
+
+        if extractor.done and not extractor.failed:
+            print(f"📂 {extractor.files} archivos extraídos durante la descarga")
+        else:
+            reason = extractor.failed or "extracción incompleta"
+            print(f"Extrayendo archivos... ({reason})")
+            with zipfile.ZipFile(path, 'r') as zip_ref:
+                zip_ref.extractall(args.dest)
+
+        print("Dataset descargado exitosamente en:", args.dest)
+        if not args.keep_zip:
+            os.remove(path)
+            print("Archivo ZIP eliminado.")
+
+    print("🔎 Verificando imágenes y etiquetas...")
+    report = verify_dataset(args.data, root=args.root or args.dest, workers=args.workers)
+    total_errors = 0
+    for split, info in report.items():
+        total_errors += len(info['errors'])
+        status = "✅" if not info['errors'] else "❌"
+        print(f"   {status} {split}: {info['images']} imágenes, {len(info['errors'])} con errores")
+        for image, errors in list(info['errors'].items())[:5]:
+            print(f"      - {os.path.basename(image)}: {', '.join(errors)}")
+
+    if total_errors:
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
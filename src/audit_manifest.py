@@ -0,0 +1,185 @@
+import hashlib
+import json
+import os
+import shutil
+import time
+
+from event_log import get_event_logger
+from model_quantizer import resolve_model_path
+
+
+MANIFEST_FILE = 'manifest.json'
+
+# Bloque de lectura para el hash de videos grandes
+HASH_CHUNK = 1 << 20
+
+
+def file_signature(path, use_hash=False, previous=None):
+    """
+    Firma de un archivo: tamaño + mtime, y opcionalmente SHA-1 del contenido
+
+    Si el tamaño y mtime coinciden con la firma previa se reutiliza su hash
+    en lugar de releer el archivo.
+    """
+    stat = os.stat(path)
+    signature = {'size': stat.st_size, 'mtime': stat.st_mtime}
+    if not use_hash:
+        return signature
+
+    if previous and previous.get('sha1') and \
+            previous['size'] == signature['size'] and previous['mtime'] == signature['mtime']:
+        signature['sha1'] = previous['sha1']
+        return signature
+
+    sha1 = hashlib.sha1()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(HASH_CHUNK), b''):
+            sha1.update(chunk)
+    signature['sha1'] = sha1.hexdigest()
+    return signature
+
+
+def zones_signature(zones_path, camera='default'):
+    """SHA-1 de la configuración de zonas de una cámara (None sin zonas)"""
+    if not zones_path or not os.path.exists(zones_path):
+        return None
+    with open(zones_path, 'r', encoding='utf-8') as f:
+        config = json.load(f).get(camera)
+    if not config:
+        return None
+    return hashlib.sha1(json.dumps(config, sort_keys=True).encode('utf-8')).hexdigest()
+
+
+def analysis_version(model_path, conf_threshold, policy_version=None, zones_path=None, camera='default',
+                     options=None):
+    """
+    Versión del análisis: pesos efectivos (variante activa incluida),
+    umbral de confianza, versión de las reglas de cumplimiento, zonas de
+    la cámara y opciones que cambian el resultado (muestreo, cascada, ...).
+    Cualquier cambio invalida las entradas del manifiesto.
+
+    Args:
+        options: Dict JSON con las opciones de análisis que afectan al veredicto
+    """
+    if policy_version is None:
+        from compliance_checker import POLICY_VERSION
+        policy_version = POLICY_VERSION
+
+    model = resolve_model_path(model_path)
+    model_sig = file_signature(model) if os.path.isfile(model) else {}
+    return {
+        'model': os.path.abspath(model),
+        'model_size': model_sig.get('size'),
+        'model_mtime': model_sig.get('mtime'),
+        'conf': conf_threshold,
+        'policy': policy_version,
+        'zones': zones_signature(zones_path, camera),
+        'options': dict(options or {}),
+    }
+
+
+class AuditManifest:
+    """
+    Registro de entradas ya auditadas para ejecuciones incrementales
+
+    ============================================
+    ENTRADA (por ruta absoluta):
+    ============================================
+    signature: tamaño, mtime (y sha1 con use_hash)
+    version:   analysis_version con que se procesó
+    outputs:   archivos generados
+    name:      nombre de salida (se conserva entre ejecuciones)
+    ts:        momento del análisis
+    ============================================
+    """
+
+    def __init__(self, path, version, use_hash=False):
+        self.path = path
+        self.version = version
+        self.use_hash = use_hash
+        self.entries = {}
+        self._dirty = False
+
+        if os.path.exists(path):
+            try:
+                with open(path, 'r', encoding='utf-8') as f:
+                    self.entries = json.load(f).get('entries', {})
+            except (OSError, ValueError):
+                get_event_logger().warning('manifest_unreadable', manifest=path)
+
+    def __len__(self):
+        return len(self.entries)
+
+    def signature(self, path):
+        return file_signature(path, self.use_hash, self.entries.get(path, {}).get('signature'))
+
+    def is_current(self, path):
+        """True si el archivo no cambió desde su último análisis con la misma versión"""
+        entry = self.entries.get(path)
+        if entry is None or entry['version'] != self.version:
+            return False
+        if not os.path.exists(path):
+            return False
+
+        current = self.signature(path)
+        stored = entry['signature']
+        if self.use_hash and 'sha1' in stored:
+            return stored['sha1'] == current['sha1']
+        return stored['size'] == current['size'] and stored['mtime'] == current['mtime']
+
+    def pending(self, paths):
+        """Filtra las rutas que hay que (re)analizar"""
+        return [p for p in paths if not self.is_current(p)]
+
+    def update(self, path, outputs, name=None):
+        """Registra un análisis correcto"""
+        self.entries[path] = {
+            'signature': self.signature(path),
+            'version': self.version,
+            'outputs': [o for o in outputs if o],
+            'name': name,
+            'ts': time.time()
+        }
+        self._dirty = True
+
+    def names(self):
+        """{ruta: nombre de salida} registrados (ver batch_audit.output_names)"""
+        return {path: entry['name'] for path, entry in self.entries.items() if entry.get('name')}
+
+    def gc(self, remove_outputs=False):
+        """
+        Elimina entradas cuyo archivo ya no existe o que se procesaron con
+        otra versión del análisis
+
+        Args:
+            remove_outputs: Borrar también los resultados generados
+
+        Returns:
+            list: Rutas eliminadas del manifiesto
+        """
+        stale = [
+            path for path, entry in self.entries.items()
+            if entry['version'] != self.version or not os.path.exists(path)
+        ]
+        for path in stale:
+            entry = self.entries.pop(path)
+            if remove_outputs:
+                for output in entry['outputs']:
+                    if os.path.isdir(output):
+                        shutil.rmtree(output, ignore_errors=True)
+                    elif os.path.exists(output):
+                        os.remove(output)
+        if stale:
+            self._dirty = True
+        return stale
+
+    def save(self):
+        """Escritura atómica (tmp + rename) para no corromperlo si se interrumpe"""
+        if not self._dirty:
+            return
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        tmp = self.path + '.tmp'
+        with open(tmp, 'w', encoding='utf-8') as f:
+            json.dump({'version': self.version, 'entries': self.entries}, f)
+        os.replace(tmp, self.path)
+        self._dirty = False
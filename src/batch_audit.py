@@ -0,0 +1,448 @@
+"""
+Auditoría por lotes de carpetas de imágenes y videos
+
+Reparte los archivos en un pool de procesos (un modelo por worker),
+escribe un resultado por archivo y muestra el throughput agregado.
+Pensado para ejecutarse desde cron sobre las capturas de cada día.
+
+Uso:
+    python batch_audit.py /capturas/2025-01-31 --output ../results/audit/2025-01-31
+    python batch_audit.py "/capturas/**/*.jpg" --workers 4 --history ../results/history.db
+
+Por defecto se mantiene un manifiesto (<output>/manifest.json) y solo se
+analizan los archivos nuevos o modificados desde la última ejecución.
+"""
+import argparse
+import glob
+import hashlib
+import os
+import time
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from reports import build_image_report, render_file
+
+
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.bmp', '.webp')
+VIDEO_EXTENSIONS = ('.mp4', '.avi', '.mov', '.mkv')
+
+
+def collect_inputs(patterns):
+    """
+    Expande directorios, globs y archivos sueltos
+
+    Returns:
+        tuple: (imágenes, videos) como listas ordenadas de rutas absolutas
+    """
+    files = set()
+    for pattern in patterns:
+        if os.path.isdir(pattern):
+            for root, _, names in os.walk(pattern):
+                files.update(os.path.join(root, n) for n in names)
+        else:
+            files.update(glob.glob(pattern, recursive=True))
+
+    files = sorted(os.path.abspath(f) for f in files if os.path.isfile(f))
+    images = [f for f in files if f.lower().endswith(IMAGE_EXTENSIONS)]
+    videos = [f for f in files if f.lower().endswith(VIDEO_EXTENSIONS)]
+    return images, videos
+
+
+def output_names(paths, reserved=None):
+    """
+    Nombre de salida por archivo, estable entre ejecuciones
+
+    Un archivo ya registrado en el manifiesto conserva su nombre. Los
+    demás usan el stem, salvo que otro archivo lo comparta (en esta
+    ejecución o en el manifiesto): entonces stem + hash corto de la ruta
+    absoluta, que no depende del orden ni de qué otros archivos haya.
+
+    Args:
+        paths: Rutas absolutas
+        reserved: {ruta: nombre} ya asignados (AuditManifest.names())
+    """
+    reserved = reserved or {}
+    stems = Counter(os.path.splitext(os.path.basename(p))[0] for p in paths)
+    owner = {name: path for path, name in reserved.items()}
+
+    names = {}
+    for path in paths:
+        if path in reserved:
+            names[path] = reserved[path]
+            continue
+        stem = os.path.splitext(os.path.basename(path))[0]
+        name = stem
+        if stems[stem] > 1 or owner.get(stem, path) != path:
+            name = f"{stem}_{hashlib.sha1(path.encode('utf-8')).hexdigest()[:8]}"
+        names[path] = name
+        owner[name] = path
+    return names
+
+
+# ============================================
+# WORKERS
+# ============================================
+_worker = {}
+
+
+def _init_worker(model_path, conf_threshold, motion_gate=None, keyframe_interval=None, decoder_options=None,
+                 zones=None, cascade=None, cascade_imgsz=320, preprocess_imgsz=None):
+    from compliance_checker import EPPComplianceChecker
+    from video_analyzer import VideoEPPAnalyzer
+
+    checker = EPPComplianceChecker(model_path, zones=zones)
+    if cascade:
+        from person_cascade import load_cascade
+        checker.cascade = load_cascade(cascade, model=checker.model, imgsz=cascade_imgsz)
+    _worker['checker'] = checker
+
+    def analyzer_factory():
+        # El analizador de video reutiliza el mismo modelo (y la misma cascada)
+        options = {'decoder_options': decoder_options, 'zones': zones, 'cascade': checker.cascade}
+        if preprocess_imgsz:
+            from frame_preprocess import LetterboxPreprocessor
+            options['preprocessor'] = LetterboxPreprocessor(preprocess_imgsz)
+        if motion_gate:
+            from motion_gate import MotionGate
+            options['motion_gate'] = MotionGate(method=motion_gate)
+        if keyframe_interval:
+            from box_propagation import BoxPropagator
+            options['propagator'] = BoxPropagator(keyframe_interval=keyframe_interval)
+        return VideoEPPAnalyzer(model_path, model=checker.model, **options)
+
+    _worker['analyzer_factory'] = analyzer_factory
+    _worker['conf'] = conf_threshold
+
+
+def _audit_images(task):
+    """Analiza un lote de imágenes y escribe un JSON por imagen"""
+    paths, names, output_dir = task
+    start = time.perf_counter()
+    analyses = _worker['checker'].detect_compliance_batch(paths, _worker['conf'])
+
+    results = []
+    for path, analysis in zip(paths, analyses):
+        out = render_file(build_image_report(analysis), os.path.join(output_dir, names[path] + '.json'))
+        results.append({'path': path, 'output': out, 'outputs': [out], 'analysis': analysis})
+    return 'images', results, time.perf_counter() - start
+
+
+def _hash_images(task):
+    """Hash perceptual de un bloque de imágenes (None si no se puede leer)"""
+    from image_dedup import image_hash
+
+    paths, method = task
+    hashes = []
+    for path in paths:
+        try:
+            hashes.append((path, image_hash(path, method)))
+        except Exception:
+            hashes.append((path, None))
+    return hashes
+
+
+def _audit_video(task):
+    """Analiza un video: video anotado + frames/eventos exportados"""
+    from exporters import ResultExporter
+
+    path, name, output_dir, formats, video_options = task
+    start = time.perf_counter()
+    analyzer = _worker['analyzer_factory']()
+    results_dir = os.path.join(output_dir, name + '_results')
+    exporter = ResultExporter(results_dir, formats=formats)
+    # `name` es único en la auditoría: dos clip.mp4 de carpetas distintas no comparten salidas
+    output = analyzer.analyze_video(path, output_dir=os.path.join(output_dir, 'videos'), exporter=exporter,
+                                    output_name=name, **video_options)
+    outputs = [output, results_dir]
+    if analyzer.store_detections:
+        from detection_store import store_path
+        outputs.append(store_path(os.path.join(output_dir, 'videos'), name))
+    result = {'path': path, 'output': output, 'outputs': outputs, 'report': analyzer.report,
+              'inferred_frames': analyzer.inferred_frames, 'cascade_skipped': analyzer.cascade_skipped}
+    return 'video', [result], time.perf_counter() - start
+
+
+def run_audit(inputs, output_dir, model_path, workers=2, batch_size=8, conf_threshold=0.25,
+              formats=('json', 'csv'), history=None, camera='default', manifest=None, motion_gate=None,
+              keyframe_interval=None, decoder_options=None, zones=None, dedup=None, dedup_distance=4,
+              video_options=None, cascade=None, cascade_imgsz=320, preprocess_imgsz=None):
+    """
+    Ejecuta la auditoría completa
+
+    El historial (si se indica) solo se escribe desde este proceso para
+    mantener un único escritor sobre la base SQLite. Con `manifest`
+    se omiten los archivos sin cambios y se registran los analizados.
+    `motion_gate` ('diff' o 'mog2') omite la inferencia en frames de
+    video sin cambios y `keyframe_interval` detecta solo cada N frames,
+    propagando las cajas con flujo óptico entre keyframes.
+    `decoder_options` se pasa a video_decoder.open_decoder y `zones`
+    (ZoneMap) limita el análisis a las zonas de la cámara. Con `dedup`
+    ('dhash' o 'phash') las imágenes casi idénticas (Hamming <=
+    dedup_distance) reutilizan el resultado de su representante.
+    `video_options` se pasa a VideoEPPAnalyzer.analyze_video
+    (checkpoint_interval, resume, follow, idle_timeout). Con `cascade`
+    ('self' o ruta de un modelo de personas) una pasada de personas a
+    `cascade_imgsz` decide si hace falta el modelo completo. Con
+    `preprocess_imgsz` los frames de video se preparan con buffers
+    reutilizados (LetterboxPreprocessor) en lugar del preprocesado genérico.
+
+    Returns:
+        dict: Totales y throughput
+    """
+    images, videos = collect_inputs(inputs)
+    names = output_names(images + videos, reserved=manifest.names() if manifest is not None else None)
+    os.makedirs(output_dir, exist_ok=True)
+
+    skipped = 0
+    if manifest is not None:
+        total = len(images) + len(videos)
+        images, videos = manifest.pending(images), manifest.pending(videos)
+        skipped = total - len(images) - len(videos)
+
+    print(f"🗂️  {len(images)} imágenes y {len(videos)} videos | {workers} workers"
+          + (f" | {skipped} sin cambios (omitidos)" if skipped else ""))
+
+    totals = {'images': 0, 'videos': 0, 'frames': 0, 'inferred_frames': 0, 'failed': 0, 'skipped': skipped,
+              'duplicates': 0, 'persons': 0, 'non_compliant': 0, 'cascade_images': 0, 'cascade_frames': 0}
+    start = time.perf_counter()
+
+    if not images and not videos:
+        totals.update({'seconds': 0.0, 'images_per_sec': 0, 'frames_per_sec': 0})
+        return totals
+
+    def record_image(path, analysis, outputs):
+        totals['images'] += 1
+        totals['persons'] += analysis['total_persons']
+        totals['non_compliant'] += analysis['summary']['non_compliant']
+        if history is not None:
+            history.record_image(analysis, camera=camera)
+        if manifest is not None:
+            manifest.update(path, outputs, name=names[path])
+
+    try:
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                                 initargs=(model_path, conf_threshold, motion_gate, keyframe_interval,
+                                           decoder_options, zones, cascade, cascade_imgsz,
+                                           preprocess_imgsz)) as pool:
+            # Agrupar imágenes casi idénticas: solo las representantes pasan por el modelo
+            duplicates_of = {}
+            if dedup and images:
+                from image_dedup import group_near_duplicates
+
+                chunks = [(images[i:i + 64], dedup) for i in range(0, len(images), 64)]
+                hashes = [h for chunk in pool.map(_hash_images, chunks) for h in chunk]
+                images, duplicates = group_near_duplicates(hashes, dedup_distance)
+                for dup, representative in duplicates.items():
+                    duplicates_of.setdefault(representative, []).append(dup)
+                print(f"🧬 {len(duplicates)} imágenes casi duplicadas reutilizan el resultado de "
+                      f"{len(duplicates_of)} representantes")
+
+            tasks = []
+            for i in range(0, len(images), batch_size):
+                chunk = images[i:i + batch_size]
+                tasks.append((_audit_images, (chunk, {p: names[p] for p in chunk}, output_dir)))
+            for path in videos:
+                tasks.append((_audit_video, (path, names[path], output_dir, tuple(formats), video_options or {})))
+
+            futures = {pool.submit(func, task): task for func, task in tasks}
+            for done, future in enumerate(as_completed(futures), 1):
+                try:
+                    kind, results, seconds = future.result()
+                except Exception as e:
+                    task = futures[future]
+                    failed = task[0] if isinstance(task[0], list) else [task[0]]
+                    failed = failed + [d for p in failed for d in duplicates_of.get(p, [])]
+                    totals['failed'] += len(failed)
+                    print(f"   ❌ Error en {', '.join(os.path.basename(p) for p in failed)}: {e}")
+                    continue
+
+                for r in results:
+                    if kind == 'images':
+                        record_image(r['path'], r['analysis'], r['outputs'])
+                        totals['cascade_images'] += int(r['analysis'].get('cascade_skipped', False))
+                        for dup in duplicates_of.get(r['path'], []):
+                            analysis = {**r['analysis'], 'image': dup}
+                            out = render_file(build_image_report(analysis),
+                                              os.path.join(output_dir, names[dup] + '.json'))
+                            record_image(dup, analysis, [out])
+                            totals['duplicates'] += 1
+                    elif r['output'] is None:
+                        totals['failed'] += 1
+                    else:
+                        totals['videos'] += 1
+                        totals['frames'] += r['report'].total_frames
+                        totals['inferred_frames'] += r['inferred_frames']
+                        totals['cascade_frames'] += r['cascade_skipped']
+                        if history is not None:
+                            history.record_video(r['report'], camera=camera)
+                        if manifest is not None:
+                            manifest.update(r['path'], r['outputs'], name=names[r['path']])
+
+                elapsed = time.perf_counter() - start
+                print(f"   [{done}/{len(tasks)}] {kind}: {len(results)} archivo(s) en {seconds:.1f}s | "
+                      f"{(totals['images'] + totals['videos']) / elapsed:.2f} archivos/s")
+    finally:
+        # Lo ya analizado queda registrado aunque la ejecución se interrumpa
+        if manifest is not None:
+            manifest.save()
+
+    totals['seconds'] = time.perf_counter() - start
+    totals['images_per_sec'] = totals['images'] / totals['seconds'] if totals['seconds'] else 0
+    totals['frames_per_sec'] = totals['frames'] / totals['seconds'] if totals['seconds'] else 0
+    return totals
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Auditoría EPP por lotes de imágenes y videos")
+    parser.add_argument('inputs', nargs='+', help="Directorios, globs o archivos")
+    parser.add_argument('--model', default='../runs/detect/train10/weights/best.pt')
+    parser.add_argument('--output', default='../results/audit', help="Directorio de resultados")
+    parser.add_argument('--workers', type=int, default=max(1, (os.cpu_count() or 2) // 2))
+    parser.add_argument('--batch-size', type=int, default=8, help="Imágenes por llamada al modelo")
+    parser.add_argument('--conf', type=float, default=0.25)
+    parser.add_argument('--formats', default='json,csv', help="Formatos de exportación de videos")
+    parser.add_argument('--history', default=None, help="Base SQLite del historial (opcional)")
+    parser.add_argument('--camera', default='default', help="Cámara / sitio para el historial")
+    parser.add_argument('--motion-gate', choices=['diff', 'mog2'], default=None,
+                        help="Omitir inferencia en frames de video sin cambios (cámaras fijas)")
+    parser.add_argument('--keyframe-interval', type=int, default=None,
+                        help="Detectar cada N frames y propagar cajas entre keyframes")
+    parser.add_argument('--decoder', default='opencv', choices=['opencv', 'pyav', 'ffmpeg', 'auto'],
+                        help="Backend de decodificación de video")
+    parser.add_argument('--decode-width', type=int, default=None,
+                        help="Decodificar directamente a este ancho (p. ej. 1280 para material 4K)")
+    parser.add_argument('--decode-threads', type=int, default=0, help="Hilos de decodificación (0 = auto)")
+    parser.add_argument('--frame-stride', type=int, default=1, help="Analizar uno de cada N frames")
+    parser.add_argument('--prefetch', type=int, default=8, help="Frames decodificados por adelantado (0 = sin hilo)")
+    parser.add_argument('--decode-process', action='store_true',
+                        help="Decodificar en un proceso aparte (frames por memoria compartida, --prefetch ranuras)")
+    parser.add_argument('--checkpoint-interval', type=float, default=None,
+                        help="Segundos entre checkpoints de video; al relanzar se reanuda desde el último")
+    parser.add_argument('--follow', action='store_true',
+                        help="Seguir videos que todavía se están grabando (.ts, .mkv, MP4 fragmentado)")
+    parser.add_argument('--idle-timeout', type=float, default=60.0,
+                        help="Con --follow: segundos sin frames nuevos para dar un video por terminado")
+    parser.add_argument('--cascade', default=None,
+                        help="Cascada de personas: 'self' (mismo modelo a baja resolución) o ruta de un modelo "
+                             "de personas; el modelo completo solo corre donde hay alguien")
+    parser.add_argument('--cascade-imgsz', type=int, default=320, help="Resolución de la pasada de personas")
+    parser.add_argument('--preprocess-imgsz', type=int, default=None,
+                        help="Preprocesar frames de video con buffers reutilizados a este tamaño (p. ej. 640)")
+    parser.add_argument('--zones', default=None,
+                        help="JSON de zonas por cámara (se usan las de --camera)")
+    parser.add_argument('--dedup', choices=['dhash', 'phash'], default=None,
+                        help="Reutilizar el resultado de imágenes casi idénticas (hash perceptual)")
+    parser.add_argument('--dedup-distance', type=int, default=4,
+                        help="Distancia de Hamming máxima (de 64 bits) para considerar duplicadas")
+    parser.add_argument('--manifest', default=None, help="Ruta del manifiesto (por defecto <output>/manifest.json)")
+    parser.add_argument('--no-manifest', action='store_true', help="Reanalizar todo sin manifiesto")
+    parser.add_argument('--hash', action='store_true', help="Detectar cambios por contenido (SHA-1), no solo mtime")
+    parser.add_argument('--gc', action='store_true',
+                        help="Eliminar del manifiesto (y del disco) resultados de archivos borrados u obsoletos")
+    args = parser.parse_args()
+
+    manifest = None
+    if not args.no_manifest:
+        from audit_manifest import MANIFEST_FILE, AuditManifest, analysis_version
+        manifest = AuditManifest(
+            args.manifest or os.path.join(args.output, MANIFEST_FILE),
+            analysis_version(args.model, args.conf, zones_path=args.zones, camera=args.camera, options={
+                'cascade': args.cascade,
+                'cascade_imgsz': args.cascade_imgsz if args.cascade else None,
+                'frame_stride': args.frame_stride,
+                'decode_width': args.decode_width,
+                'motion_gate': args.motion_gate,
+                'keyframe_interval': args.keyframe_interval,
+                'preprocess_imgsz': args.preprocess_imgsz,
+                'dedup': args.dedup,
+                'dedup_distance': args.dedup_distance if args.dedup else None,
+            }),
+            use_hash=args.hash
+        )
+        if args.gc:
+            stale = manifest.gc(remove_outputs=True)
+            manifest.save()
+            print(f"🧹 Entradas obsoletas eliminadas: {len(stale)}")
+
+    history = None
+    if args.history:
+        from history_store import HistoryStore
+        history = HistoryStore(args.history)
+
+    zones = None
+    if args.zones:
+        from safety_zones import load_zones
+        zones = load_zones(args.zones, args.camera)
+        if zones is None:
+            print(f"⚠️  Sin zonas para la cámara '{args.camera}' en {args.zones}, se analiza el frame completo")
+
+    totals = run_audit(
+        args.inputs,
+        args.output,
+        args.model,
+        workers=args.workers,
+        batch_size=args.batch_size,
+        conf_threshold=args.conf,
+        formats=[f for f in args.formats.split(',') if f],
+        history=history,
+        camera=args.camera,
+        manifest=manifest,
+        motion_gate=args.motion_gate,
+        keyframe_interval=args.keyframe_interval,
+        zones=zones,
+        dedup=args.dedup,
+        dedup_distance=args.dedup_distance,
+        decoder_options={
+            'backend': args.decoder,
+            'width': args.decode_width,
+            'threads': args.decode_threads,
+            'stride': args.frame_stride,
+            'prefetch': args.prefetch,
+            'process': args.decode_process
+        },
+        cascade=args.cascade,
+        cascade_imgsz=args.cascade_imgsz,
+        preprocess_imgsz=args.preprocess_imgsz,
+        video_options={
+            'checkpoint_interval': args.checkpoint_interval,
+            'resume': args.checkpoint_interval is not None,
+            'follow': args.follow,
+            'idle_timeout': args.idle_timeout
+        }
+    )
+
+    print("\n" + "="*70)
+    print("📋 AUDITORÍA COMPLETADA")
+    print("="*70)
+    print(f"🖼️  Imágenes: {totals['images']} ({totals['images_per_sec']:.2f} img/s)")
+    if totals['duplicates']:
+        print(f"   └─ Casi duplicadas (sin inferencia): {totals['duplicates']}")
+    print(f"🎥 Videos: {totals['videos']} ({totals['frames']} frames, {totals['frames_per_sec']:.1f} frames/s)")
+    if (args.motion_gate or args.keyframe_interval) and totals['frames']:
+        print(f"   └─ Frames con inferencia: {totals['inferred_frames']} "
+              f"({totals['inferred_frames'] / totals['frames']:.1%})")
+    if args.cascade:
+        # Tasa de acierto = fracción que sí pasó al modelo completo
+        checked = {
+            'imágenes': (totals['cascade_images'], totals['images'] - totals['duplicates']),
+            'frames': (totals['cascade_frames'], totals['inferred_frames'] + totals['cascade_frames'])
+        }
+        for label, (skipped, total) in checked.items():
+            if total:
+                print(f"🔎 Cascada ({label}): {total - skipped} de {total} con personas "
+                      f"(tasa de acierto {(total - skipped) / total:.1%}, {skipped} sin modelo completo)")
+    print(f"👥 Personas: {totals['persons']} | ❌ Sin cumplimiento: {totals['non_compliant']}")
+    if totals['skipped']:
+        print(f"⏭️  Sin cambios (omitidos): {totals['skipped']}")
+    print(f"⏱️  Tiempo total: {totals['seconds']:.1f}s")
+    if totals['failed']:
+        print(f"⚠️  Archivos con error: {totals['failed']}")
+    print(f"💾 Resultados en: {args.output}")
+    print("="*70)
+
+    if totals['failed']:
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
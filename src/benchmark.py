@@ -0,0 +1,413 @@
+"""
+Benchmark reproducible de los pipelines de cumplimiento EPP
+
+Mide:
+- detect_compliance (una imagen y en lote)
+- check_overlap con distinta cantidad de personas / items
+- analyze_video de extremo a extremo con desglose por etapa (los
+  timers de metrics.py del propio pipeline: decode, predict,
+  association, render, encode, ...)
+- Pico de memoria de cada caso
+
+Por defecto usa frames sintéticos y un modelo de reemplazo (sin pesos ni
+red) para poder ejecutarse offline. Con --model se mide el modelo real.
+
+Uso:
+    python benchmark.py --output ../results/bench.json
+    python benchmark.py --compare ../results/bench_anterior.json
+"""
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import cv2
+import numpy as np
+
+from compliance_checker import EPPComplianceChecker
+from event_log import configure_event_log
+from metrics import MetricsRegistry
+from video_analyzer import VideoEPPAnalyzer
+
+
+# Clases del dataset Construction-PPE (ppe_data.yaml)
+PPE_NAMES = {
+    0: 'helmet', 1: 'gloves', 2: 'vest', 3: 'boots', 4: 'goggles', 5: 'none',
+    6: 'Person', 7: 'no_helmet', 8: 'no_goggle', 9: 'no_gloves', 10: 'no_boots'
+}
+
+# Items que el modelo de reemplazo dibuja sobre cada persona
+STAND_IN_ITEMS = [0, 1, 2, 3, 4]
+
+
+# ============================================
+# DATOS SINTÉTICOS
+# ============================================
+def synthetic_frame(width, height, seed=0):
+    """Genera un frame BGR con ruido y rectángulos (determinista)"""
+    rng = np.random.RandomState(seed)
+    frame = rng.randint(0, 64, (height, width, 3), dtype=np.uint8)
+    for _ in range(6):
+        x1, y1 = rng.randint(0, width // 2), rng.randint(0, height // 2)
+        x2, y2 = x1 + rng.randint(20, width // 2), y1 + rng.randint(20, height // 2)
+        color = tuple(int(c) for c in rng.randint(0, 255, 3))
+        cv2.rectangle(frame, (x1, y1), (x2, y2), color, -1)
+    return frame
+
+
+def synthetic_boxes(count, width, height, rng):
+    """Genera `count` cajas [x1, y1, x2, y2] aleatorias dentro del frame"""
+    x1 = rng.uniform(0, width * 0.8, count)
+    y1 = rng.uniform(0, height * 0.8, count)
+    w = rng.uniform(10, width * 0.2, count)
+    h = rng.uniform(10, height * 0.2, count)
+    return [np.array(b, dtype=np.float32) for b in zip(x1, y1, x1 + w, y1 + h)]
+
+
+def write_synthetic_video(path, frames, width, height, fps=30):
+    """Escribe un video mp4 sintético para medir el pipeline de video"""
+    out = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*'mp4v'), fps, (width, height))
+    for i in range(frames):
+        out.write(synthetic_frame(width, height, seed=i))
+    out.release()
+    return path
+
+
+class StandInModel:
+    """
+    Modelo de reemplazo con la interfaz mínima de YOLO (`names`, `predict`)
+
+    Devuelve `Results` de Ultralytics con personas e items sintéticos para
+    que el resto del pipeline (asociación, render) trabaje igual que con el
+    modelo real. Incluye un preprocesado tipo letterbox para que la etapa de
+    inferencia tenga un costo representativo de copia/normalización.
+    """
+
+    def __init__(self, persons_per_frame=3, imgsz=640, seed=0):
+        self.names = dict(PPE_NAMES)
+        self.persons_per_frame = persons_per_frame
+        self.imgsz = imgsz
+        self.rng = np.random.RandomState(seed)
+
+    def _load(self, source):
+        if isinstance(source, np.ndarray):
+            return source
+        return cv2.imread(str(source))
+
+    def _predict_one(self, img):
+        import torch
+        from ultralytics.engine.results import Results
+
+        h, w = img.shape[:2]
+
+        # Preprocesado equivalente (resize + normalización)
+        resized = cv2.resize(img, (self.imgsz, self.imgsz))
+        _ = resized[:, :, ::-1].astype(np.float32) / 255.0
+
+        rows = []
+        for person in synthetic_boxes(self.persons_per_frame, w, h, self.rng):
+            px1, py1, px2, py2 = person
+            rows.append([px1, py1, px2, py2, 0.9, 6])
+            pw, ph = px2 - px1, py2 - py1
+            for k, class_id in enumerate(STAND_IN_ITEMS):
+                if self.rng.rand() < 0.8:
+                    iy = py1 + ph * k / len(STAND_IN_ITEMS)
+                    rows.append([px1 + pw * 0.2, iy, px2 - pw * 0.2, iy + ph / len(STAND_IN_ITEMS), 0.7, class_id])
+
+        boxes = torch.tensor(rows, dtype=torch.float32) if rows else torch.zeros((0, 6))
+        return Results(orig_img=img, path='synthetic', names=self.names, boxes=boxes)
+
+    def predict(self, source, conf=0.25, verbose=False, **kwargs):
+        sources = source if isinstance(source, list) else [source]
+        return [self._predict_one(self._load(s)) for s in sources]
+
+
+# ============================================
+# UTILIDADES DE MEDICIÓN
+# ============================================
+def measure(result, run, memory=True):
+    """
+    Mide `run()`: el tiempo en una ejecución sin trazado y el pico de
+    memoria Python en otra con tracemalloc (el trazado infla los tiempos)
+    """
+    start = time.perf_counter()
+    run()
+    result['seconds'] = time.perf_counter() - start
+    if not memory:
+        return result
+
+    tracemalloc.start()
+    try:
+        run()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    result['peak_mem_mb'] = peak / (1024 * 1024)
+    return result
+
+
+@contextlib.contextmanager
+def quiet():
+    """Silencia prints y el log de eventos (stderr) durante el bloque"""
+    configure_event_log(stream=io.StringIO())
+    try:
+        with contextlib.redirect_stdout(io.StringIO()):
+            yield
+    finally:
+        configure_event_log()
+
+
+def max_rss_mb():
+    """Pico de memoria del proceso, o None donde no hay `resource` (Windows)"""
+    try:
+        import resource
+    except ImportError:
+        return None
+    # ru_maxrss está en KB en Linux
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def git_commit():
+    """Hash del commit actual (o None fuera de un repo git)"""
+    try:
+        return subprocess.check_output(
+            ['git', 'rev-parse', '--short', 'HEAD'],
+            cwd=os.path.dirname(os.path.abspath(__file__)),
+            stderr=subprocess.DEVNULL
+        ).decode().strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+# ============================================
+# CASOS DE BENCHMARK
+# ============================================
+def bench_detect_compliance(checker, width, height, repeat, batch_size, tmp_dir):
+    """detect_compliance sobre una imagen y en lotes"""
+    paths = []
+    for i in range(batch_size):
+        path = os.path.join(tmp_dir, f"bench_{i}.jpg")
+        cv2.imwrite(path, synthetic_frame(width, height, seed=i))
+        paths.append(path)
+
+    # Calentamiento (no se mide)
+    checker.detect_compliance(paths[0])
+
+    def run_single():
+        for _ in range(repeat):
+            checker.detect_compliance(paths[0])
+
+    single = measure({}, run_single)
+    single['images_per_sec'] = repeat / single['seconds']
+    single['ms_per_image'] = 1000 * single['seconds'] / repeat
+
+    def run_batched():
+        for _ in range(repeat):
+            checker.detect_compliance_batch(paths)
+
+    batched = measure({'batch_size': batch_size}, run_batched)
+    batched['images_per_sec'] = repeat * batch_size / batched['seconds']
+    batched['ms_per_image'] = 1000 * batched['seconds'] / (repeat * batch_size)
+
+    return {'single': single, 'batched': batched}
+
+
+def bench_check_overlap(checker, repeat, person_counts=(1, 5, 20), item_counts=(1, 10, 50)):
+    """Asociación persona-item con distintas densidades de escena"""
+    rng = np.random.RandomState(0)
+    cases = []
+
+    for n_persons in person_counts:
+        for n_items in item_counts:
+            persons = synthetic_boxes(n_persons, 1920, 1080, rng)
+            items = synthetic_boxes(n_items, 1920, 1080, rng)
+
+            def run_case():
+                for _ in range(repeat):
+                    for person in persons:
+                        checker.check_overlap(person, items)
+
+            case = measure({'persons': n_persons, 'items': n_items}, run_case)
+            case['us_per_scene'] = 1e6 * case['seconds'] / repeat
+            cases.append(case)
+
+    return cases
+
+
+def bench_dataset_cache(checker, cache, batch_size):
+    """Split etiquetado: decodificando JPEG vs leyendo del cache pre-decodificado"""
+    paths = [cache.path(i) for i in range(len(cache))]
+
+    def run_from_disk():
+        for start in range(0, len(paths), batch_size):
+            checker.detect_compliance_batch(paths[start:start + batch_size])
+
+    from_disk = measure({}, run_from_disk)
+    from_disk['images_per_sec'] = len(paths) / from_disk['seconds']
+
+    cached = measure({}, lambda: checker.detect_compliance_cached(cache, batch_size=batch_size))
+    cached['images_per_sec'] = len(paths) / cached['seconds']
+
+    return {'images': len(paths), 'from_disk': from_disk, 'cached': cached}
+
+
+def bench_video_stages(analyzer, video_path, output_dir):
+    """
+    Desglose por etapa de analyze_video
+
+    Lee los timers que el propio pipeline registra (metrics.py), así que
+    mide el mismo código que corre en producción.
+    """
+    # Una sola ejecución (sin tracemalloc) para que los timers no sumen dos pasadas
+    analyzer.metrics.reset()
+    with quiet():
+        result = measure({}, lambda: analyzer.analyze_video(video_path, output_dir=output_dir), memory=False)
+
+    frames = analyzer.total_frames
+    result['frames'] = frames
+    result['fps'] = frames / result['seconds'] if result['seconds'] > 0 else 0
+    result['stages_ms_per_frame'] = {
+        stage['labels']['stage']: 1000 * stage['sum'] / max(frames, 1)
+        for stage in analyzer.metrics.snapshot()['stages']
+        if stage['labels'].get('component') == 'video'
+    }
+    return result
+
+
+def bench_analyze_video(analyzer, video_path, output_dir):
+    """analyze_video de extremo a extremo (FPS efectivo)"""
+    # Silenciar la salida de progreso y reporte del analizador
+    with quiet():
+        result = measure({}, lambda: analyzer.analyze_video(video_path, output_dir=output_dir))
+    result['frames'] = analyzer.total_frames
+    result['fps'] = analyzer.total_frames / result['seconds'] if result['seconds'] > 0 else 0
+    return result
+
+
+def run_benchmarks(model_path=None, width=1280, height=720, frames=60, repeat=20, batch_size=8, cache_dir=None):
+    """Ejecuta todos los casos y devuelve el resultado como dict"""
+    model = None if model_path else StandInModel()
+
+    with quiet():
+        checker = EPPComplianceChecker(model_path or 'stand-in', model=model)
+
+    def new_analyzer():
+        # Analizador y registro propios por caso: sin estado ni etapas de otro caso
+        with quiet():
+            return VideoEPPAnalyzer(model_path or 'stand-in', model=model, metrics=MetricsRegistry())
+
+    report = {
+        'meta': {
+            'commit': git_commit(),
+            'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'python': sys.version.split()[0],
+            'platform': platform.platform(),
+            'model': model_path or 'stand-in',
+            'config': {
+                'width': width, 'height': height, 'frames': frames,
+                'repeat': repeat, 'batch_size': batch_size, 'cache_dir': cache_dir
+            }
+        }
+    }
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        print("⏱️  detect_compliance...")
+        report['detect_compliance'] = bench_detect_compliance(checker, width, height, repeat, batch_size, tmp_dir)
+
+        if cache_dir:
+            from dataset_cache import DatasetCache
+            print("⏱️  dataset cache...")
+            report['dataset_cache'] = bench_dataset_cache(checker, DatasetCache(cache_dir), batch_size)
+
+        print("⏱️  check_overlap...")
+        report['check_overlap'] = bench_check_overlap(checker, repeat)
+
+        print("⏱️  video (por etapa)...")
+        video_path = write_synthetic_video(os.path.join(tmp_dir, 'bench.mp4'), frames, width, height)
+        report['video_stages'] = bench_video_stages(new_analyzer(), video_path, tmp_dir)
+
+        print("⏱️  analyze_video...")
+        report['analyze_video'] = bench_analyze_video(new_analyzer(), video_path, tmp_dir)
+
+    report['meta']['max_rss_mb'] = max_rss_mb()
+    return report
+
+
+def flatten(data, prefix=''):
+    """Aplana el reporte a {ruta.clave: valor numérico} para comparar"""
+    flat = {}
+    if isinstance(data, dict):
+        for key, value in data.items():
+            if key == 'meta':
+                continue
+            flat.update(flatten(value, f"{prefix}{key}."))
+    elif isinstance(data, list):
+        for i, value in enumerate(data):
+            flat.update(flatten(value, f"{prefix}{i}."))
+    elif isinstance(data, (int, float)) and not isinstance(data, bool):
+        flat[prefix.rstrip('.')] = data
+    return flat
+
+
+def compare_reports(baseline, current):
+    """Imprime la variación de cada métrica contra un reporte anterior"""
+    base_flat = flatten(baseline)
+    curr_flat = flatten(current)
+
+    print("\n" + "="*70)
+    print(f"📊 COMPARACIÓN {baseline['meta'].get('commit')} → {current['meta'].get('commit')}")
+    print("="*70)
+    for key, value in curr_flat.items():
+        if key not in base_flat or not base_flat[key]:
+            continue
+        change = (value - base_flat[key]) / base_flat[key] * 100
+        print(f"   {key:<55} {change:+7.1f}%")
+    print("="*70)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark de pipelines EPP")
+    parser.add_argument('--model', default=None, help="Pesos reales (por defecto: modelo de reemplazo)")
+    parser.add_argument('--width', type=int, default=1280)
+    parser.add_argument('--height', type=int, default=720)
+    parser.add_argument('--frames', type=int, default=60, help="Frames del video sintético")
+    parser.add_argument('--repeat', type=int, default=20)
+    parser.add_argument('--batch-size', type=int, default=8)
+    parser.add_argument('--cache', default=None, help="Cache pre-decodificado (dataset_cache.py) a medir")
+    parser.add_argument('--output', default=None, help="Archivo JSON de salida")
+    parser.add_argument('--compare', default=None, help="Reporte JSON anterior para comparar")
+    args = parser.parse_args()
+
+    report = run_benchmarks(
+        model_path=args.model,
+        width=args.width,
+        height=args.height,
+        frames=args.frames,
+        repeat=args.repeat,
+        batch_size=args.batch_size,
+        cache_dir=args.cache
+    )
+
+    text = json.dumps(report, indent=2)
+    if args.output:
+        os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+        with open(args.output, 'w', encoding='utf-8') as f:
+            f.write(text)
+        print(f"💾 Resultados guardados en: {args.output}")
+    else:
+        print(text)
+
+    if args.compare:
+        with open(args.compare, 'r', encoding='utf-8') as f:
+            compare_reports(json.load(f), report)
+
+
+if __name__ == "__main__":
+    main()
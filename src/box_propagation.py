@@ -0,0 +1,163 @@
+import cv2
+import numpy as np
+
+
+class BoxPropagator:
+    """
+    Propaga las cajas del último keyframe con flujo óptico disperso (Lucas-Kanade)
+
+    En cada keyframe se toman puntos característicos dentro de cada caja;
+    en los frames intermedios cada caja se desplaza con la mediana del
+    movimiento de sus puntos. Si se pierden demasiados puntos (confianza de
+    propagación baja) o se alcanza el intervalo, se pide una detección nueva.
+
+    ============================================
+    CONFIANZA DE PROPAGACIÓN:
+    ============================================
+    Por caja: fracción de sus puntos (del keyframe) que siguen activos
+    Por frame: mínimo entre cajas (la peor manda)
+    Keyframe sin cajas: 1 - fracción de píxeles que cambiaron respecto
+    del keyframe (alguien que entra en escena baja la confianza)
+    ============================================
+    """
+
+    def __init__(self, keyframe_interval=10, min_confidence=0.5, max_points=20, scale=0.5,
+                 empty_change=0.02, diff_threshold=25):
+        """
+        Args:
+            keyframe_interval: Frames entre detecciones completas
+            min_confidence: Confianza mínima para seguir propagando
+            max_points: Puntos característicos por caja
+            scale: Escala del frame para el flujo óptico
+            empty_change: Fracción de píxeles cambiados que fuerza una detección
+                cuando el keyframe no tenía cajas
+            diff_threshold: Diferencia de gris para considerar un píxel cambiado
+        """
+        self.keyframe_interval = keyframe_interval
+        self.min_confidence = min_confidence
+        self.max_points = max_points
+        self.scale = scale
+        self.empty_change = empty_change
+        self.diff_threshold = diff_threshold
+        self.clear()
+
+    def clear(self):
+        """Olvida el keyframe actual (llamar al empezar un video nuevo)"""
+        self._gray = None
+        self._data = None
+        self._points = None
+        self._owner = None
+        self._initial = None
+        self._names = None
+        self._path = None
+        self._since = 0
+        self.confidence = 1.0
+
+    def _prepare(self, frame):
+        gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY) if frame.ndim == 3 else frame
+        if self.scale != 1:
+            gray = cv2.resize(gray, None, fx=self.scale, fy=self.scale, interpolation=cv2.INTER_AREA)
+        return gray
+
+    def _sample_points(self, gray, boxes):
+        """Puntos característicos dentro de cada caja (rejilla 3x3 si no hay textura)"""
+        h, w = gray.shape
+        points, owner = [], []
+        for i, (x1, y1, x2, y2) in enumerate(boxes * self.scale):
+            x1, y1 = max(0, int(x1)), max(0, int(y1))
+            x2, y2 = min(w, int(np.ceil(x2))), min(h, int(np.ceil(y2)))
+            if x2 - x1 < 2 or y2 - y1 < 2:
+                continue
+
+            corners = cv2.goodFeaturesToTrack(gray[y1:y2, x1:x2], self.max_points, 0.01, 3)
+            if corners is not None:
+                pts = corners.reshape(-1, 2) + (x1, y1)
+            else:
+                gx, gy = np.meshgrid(np.linspace(x1, x2 - 1, 3), np.linspace(y1, y2 - 1, 3))
+                pts = np.stack([gx.ravel(), gy.ravel()], axis=1)
+
+            points.append(pts.astype(np.float32))
+            owner.append(np.full(len(pts), i))
+
+        if not points:
+            return np.zeros((0, 1, 2), np.float32), np.zeros(0, int)
+        return np.concatenate(points).reshape(-1, 1, 2), np.concatenate(owner)
+
+    def reset(self, frame, results):
+        """Nuevo keyframe: guarda las detecciones y sus puntos a seguir"""
+        self._gray = self._prepare(frame)
+        self._data = results.boxes.data.cpu().numpy().copy()
+        self._names = results.names
+        self._path = results.path
+        self._points, self._owner = self._sample_points(self._gray, self._data[:, :4])
+        self._initial = np.bincount(self._owner, minlength=len(self._data))
+        self._since = 0
+        self.confidence = 1.0
+
+    def propagate(self, frame):
+        """
+        Desplaza las cajas del keyframe hasta el frame actual
+
+        Returns:
+            Results | None: Detecciones propagadas sobre `frame`, o None si
+            toca detectar (intervalo cumplido o confianza insuficiente)
+        """
+        if self._data is None or self._since + 1 >= self.keyframe_interval:
+            return None
+
+        gray = self._prepare(frame)
+        data = self._data.copy()
+
+        # Sin cajas no hay puntos que seguir: se compara contra el keyframe
+        if len(data) == 0:
+            changed = np.count_nonzero(cv2.absdiff(self._gray, gray) > self.diff_threshold) / gray.size
+            self.confidence = max(0.0, 1.0 - changed / self.empty_change) if self.empty_change else 0.0
+            if changed > self.empty_change:
+                return None
+            self._since += 1
+            return self._to_results(frame, data)
+
+        if len(self._points):
+            moved, status, _ = cv2.calcOpticalFlowPyrLK(
+                self._gray, gray, self._points, None, winSize=(15, 15), maxLevel=2
+            )
+            ok = status.ravel() == 1
+            shift = (moved - self._points).reshape(-1, 2) / self.scale
+
+            # Cajas demasiado pequeñas para tener puntos se mantienen en su sitio
+            tracked = np.bincount(self._owner[ok], minlength=len(data))
+            ratios = np.where(self._initial > 0, tracked / np.maximum(self._initial, 1), 1.0)
+            self.confidence = float(ratios.min()) if len(ratios) else 1.0
+            if self.confidence < self.min_confidence:
+                return None
+
+            for i in range(len(data)):
+                mask = ok & (self._owner == i)
+                if not mask.any():
+                    continue
+                dx, dy = np.median(shift[mask], axis=0)
+                data[i, [0, 2]] += dx
+                data[i, [1, 3]] += dy
+
+            self._points = moved[ok]
+            self._owner = self._owner[ok]
+
+        h, w = frame.shape[:2]
+        data[:, [0, 2]] = data[:, [0, 2]].clip(0, w)
+        data[:, [1, 3]] = data[:, [1, 3]].clip(0, h)
+
+        self._gray = gray
+        self._data = data
+        self._since += 1
+        return self._to_results(frame, data)
+
+    def _to_results(self, frame, data):
+        import torch
+        from ultralytics.engine.results import Results
+
+        return Results(
+            orig_img=frame,
+            path=self._path,
+            names=self._names,
+            boxes=torch.from_numpy(data.astype(np.float32))
+        )
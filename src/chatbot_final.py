@@ -1,4 +1,9 @@
 from compliance_checker import EPPComplianceChecker
+from event_log import get_event_logger
+from exporters import image_analysis_from_rows, load_results
+from history_store import HistoryStore, time_range
+import re
+from reports import render_text
 import os
 
 class ChatbotEPP:
@@ -6,20 +11,21 @@ class ChatbotEPP:
     Chatbot unificado: Responde normativas + Analiza imágenes
     """
     
-    def __init__(self, model_path):
-        self.checker = EPPComplianceChecker(model_path)
+    def __init__(self, model_path, history=None, model=None):
+        self.history = history
+        self.checker = EPPComplianceChecker(model_path, model=model, history=history)
         self.last_analysis = None
         self.last_image = None
-        print("🤖 Chatbot EPP inicializado")
-        print("💡 Puedo responder preguntas sobre normativas")
-        print("📸 También puedo analizar imágenes si me las das\n")
+        self.last_video = None
+        self.log = get_event_logger()
+        self.log.info('chatbot_ready')
     
     def analizar_imagen(self, image_path):
         """Analiza una imagen y guarda resultados"""
         if not os.path.exists(image_path):
             return f"❌ No encontré la imagen: {image_path}"
         
-        print(f"\n🔍 Analizando: {image_path}")
+        self.log.info('chatbot_analyze', image=image_path)
         self.last_analysis = self.checker.detect_compliance(image_path)
         self.last_image = image_path
         
@@ -32,11 +38,43 @@ class ChatbotEPP:
                 f"✓ {compliant} en cumplimiento\n\n"
                 f"Ahora puedes preguntarme: '¿cumple?', '¿qué falta?', etc.")
     
+    def cargar_resultados(self, path):
+        """Carga resultados exportados (imagen o video) sin re-analizar"""
+        if not os.path.exists(path):
+            return f"❌ No encontré los resultados: {path}"
+        
+        loaded = load_results(path)
+        summary = loaded['summary']
+        
+        if summary.get('kind') == 'video':
+            self.last_video = loaded
+            return (f"✅ Resultados de video cargados\n"
+                    f"🎬 {summary.get('total_frames', 0)} frames, "
+                    f"{summary.get('compliance_rate', 0):.1f}% en cumplimiento\n\n"
+                    f"Pregúntame: '¿cómo salió el video?'")
+        
+        if 'persons' not in loaded:
+            return "❌ Los resultados no contienen personas analizadas"
+        
+        self.last_analysis = image_analysis_from_rows(loaded['persons'].to_dict('records'))
+        self.last_image = self.last_analysis['image']
+        return (f"✅ Resultados cargados: {self.last_image}\n"
+                f"👥 {self.last_analysis['total_persons']} persona(s)\n\n"
+                f"Ahora puedes preguntarme: '¿cumple?', '¿qué falta?', etc.")
+    
     def responder(self, pregunta):
         """Responde preguntas (normativas o sobre la imagen analizada)"""
         
         pregunta_lower = pregunta.lower()
         
+        # ============================================
+        # PREGUNTAS SOBRE EL HISTORIAL
+        # ============================================
+        if self.history is not None:
+            respuesta = self._responder_historial(pregunta_lower)
+            if respuesta:
+                return respuesta
+        
         # ============================================
         # PREGUNTAS SOBRE LA IMAGEN ANALIZADA
         # ============================================
@@ -58,6 +96,12 @@ class ChatbotEPP:
             if any(word in pregunta_lower for word in ['reporte', 'resumen', 'todo']):
                 return self._responder_reporte()
         
+        # ============================================
+        # PREGUNTAS SOBRE EL VIDEO CARGADO
+        # ============================================
+        if self.last_video and 'video' in pregunta_lower:
+            return self._responder_video()
+        
         # ============================================
         # PREGUNTAS SOBRE NORMATIVAS (GENERALES)
         # ============================================
@@ -210,8 +254,76 @@ class ChatbotEPP:
     
     def _responder_reporte(self):
         """Genera reporte completo"""
-        self.checker.generate_report(self.last_analysis)
-        return "📊 Reporte mostrado arriba ⬆️"
+        report = self.checker.generate_report(self.last_analysis, renderer=None)
+        return render_text(report)
+    
+    def _responder_historial(self, pregunta_lower):
+        """Responde preguntas agregadas con consultas indexadas al historial"""
+        # Periodo
+        period = None
+        for word, name in (('hoy', 'hoy'), ('ayer', 'ayer'), ('semana', 'semana'), ('mes', 'mes')):
+            if word in pregunta_lower:
+                period = name
+                break
+        since, until = time_range(period)
+        period_text = {'hoy': 'hoy', 'ayer': 'ayer', 'semana': 'esta semana', 'mes': 'este mes'}.get(period, 'en total')
+        
+        # Cámara ("cámara norte", "camara 2")
+        match = re.search(r'c[aá]mara\s+([\w-]+)', pregunta_lower)
+        camera = match.group(1) if match else None
+        
+        # ¿Qué video tuvo más violaciones?
+        if 'video' in pregunta_lower and any(word in pregunta_lower for word in ['más', 'mas', 'peor']):
+            top = self.history.top_videos(limit=1, camera=camera, since=since, until=until)
+            if not top:
+                return f"📭 No hay videos analizados {period_text}"
+            video = top[0]
+            return (f"🎥 **VIDEO CON MÁS VIOLACIONES** ({period_text})\n\n"
+                    f"📁 {video['source']} (cámara {video['camera']})\n"
+                    f"❌ {video['violation_frames']} frames con violaciones "
+                    f"de {video['total_frames']}\n"
+                    f"📈 Cumplimiento: {video['compliance_rate']:.1f}%")
+        
+        # ¿Cuántas violaciones (de casco) hoy?
+        if any(word in pregunta_lower for word in ['cuánt', 'cuant']) and 'violaci' in pregunta_lower:
+            item = None
+            for word, name in (('casco', 'casco'), ('chaleco', 'chaleco'), ('guante', 'guantes'),
+                               ('gafa', 'gafas'), ('lente', 'gafas')):
+                if word in pregunta_lower:
+                    item = name
+                    break
+            
+            counts = self.history.count_violations(item=item, camera=camera, since=since, until=until)
+            scope = f" de {item}" if item else ""
+            where = f" en cámara {camera}" if camera else ""
+            
+            if not counts:
+                return f"✅ No hay violaciones{scope}{where} registradas {period_text}"
+            
+            response = f"📊 **VIOLACIONES{scope.upper()}{where.upper()}** ({period_text})\n\n"
+            for name, total in sorted(counts.items(), key=lambda x: -x[1]):
+                response += f"❌ {name}: {total}\n"
+            return response
+        
+        return None
+    
+    def _responder_video(self):
+        """Resume los resultados de video cargados"""
+        summary = self.last_video['summary']
+        events = self.last_video.get('events')
+        
+        response = "🎥 **RESULTADOS DEL VIDEO**\n\n"
+        response += f"📁 {os.path.basename(summary.get('input_video', ''))}\n"
+        response += f"🎬 Frames: {summary.get('total_frames', 0)}\n"
+        response += f"✅ Cumplimiento: {summary.get('compliance_rate', 0):.1f}%\n"
+        response += f"❌ Frames con violaciones: {summary.get('violation_frames', 0)}\n"
+        
+        if events is not None and len(events) > 0:
+            longest = events.sort_values('duration', ascending=False).iloc[0]
+            response += (f"\n⚠️ {len(events)} tramo(s) de violación; el más largo "
+                         f"de {longest['start_time']:.1f}s a {longest['end_time']:.1f}s")
+        
+        return response
     
     def _mostrar_ayuda(self):
         """Muestra ayuda"""
@@ -224,6 +336,11 @@ class ChatbotEPP:
             help_text += "  • '¿qué detectaste?'\n"
             help_text += "  • 'reporte completo'\n\n"
         
+        if self.history is not None:
+            help_text += "**Sobre el historial:**\n"
+            help_text += "  • '¿cuántas violaciones de casco hoy?'\n"
+            help_text += "  • '¿qué video tuvo más violaciones esta semana?'\n\n"
+        
         help_text += "**Preguntas generales:**\n"
         help_text += "  • 'normativas obligatorias'\n"
         help_text += "  • '¿qué es un casco?'\n"
@@ -244,7 +361,7 @@ def ejecutar_chatbot():
     print("="*70)
     
     # Inicializar
-    chatbot = ChatbotEPP('../runs/detect/train10/weights/best.pt')
+    chatbot = ChatbotEPP('../runs/detect/train10/weights/best.pt', history=HistoryStore('../results/history.db'))
     
     print("\n📸 PASO 1: ¿Quieres analizar una imagen? (s/n)")
     analizar = input("Respuesta: ").strip().lower()
@@ -275,6 +392,9 @@ def ejecutar_chatbot():
         if pregunta.lower().startswith('analizar '):
             ruta = pregunta.split('analizar ', 1)[1]
             respuesta = chatbot.analizar_imagen(ruta)
+        elif pregunta.lower().startswith('cargar '):
+            ruta = pregunta.split('cargar ', 1)[1]
+            respuesta = chatbot.cargar_resultados(ruta)
         else:
             respuesta = chatbot.responder(pregunta)
         
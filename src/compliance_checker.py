@@ -1,6 +1,99 @@
-from ultralytics import YOLO
 import numpy as np
 
+from event_log import get_event_logger
+from metrics import METRICS, record_predict_speed
+from model_quantizer import resolve_model_path
+from records import ITEM_BITS, PersonRecords, complies, missing_items
+from reports import build_image_report, render_console
+from safety_zones import predict_in_zones
+
+
+# Versión de las reglas de cumplimiento (assess_person / check_overlap).
+# Incrementar al cambiar criterios para invalidar auditorías previas.
+POLICY_VERSION = 1
+
+
+def check_overlap(person_box, item_boxes, threshold=0.3):
+    """
+    Verifica si algún item (casco, chaleco, etc.) se superpone con la persona
+    
+    Args:
+        person_box: [x1, y1, x2, y2] - Caja de la persona
+        item_boxes: Lista de cajas [x1, y1, x2, y2] - Items detectados
+        threshold: % de superposición mínimo
+    
+    Returns:
+        bool: True si hay superposición suficiente
+    """
+    if len(item_boxes) == 0:
+        return False
+    
+    px1, py1, px2, py2 = person_box
+    
+    for item in item_boxes:
+        ix1, iy1, ix2, iy2 = item
+        
+        # Calcular área de intersección
+        x1 = max(px1, ix1)
+        y1 = max(py1, iy1)
+        x2 = min(px2, ix2)
+        y2 = min(py2, iy2)
+        
+        if x2 > x1 and y2 > y1:
+            intersection = (x2 - x1) * (y2 - y1)
+            item_area = (ix2 - ix1) * (iy2 - iy1)
+            
+            # Si el item está al menos threshold% superpuesto
+            if intersection / item_area > threshold:
+                return True
+    
+    return False
+
+def person_items(person_bbox, boxes):
+    """
+    EPP presentes de una persona como máscara de bits (ver records.ITEM_BITS)
+    
+    Args:
+        person_bbox: [x1, y1, x2, y2] - Caja de la persona
+        boxes: Dict {clase: lista de cajas} (helmet, vest, boots, goggles, gloves)
+    
+    Returns:
+        int: OR de los bits de los EPP superpuestos con la persona
+    """
+    present = 0
+    for name, bit in ITEM_BITS.items():
+        if check_overlap(person_bbox, boxes.get(name, [])):
+            present |= bit
+    return present
+
+def assess_person(person_bbox, boxes):
+    """
+    Evalúa el EPP de una persona con la misma lógica para predicciones y etiquetas
+    
+    Args:
+        person_bbox: [x1, y1, x2, y2] - Caja de la persona
+        boxes: Dict {clase: lista de cajas} (helmet, vest, boots, goggles, gloves)
+    
+    Returns:
+        dict: has_* por EPP, complies y missing_items
+    """
+    present = person_items(person_bbox, boxes)
+    
+    # ============================================
+    # CRITERIO DE CUMPLIMIENTO
+    # ============================================
+    # OBLIGATORIOS: casco + chaleco + guantes + gafas
+    # OPCIONALES: botas (records.REQUIRED)
+    return {
+        'complies': bool(complies(present)),
+        'has_helmet': bool(present & ITEM_BITS['helmet']),
+        'has_vest': bool(present & ITEM_BITS['vest']),
+        'has_boots': bool(present & ITEM_BITS['boots']),
+        'has_goggles': bool(present & ITEM_BITS['goggles']),
+        'has_gloves': bool(present & ITEM_BITS['gloves']),
+        'missing_items': missing_items(present)
+    }
+
 
 class EPPComplianceChecker:
     """
@@ -20,202 +113,251 @@ class EPPComplianceChecker:
     ============================================
     """
     
-    def __init__(self, model_path):
-        """Inicializar con el modelo entrenado"""
-        self.model = YOLO(model_path)
-        print(f"✅ Modelo cargado: {model_path}")
-        print(f"📋 Clases: {self.model.names}")
+    def __init__(self, model_path, model=None, metrics=None, history=None, camera='default', zones=None,
+                 cascade=None, preprocessor=None):
+        """
+        Inicializar con el modelo entrenado (o su variante cuantizada activa)
+        
+        Args:
+            model_path: Ruta de los pesos del modelo
+            model: Modelo ya cargado (opcional), p. ej. un modelo de reemplazo para benchmarks
+            metrics: Registro de métricas (por defecto el global del proceso)
+            history: HistoryStore donde guardar cada análisis (opcional)
+            camera: Cámara / sitio con el que se registran los análisis
+            zones: ZoneMap de la cámara (opcional); solo se evalúan personas dentro de las zonas
+            cascade: PersonCascade opcional; el modelo completo solo corre si hay personas
+            preprocessor: LetterboxPreprocessor opcional para arrays de resolución fija
+        """
+        self.metrics = metrics or METRICS
+        self.history = history
+        self.camera = camera
+        self.zones = zones
+        self.cascade = cascade
+        self.preprocessor = preprocessor
+        if model is None:
+            with self.metrics.timer('model_load', component='image'):
+                # Importación diferida: ultralytics/torch solo se cargan al crear el modelo
+                from ultralytics import YOLO
+                model_path = resolve_model_path(model_path)
+                model = YOLO(model_path, task='detect')
+        self.model = model
+        self.log = get_event_logger()
+        self.log.info('model_loaded', component='image', model=str(model_path), classes=self.model.names)
     
     def check_overlap(self, person_box, item_boxes, threshold=0.3):
+        """Verifica si algún item se superpone con la persona (ver check_overlap)"""
+        return check_overlap(person_box, item_boxes, threshold)
+    
+    def detect_compliance(self, image_path, conf_threshold=0.25):
         """
-        Verifica si algún item (casco, chaleco, etc.) se superpone con la persona
+        Detecta EPP y verifica cumplimiento de normativa
         
         Args:
-            person_box: [x1, y1, x2, y2] - Caja de la persona
-            item_boxes: Lista de cajas [x1, y1, x2, y2] - Items detectados
-            threshold: % de superposición mínimo
+            image_path: Ruta de la imagen a analizar
+            conf_threshold: Umbral de confianza mínimo
         
         Returns:
-            bool: True si hay superposición suficiente
+            dict: Resultados del análisis
         """
-        if len(item_boxes) == 0:
-            return False
+        # Hacer predicción
+        with self.metrics.timer('predict', component='image'):
+            results, skipped = self._predict([image_path], conf_threshold)
+        record_predict_speed(self.metrics, results[0], component='image')
         
-        px1, py1, px2, py2 = person_box
+        analysis = self._analyze_results(results[0], image_path)
+        analysis['cascade_skipped'] = bool(skipped)
+        return analysis
+    
+    def detect_compliance_batch(self, image_paths, conf_threshold=0.25):
+        """
+        Detecta EPP en varias imágenes con una sola llamada al modelo
         
-        for item in item_boxes:
-            ix1, iy1, ix2, iy2 = item
-            
-            # Calcular área de intersección
-            x1 = max(px1, ix1)
-            y1 = max(py1, iy1)
-            x2 = min(px2, ix2)
-            y2 = min(py2, iy2)
-            
-            if x2 > x1 and y2 > y1:
-                intersection = (x2 - x1) * (y2 - y1)
-                item_area = (ix2 - ix1) * (iy2 - iy1)
-                
-                # Si el item está al menos threshold% superpuesto
-                if intersection / item_area > threshold:
-                    return True
+        Args:
+            image_paths: Lista de rutas (o arrays BGR) a analizar
+            conf_threshold: Umbral de confianza mínimo
         
-        return False
+        Returns:
+            list: Resultados del análisis por imagen, en el mismo orden
+        """
+        if len(image_paths) == 0:
+            return []
+        
+        with self.metrics.timer('predict_batch', component='image'):
+            results, skipped = self._predict(list(image_paths), conf_threshold)
+        for r in results:
+            record_predict_speed(self.metrics, r, component='image')
+        
+        analyses = []
+        for i, (r, path) in enumerate(zip(results, image_paths)):
+            analysis = self._analyze_results(r, path)
+            analysis['cascade_skipped'] = i in skipped
+            analyses.append(analysis)
+        return analyses
     
-    def detect_compliance(self, image_path, conf_threshold=0.25):
+    def _predict(self, sources, conf_threshold):
         """
-        Detecta EPP y verifica cumplimiento de normativa
+        Inferencia (con recorte de zonas) precedida por la cascada de personas
+        
+        Las imágenes sin personas se quedan con el resultado de la cascada
+        (sin cajas), que produce el mismo análisis vacío que el modelo completo.
+        
+        Returns:
+            tuple: (Results por fuente, índices resueltos solo por la cascada)
+        """
+        if self.cascade is None:
+            return predict_in_zones(self.model, sources, self.zones, preprocessor=self.preprocessor,
+                                    conf=conf_threshold, verbose=False), set()
+        
+        sources = self.cascade.load(sources)
+        with self.metrics.timer('cascade', component='image'):
+            results = self.cascade.detect(sources, self.zones)
+        positive = [i for i, r in enumerate(results) if len(r.boxes)]
+        if positive:
+            full = predict_in_zones(self.model, [sources[i] for i in positive], self.zones,
+                                    preprocessor=self.preprocessor, conf=conf_threshold, verbose=False)
+            for i, r in zip(positive, full):
+                results[i] = r
+        return results, set(range(len(results))) - set(positive)
+    
+    def detect_compliance_cached(self, cache, indices=None, conf_threshold=0.25, batch_size=16):
+        """
+        Detecta EPP sobre un DatasetCache (imágenes ya decodificadas y con letterbox)
+        
+        Las imágenes se leen directamente del memory-map, sin decodificar JPEG.
+        Las cajas quedan en el espacio letterbox; el veredicto no cambia porque
+        la asociación depende solo de proporciones de superposición. Las zonas
+        no se aplican (las imágenes del dataset no pertenecen a una cámara).
         
         Args:
-            image_path: Ruta de la imagen a analizar
+            cache: DatasetCache abierto
+            indices: Índices a analizar (por defecto todos)
             conf_threshold: Umbral de confianza mínimo
+            batch_size: Imágenes por llamada al modelo
         
         Returns:
-            dict: Resultados del análisis
+            list: Resultados del análisis por imagen
         """
-        # Hacer predicción
-        results = self.model.predict(
-            source=image_path,
-            conf=conf_threshold,
-            verbose=False
-        )[0]
-        
-        # Extraer detecciones por clase
-        persons = []
-        helmets = []
-        vests = []
-        boots = []
-        goggles = []
-        gloves = []
-        no_helmet = []
-        no_vest = []
-        no_boots = []
-        
-        for box in results.boxes:
-            class_id = int(box.cls[0])
-            class_name = self.model.names[class_id]
-            bbox = box.xyxy[0].cpu().numpy()
-            conf = float(box.conf[0])
-            
-            if class_name == 'Person':
-                persons.append({'bbox': bbox, 'conf': conf})
-            elif class_name == 'helmet':
-                helmets.append(bbox)
-            elif class_name == 'vest':
-                vests.append(bbox)
-            elif class_name == 'boots':
-                boots.append(bbox)
-            elif class_name == 'goggles':
-                goggles.append(bbox)
-            elif class_name == 'gloves':
-                gloves.append(bbox)
-            elif class_name == 'no_helmet':
-                no_helmet.append(bbox)
-            elif class_name == 'no_vest':
-                no_vest.append(bbox)
-            elif class_name == 'no_boots':
-                no_boots.append(bbox)
-        
-        # Análisis de cumplimiento por persona
-        compliance_results = []
-        
-        for i, person in enumerate(persons):
-            person_bbox = person['bbox']
-            
-            # Verificar cada EPP
-            has_helmet = self.check_overlap(person_bbox, helmets)
-            has_vest = self.check_overlap(person_bbox, vests)
-            has_boots = self.check_overlap(person_bbox, boots)
-            has_goggles = self.check_overlap(person_bbox, goggles)
-            has_gloves = self.check_overlap(person_bbox, gloves)
-            
-            # Verificar violaciones
-            missing_helmet = self.check_overlap(person_bbox, no_helmet)
-            missing_vest = self.check_overlap(person_bbox, no_vest)
-            missing_boots = self.check_overlap(person_bbox, no_boots)
-            
-            # ============================================
-            # CRITERIO DE CUMPLIMIENTO
-            # ============================================
-            # OBLIGATORIOS: casco + chaleco + guantes + gafas
-            # OPCIONALES: botas
-            complies = (has_helmet and has_vest and has_gloves and has_goggles)
-            
-            # Identificar elementos faltantes
-            missing_items = []
-            if not has_helmet:
-                missing_items.append('casco')
-            if not has_vest:
-                missing_items.append('chaleco')
-            if not has_gloves:
-                missing_items.append('guantes')
-            if not has_goggles:
-                missing_items.append('gafas')
+        analyses = []
+        for chunk, images in cache.batches(batch_size, indices):
+            with self.metrics.timer('predict_batch', component='image'):
+                results = self.model.predict(
+                    source=images,
+                    conf=conf_threshold,
+                    imgsz=cache.imgsz,
+                    verbose=False
+                )
+            for i, r in zip(chunk, results):
+                record_predict_speed(self.metrics, r, component='image')
+                analyses.append(self._analyze_results(r, cache.path(i), apply_zones=False))
+        return analyses
+    
+    def _analyze_results(self, results, image_path, apply_zones=True):
+        """Convierte la salida del modelo en el análisis de cumplimiento"""
+        with self.metrics.timer('extraction', component='image'):
+            # Extraer detecciones por clase
+            persons = []
+            helmets = []
+            vests = []
+            boots = []
+            goggles = []
+            gloves = []
+            no_helmet = []
+            no_vest = []
+            no_boots = []
+        
+            for box in results.boxes:
+                class_id = int(box.cls[0])
+                class_name = self.model.names[class_id]
+                bbox = box.xyxy[0].cpu().numpy()
+                conf = float(box.conf[0])
             
-            # Botas son opcionales (recomendadas)
-            if not has_boots:
-                missing_items.append('botas (recomendado)')
+                if class_name == 'Person':
+                    persons.append({'bbox': bbox, 'conf': conf})
+                elif class_name == 'helmet':
+                    helmets.append(bbox)
+                elif class_name == 'vest':
+                    vests.append(bbox)
+                elif class_name == 'boots':
+                    boots.append(bbox)
+                elif class_name == 'goggles':
+                    goggles.append(bbox)
+                elif class_name == 'gloves':
+                    gloves.append(bbox)
+                elif class_name == 'no_helmet':
+                    no_helmet.append(bbox)
+                elif class_name == 'no_vest':
+                    no_vest.append(bbox)
+                elif class_name == 'no_boots':
+                    no_boots.append(bbox)
+        
+        # Filtrar personas fuera de las zonas de la cámara (paso vectorizado)
+        outside_zones = 0
+        zone_labels, zone_names = None, ()
+        if self.zones is not None and apply_zones and persons:
+            with self.metrics.timer('zones', component='image'):
+                inside, labels = self.zones.locate([p['bbox'] for p in persons], results.orig_shape)
+                outside_zones = int((~inside).sum())
+                zone_labels = labels[inside]
+                zone_names = [z.name for z in self.zones.zones]
+                persons = [p for p, ok in zip(persons, inside) if ok]
+        
+        # Análisis de cumplimiento por persona (registros compactos, ver records.py)
+        with self.metrics.timer('association', component='image'):
+            item_boxes = {
+                'helmet': helmets,
+                'vest': vests,
+                'boots': boots,
+                'goggles': goggles,
+                'gloves': gloves
+            }
             
-            compliance_results.append({
-                'person_id': i + 1,
-                'complies': complies,
-                'has_helmet': has_helmet,
-                'has_vest': has_vest,
-                'has_boots': has_boots,
-                'has_goggles': has_goggles,
-                'has_gloves': has_gloves,
-                'missing_items': missing_items,
-                'confidence': person['conf']
-            })
-        
-        return {
+            compliance_results = PersonRecords.build(
+                [person_items(p['bbox'], item_boxes) for p in persons],
+                [p['conf'] for p in persons],
+                [p['bbox'] for p in persons],
+                zones=zone_labels,
+                zone_names=zone_names
+            )
+            compliant = int(compliance_results.compliant.sum())
+        
+        analysis = {
             'image': image_path,
             'total_persons': len(persons),
             'total_detections': len(results.boxes),
+            'orig_shape': tuple(results.orig_shape),
+            'outside_zones': outside_zones,
             'compliance_results': compliance_results,
             'summary': {
-                'compliant': sum(1 for r in compliance_results if r['complies']),
-                'non_compliant': sum(1 for r in compliance_results if not r['complies'])
+                'compliant': compliant,
+                'non_compliant': len(persons) - compliant
             }
         }
+        
+        if self.history is not None:
+            with self.metrics.timer('history', component='image'):
+                self.history.record_image(analysis, camera=self.camera)
+        
+        self.metrics.inc('images_total', component='image')
+        self.metrics.inc('persons_total', len(persons), component='image')
+        self.metrics.inc('non_compliant_total', analysis['summary']['non_compliant'], component='image')
+        
+        return analysis
     
-    def generate_report(self, compliance_data):
-        """Genera reporte legible del análisis"""
-        print("\n" + "="*70)
-        print("📋 REPORTE DE CUMPLIMIENTO DE EPP")
-        print("="*70)
-        print(f"📁 Imagen: {compliance_data['image']}")
-        print(f"👥 Personas detectadas: {compliance_data['total_persons']}")
-        print(f"📦 Total de detecciones: {compliance_data['total_detections']}")
-        print(f"✅ Personas en cumplimiento: {compliance_data['summary']['compliant']}")
-        print(f"❌ Personas sin cumplimiento: {compliance_data['summary']['non_compliant']}")
-        
-        print("\n" + "📌 CRITERIOS DE CUMPLIMIENTO".center(70))
-        print("Obligatorios: Casco + Chaleco + Guantes + Gafas")
-        print("Recomendados: Botas")
-        print("-"*70)
-        
-        for result in compliance_data['compliance_results']:
-            status = "✅ CUMPLE" if result['complies'] else "❌ NO CUMPLE"
-            print(f"\n👤 Persona {result['person_id']}: {status}")
-            print(f"   Confianza: {result['confidence']:.2%}")
-            print(f"   {'='*50}")
-            print(f"   ⛑️  Casco:    {'✓ Detectado' if result['has_helmet'] else '✗ FALTA'}")
-            print(f"   🦺 Chaleco:  {'✓ Detectado' if result['has_vest'] else '✗ FALTA'}")
-            print(f"   🧤 Guantes:  {'✓ Detectado' if result['has_gloves'] else '✗ FALTA'}")
-            print(f"   🥽 Gafas:    {'✓ Detectado' if result['has_goggles'] else '✗ FALTA'}")
-            print(f"   🥾 Botas:    {'✓ Detectado' if result['has_boots'] else '○ No detectado (opcional)'}")
-            
-            if result['missing_items']:
-                obligatorios = [x for x in result['missing_items'] if 'recomendado' not in x]
-                recomendados = [x for x in result['missing_items'] if 'recomendado' in x]
-                
-                if obligatorios:
-                    print(f"   ⚠️  FALTA (obligatorio): {', '.join(obligatorios)}")
-                if recomendados:
-                    print(f"   💡 Recomendado: {', '.join(recomendados)}")
-        
-        print("\n" + "="*70)
+    def generate_report(self, compliance_data, renderer=render_console):
+        """
+        Genera el reporte del análisis
+        
+        Args:
+            compliance_data: Resultado de detect_compliance
+            renderer: Función que presenta el reporte (consola, Streamlit, archivo) o None
+        
+        Returns:
+            ImageReport: Reporte como objeto de datos
+        """
+        report = build_image_report(compliance_data)
+        if renderer is not None:
+            renderer(report)
+        return report
 
 
 # Ejemplo de uso
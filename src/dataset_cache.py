@@ -0,0 +1,278 @@
+import argparse
+import hashlib
+import json
+import os
+
+import cv2
+import numpy as np
+
+from event_log import get_event_logger
+
+
+CACHE_VERSION = 2
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.bmp', '.webp')
+
+# Archivos del cache
+INDEX_FILE = 'index.json'
+IMAGES_FILE = 'images.npy'
+LABELS_FILE = 'labels.npy'
+OFFSETS_FILE = 'label_offsets.npy'
+
+# Color de relleno del letterbox (igual que Ultralytics)
+PAD_VALUE = 114
+
+
+def letterbox_geometry(h, w, imgsz):
+    """
+    Escala y relleno del letterbox para una imagen de h x w
+
+    Returns:
+        tuple: (ratio, (new_w, new_h), (pad_x, pad_y))
+    """
+    ratio = min(imgsz / h, imgsz / w)
+    new_w, new_h = int(round(w * ratio)), int(round(h * ratio))
+    return ratio, (new_w, new_h), ((imgsz - new_w) // 2, (imgsz - new_h) // 2)
+
+
+def letterbox(img, imgsz, out=None):
+    """
+    Redimensiona manteniendo proporción y rellena a imgsz x imgsz
+
+    Args:
+        img: Imagen BGR (H, W, 3)
+        imgsz: Lado del cuadrado de salida
+        out: Array destino (imgsz, imgsz, 3) opcional para no reservar memoria
+
+    Returns:
+        tuple: (imagen letterbox, ratio, (pad_x, pad_y))
+    """
+    ratio, (new_w, new_h), (pad_x, pad_y) = letterbox_geometry(*img.shape[:2], imgsz)
+
+    if out is None:
+        out = np.empty((imgsz, imgsz, 3), dtype=np.uint8)
+    out[...] = PAD_VALUE
+    out[pad_y:pad_y + new_h, pad_x:pad_x + new_w] = cv2.resize(
+        img, (new_w, new_h), interpolation=cv2.INTER_LINEAR
+    )
+    return out, ratio, (pad_x, pad_y)
+
+
+def file_signature(path, use_hash=False):
+    """Firma de un archivo para invalidar el cache (mtime + tamaño, o hash)"""
+    stat = os.stat(path)
+    signature = {'mtime': stat.st_mtime, 'size': stat.st_size}
+    if use_hash:
+        with open(path, 'rb') as f:
+            signature['sha1'] = hashlib.sha1(f.read()).hexdigest()
+    return signature
+
+
+def _label_signature(label_path, use_hash=False):
+    """Firma del archivo de etiquetas, o None si la imagen no tiene etiquetas"""
+    return file_signature(label_path, use_hash) if os.path.exists(label_path) else None
+
+
+def _label_path(labels_dir, name):
+    return os.path.join(labels_dir, os.path.splitext(name)[0] + '.txt')
+
+
+def _read_labels(label_path):
+    if not os.path.exists(label_path):
+        return np.zeros((0, 5), dtype=np.float32)
+    rows = np.loadtxt(label_path, dtype=np.float32, ndmin=2)
+    return rows.reshape(-1, 5) if rows.size else np.zeros((0, 5), dtype=np.float32)
+
+
+def _list_images(images_dir):
+    return sorted(n for n in os.listdir(images_dir) if n.lower().endswith(IMAGE_EXTENSIONS))
+
+
+def _entry_changed(entry, signature):
+    if 'sha1' in signature:
+        return entry.get('sha1') != signature['sha1']
+    return entry['mtime'] != signature['mtime'] or entry['size'] != signature['size']
+
+
+def build_cache(images_dir, cache_dir, labels_dir=None, imgsz=640, use_hash=False):
+    """
+    Decodifica y hace letterbox de todas las imágenes una sola vez
+
+    Si el cache ya existe con las mismas imágenes, solo se vuelven a
+    decodificar las que cambiaron (según mtime/tamaño o hash). Las
+    etiquetas se releen siempre y su firma queda en el índice.
+
+    Args:
+        images_dir: Directorio de imágenes (p. ej. datasets/images/val)
+        cache_dir: Directorio donde guardar el cache
+        labels_dir: Etiquetas YOLO (por defecto images → labels)
+        imgsz: Tamaño de entrada del modelo
+        use_hash: Invalidar por hash SHA-1 en lugar de mtime/tamaño
+
+    Returns:
+        DatasetCache: Cache abierto en modo lectura
+    """
+    if labels_dir is None:
+        labels_dir = images_dir.replace('images', 'labels', 1)
+    os.makedirs(cache_dir, exist_ok=True)
+
+    names = _list_images(images_dir)
+    signatures = [file_signature(os.path.join(images_dir, n), use_hash) for n in names]
+
+    index_path = os.path.join(cache_dir, INDEX_FILE)
+    images_path = os.path.join(cache_dir, IMAGES_FILE)
+    previous = None
+    if os.path.exists(index_path) and os.path.exists(images_path):
+        with open(index_path, 'r', encoding='utf-8') as f:
+            previous = json.load(f)
+
+    reusable = (
+        previous is not None
+        and previous.get('version') == CACHE_VERSION
+        and previous.get('imgsz') == imgsz
+        and [e['name'] for e in previous['entries']] == names
+    )
+
+    if reusable:
+        images = np.load(images_path, mmap_mode='r+')
+        entries = previous['entries']
+        todo = [i for i, sig in enumerate(signatures) if _entry_changed(entries[i], sig)]
+    else:
+        images = np.lib.format.open_memmap(
+            images_path, mode='w+', dtype=np.uint8, shape=(len(names), imgsz, imgsz, 3)
+        )
+        entries = [None] * len(names)
+        todo = list(range(len(names)))
+
+    for i in todo:
+        path = os.path.join(images_dir, names[i])
+        img = cv2.imread(path)
+        if img is None:
+            raise ValueError(f"No se pudo decodificar {path}")
+        _, ratio, pad = letterbox(img, imgsz, out=images[i])
+        entries[i] = {
+            'name': names[i],
+            'orig_shape': list(img.shape[:2]),
+            'ratio': ratio,
+            'pad': list(pad),
+            **signatures[i]
+        }
+    images.flush()
+    del images
+
+    # Etiquetas compactas: [image_idx, cls, cx, cy, w, h] + offsets por imagen
+    labels, offsets = [], [0]
+    for i, name in enumerate(names):
+        label_path = _label_path(labels_dir, name)
+        entries[i]['label'] = _label_signature(label_path, use_hash)
+        rows = _read_labels(label_path)
+        labels.append(np.column_stack([np.full(len(rows), i, dtype=np.float32), rows]))
+        offsets.append(offsets[-1] + len(rows))
+    labels = np.concatenate(labels) if labels else np.zeros((0, 6), dtype=np.float32)
+    np.save(os.path.join(cache_dir, LABELS_FILE), labels.astype(np.float32))
+    np.save(os.path.join(cache_dir, OFFSETS_FILE), np.asarray(offsets, dtype=np.int64))
+
+    with open(index_path, 'w', encoding='utf-8') as f:
+        json.dump({
+            'version': CACHE_VERSION,
+            'imgsz': imgsz,
+            'images_dir': os.path.abspath(images_dir),
+            'labels_dir': os.path.abspath(labels_dir),
+            'entries': entries
+        }, f)
+
+    get_event_logger().info('cache_built', cache=cache_dir, images=len(names), decoded=len(todo))
+    return DatasetCache(cache_dir)
+
+
+class DatasetCache:
+    """
+    Lector del cache pre-decodificado (memory-mapped, sin copias)
+
+    ============================================
+    ACCESO:
+    ============================================
+    cache = DatasetCache('cache/val')
+    img = cache.image(0)        # vista (imgsz, imgsz, 3) BGR uint8
+    lbl = cache.labels(0)       # (n, 5) [cls, cx, cy, w, h]
+    boxes = cache.unscale_boxes(xyxy, 0)
+    ============================================
+    """
+
+    def __init__(self, cache_dir):
+        self.cache_dir = cache_dir
+        with open(os.path.join(cache_dir, INDEX_FILE), 'r', encoding='utf-8') as f:
+            self.index = json.load(f)
+        self.imgsz = self.index['imgsz']
+        self.entries = self.index['entries']
+        self.images = np.load(os.path.join(cache_dir, IMAGES_FILE), mmap_mode='r')
+        self._labels = np.load(os.path.join(cache_dir, LABELS_FILE), mmap_mode='r')
+        self._offsets = np.load(os.path.join(cache_dir, OFFSETS_FILE))
+
+    def __len__(self):
+        return len(self.entries)
+
+    def path(self, i):
+        return os.path.join(self.index['images_dir'], self.entries[i]['name'])
+
+    def image(self, i):
+        return self.images[i]
+
+    def labels(self, i):
+        return self._labels[self._offsets[i]:self._offsets[i + 1], 1:]
+
+    def is_stale(self):
+        """True si alguna imagen o archivo de etiquetas cambió (o apareció / se borró)"""
+        if self.index.get('version') != CACHE_VERSION:
+            return True
+        images_dir, labels_dir = self.index['images_dir'], self.index['labels_dir']
+        if not os.path.isdir(images_dir) or _list_images(images_dir) != [e['name'] for e in self.entries]:
+            return True
+        for entry in self.entries:
+            use_hash = 'sha1' in entry
+            signature = file_signature(os.path.join(images_dir, entry['name']), use_hash)
+            if _entry_changed(entry, signature):
+                return True
+            label = _label_signature(_label_path(labels_dir, entry['name']), use_hash)
+            if (label is None) != (entry['label'] is None):
+                return True
+            if label is not None and _entry_changed(entry['label'], label):
+                return True
+        return False
+
+    def unscale_boxes(self, boxes, i):
+        """Convierte cajas xyxy del espacio letterbox a la imagen original"""
+        entry = self.entries[i]
+        pad_x, pad_y = entry['pad']
+        h, w = entry['orig_shape']
+        boxes = np.array(boxes, dtype=np.float32, copy=True)
+        boxes[..., [0, 2]] = ((boxes[..., [0, 2]] - pad_x) / entry['ratio']).clip(0, w)
+        boxes[..., [1, 3]] = ((boxes[..., [1, 3]] - pad_y) / entry['ratio']).clip(0, h)
+        return boxes
+
+    def batches(self, batch_size=16, indices=None):
+        """Itera (índices, vistas de imágenes) por lotes"""
+        indices = list(range(len(self))) if indices is None else list(indices)
+        for start in range(0, len(indices), batch_size):
+            chunk = indices[start:start + batch_size]
+            yield chunk, [self.images[i] for i in chunk]
+
+
+def open_cache(images_dir, cache_dir, imgsz=640, use_hash=False):
+    """Abre el cache si está vigente; si no, lo (re)construye"""
+    if os.path.exists(os.path.join(cache_dir, INDEX_FILE)):
+        cache = DatasetCache(cache_dir)
+        if cache.imgsz == imgsz and not cache.is_stale():
+            return cache
+    return build_cache(images_dir, cache_dir, imgsz=imgsz, use_hash=use_hash)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Construye el cache pre-decodificado de un split")
+    parser.add_argument('images_dir', help="p. ej. ../datasets/images/val")
+    parser.add_argument('cache_dir', help="p. ej. ../datasets/cache/val")
+    parser.add_argument('--imgsz', type=int, default=640)
+    parser.add_argument('--hash', action='store_true', help="Invalidar por hash en lugar de mtime")
+    args = parser.parse_args()
+
+    cache = build_cache(args.images_dir, args.cache_dir, imgsz=args.imgsz, use_hash=args.hash)
+    print(f"💾 Cache listo: {len(cache)} imágenes en {args.cache_dir}")
@@ -0,0 +1,210 @@
+"""
+Almacén columnar de detecciones por video (memory-map)
+
+Guarda todas las detecciones de un análisis para poder recalcular el
+cumplimiento con otra política, otro umbral u otras zonas sin volver a
+decodificar ni inferir el video.
+
+============================================
+ESTRUCTURA (<video>_detections/):
+============================================
+meta.json    fps, tamaño de frame, clases, muestreo y conteos
+frames.bin   por frame analizado: frame (u4) y run (u4)
+runs.bin     cajas por ejecución del detector (u4)
+xyxy.bin     cajas (f4, N x 4) en píxeles del frame decodificado
+conf.bin     confianza (f4)
+cls.bin      clase (u1)
+============================================
+Un "run" es una salida del detector (inferencia, propagación o
+cascada). Los frames omitidos por el motion gate reutilizan el run
+anterior, así que sus cajas no se duplican.
+"""
+import json
+import os
+
+import numpy as np
+
+
+STORE_VERSION = 1
+META_FILE = 'meta.json'
+
+FRAME_COLUMNS = np.dtype([('frame', '<u4'), ('run', '<u4')])
+
+# Archivo → (dtype, columnas por fila)
+COLUMNS = {
+    'frames': (FRAME_COLUMNS, 1),
+    'runs': (np.dtype('<u4'), 1),
+    'xyxy': (np.dtype('<f4'), 4),
+    'conf': (np.dtype('<f4'), 1),
+    'cls': (np.dtype('u1'), 1),
+}
+
+# Frames acumulados antes de escribir a disco
+FLUSH_FRAMES = 1024
+
+
+def store_path(output_dir, video_name):
+    return os.path.join(output_dir, f"{video_name}_detections")
+
+
+def _column_path(path, name):
+    return os.path.join(path, name + '.bin')
+
+
+class DetectionStoreWriter:
+    """
+    Escritura en streaming (append) de las columnas
+
+    Args:
+        path: Directorio del almacén
+        meta: Dict con fps, shape (alto, ancho), names, video, stride, width, conf
+        counts: Conteos de un checkpoint (reanudar): se descarta lo escrito después
+    """
+
+    def __init__(self, path, meta, counts=None):
+        os.makedirs(path, exist_ok=True)
+        self.path = path
+        self.meta = dict(meta)
+        self.counts = dict(counts) if counts else {'frames': 0, 'runs': 0, 'boxes': 0}
+        rows = {'frames': self.counts['frames'], 'runs': self.counts['runs'], 'xyxy': self.counts['boxes'],
+                'conf': self.counts['boxes'], 'cls': self.counts['boxes']}
+
+        self._files = {}
+        for name, (dtype, width) in COLUMNS.items():
+            column = _column_path(path, name)
+            if counts is None or not os.path.exists(column):
+                self._files[name] = open(column, 'wb')
+                continue
+            f = open(column, 'ab')
+            f.truncate(rows[name] * dtype.itemsize * width)
+            f.seek(0, os.SEEK_END)
+            self._files[name] = f
+        self._buffers = {name: [] for name in COLUMNS}
+        self._pending = 0
+        # Tras reanudar, el primer frame siempre abre un run nuevo
+        self._last_run = None
+
+    def add(self, frame, results=None):
+        """
+        Registra un frame
+
+        Args:
+            frame: Índice del frame (base 1)
+            results: Results nuevos del detector, o None para reutilizar el run anterior
+        """
+        if results is not None or self._last_run is None:
+            data = np.zeros((0, 6), dtype=np.float32)
+            if results is not None and len(results.boxes):
+                data = results.boxes.data.cpu().numpy()
+            self._buffers['runs'].append(np.array([len(data)], dtype=np.uint32))
+            self._buffers['xyxy'].append(data[:, :4].astype(np.float32))
+            self._buffers['conf'].append(data[:, -2].astype(np.float32))
+            self._buffers['cls'].append(data[:, -1].astype(np.uint8))
+            self._last_run = self.counts['runs']
+            self.counts['runs'] += 1
+            self.counts['boxes'] += len(data)
+
+        row = np.zeros(1, dtype=FRAME_COLUMNS)
+        row['frame'] = frame
+        row['run'] = self._last_run
+        self._buffers['frames'].append(row)
+        self.counts['frames'] += 1
+
+        self._pending += 1
+        if self._pending >= FLUSH_FRAMES:
+            self.flush()
+
+    def flush(self):
+        for name, chunks in self._buffers.items():
+            if chunks:
+                np.concatenate(chunks).tofile(self._files[name])
+                self._files[name].flush()
+                chunks.clear()
+        self._pending = 0
+
+    def checkpoint(self):
+        """Vacía a disco y devuelve los conteos para reanudar"""
+        self.flush()
+        return dict(self.counts)
+
+    def close(self):
+        self.flush()
+        for f in self._files.values():
+            f.close()
+        meta = {'version': STORE_VERSION, **self.meta, **self.counts}
+        tmp = os.path.join(self.path, META_FILE + '.tmp')
+        with open(tmp, 'w', encoding='utf-8') as f:
+            json.dump(meta, f, ensure_ascii=False, indent=2)
+        os.replace(tmp, os.path.join(self.path, META_FILE))
+        return self.path
+
+
+class DetectionStore:
+    """
+    Lectura por memory-map: abrir un almacén no carga las columnas en memoria
+
+    ============================================
+    ATRIBUTOS:
+    ============================================
+    frames:   array (F,) con frame y run
+    offsets:  inicio de las cajas de cada run (R + 1)
+    xyxy, conf, cls: columnas de cajas (N)
+    ============================================
+    """
+
+    def __init__(self, path):
+        with open(os.path.join(path, META_FILE), 'r', encoding='utf-8') as f:
+            self.meta = json.load(f)
+        if self.meta.get('version') != STORE_VERSION:
+            raise ValueError(f"Versión de almacén de detecciones incompatible en {path}")
+        self.path = path
+        self.names = self.meta['names']
+        self.fps = self.meta['fps']
+        self.shape = tuple(self.meta['shape'])
+
+        self.frames = self._map('frames', self.meta['frames'])
+        runs = self._map('runs', self.meta['runs'])
+        self.offsets = np.concatenate(([0], np.cumsum(runs, dtype=np.int64)))
+        self.xyxy = self._map('xyxy', self.meta['boxes'])
+        self.conf = self._map('conf', self.meta['boxes'])
+        self.cls = self._map('cls', self.meta['boxes'])
+
+    def _map(self, name, rows):
+        dtype, width = COLUMNS[name]
+        shape = (rows, width) if width > 1 else (rows,)
+        if rows == 0:
+            return np.zeros(shape, dtype=dtype)
+        return np.memmap(_column_path(self.path, name), dtype=dtype, mode='r', shape=shape)
+
+    def __len__(self):
+        return len(self.frames)
+
+    def box_runs(self):
+        """Run de cada caja (para agregaciones vectorizadas)"""
+        return np.repeat(np.arange(len(self.offsets) - 1), np.diff(self.offsets))
+
+    def boxes(self, i):
+        """Cajas del frame i: (xyxy, conf, cls) como vistas del memory-map"""
+        run = int(self.frames['run'][i])
+        start, end = self.offsets[run], self.offsets[run + 1]
+        return self.xyxy[start:end], self.conf[start:end], self.cls[start:end]
+
+    def results(self, i, image, keep=None):
+        """
+        Results de Ultralytics del frame i (para re-renderizar)
+
+        Args:
+            image: Frame decodificado correspondiente
+            keep: Máscara bool sobre todas las cajas del almacén (filtro de umbral / zonas)
+        """
+        import torch
+        from ultralytics.engine.results import Results
+
+        run = int(self.frames['run'][i])
+        start, end = self.offsets[run], self.offsets[run + 1]
+        xyxy, conf, cls = self.xyxy[start:end], self.conf[start:end], self.cls[start:end]
+        data = np.column_stack([xyxy, conf, cls]).astype(np.float32)
+        if keep is not None:
+            data = data[keep[start:end]]
+        return Results(orig_img=image, path=self.meta['video'], names=dict(enumerate(self.names)),
+                       boxes=torch.from_numpy(data.reshape(-1, 6)))
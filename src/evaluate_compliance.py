@@ -0,0 +1,273 @@
+"""
+Evaluación de cumplimiento sobre los splits etiquetados
+
+Ejecuta EPPComplianceChecker sobre datasets/images/val|test en un pool de
+procesos, deriva el cumplimiento real por persona desde las etiquetas YOLO
+con la misma lógica de asociación (assess_person) y reporta precisión /
+recall por EPP, exactitud del veredicto y throughput.
+
+Uso:
+    python evaluate_compliance.py --model ../runs/detect/train10/weights/best.pt --split val
+    python evaluate_compliance.py --split test --min-verdict-accuracy 0.85
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from compliance_checker import EPPComplianceChecker, assess_person
+
+
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.bmp', '.webp')
+
+# Clases del dataset (ppe_data.yaml)
+GT_CLASSES = {0: 'helmet', 1: 'gloves', 2: 'vest', 3: 'boots', 4: 'goggles', 6: 'Person'}
+
+# EPP evaluados (clave en los resultados → nombre legible)
+ITEMS = {
+    'has_helmet': 'casco',
+    'has_vest': 'chaleco',
+    'has_gloves': 'guantes',
+    'has_goggles': 'gafas',
+    'has_boots': 'botas',
+}
+
+# IoU mínimo para emparejar una persona real con una detectada
+MATCH_IOU = 0.5
+
+
+# ============================================
+# VERDAD DE TERRENO DESDE ETIQUETAS YOLO
+# ============================================
+def load_ground_truth(label_path):
+    """
+    Cumplimiento real por persona a partir de un archivo de etiquetas YOLO
+
+    Las cajas quedan normalizadas (0-1); la asociación solo depende de
+    proporciones de superposición, así que no hace falta el tamaño real.
+
+    Returns:
+        list: [{'bbox': [x1, y1, x2, y2], 'complies': ..., 'has_*': ...}]
+    """
+    boxes = {name: [] for name in GT_CLASSES.values()}
+    if os.path.exists(label_path):
+        with open(label_path, 'r') as f:
+            for line in f:
+                parts = line.split()
+                if len(parts) != 5:
+                    continue
+                name = GT_CLASSES.get(int(parts[0]))
+                if name is None:
+                    continue
+                cx, cy, w, h = (float(x) for x in parts[1:])
+                boxes[name].append(np.array([cx - w / 2, cy - h / 2, cx + w / 2, cy + h / 2]))
+
+    persons = boxes.pop('Person')
+    return [{'bbox': person, **assess_person(person, boxes)} for person in persons]
+
+
+def iou(a, b):
+    x1, y1 = max(a[0], b[0]), max(a[1], b[1])
+    x2, y2 = min(a[2], b[2]), min(a[3], b[3])
+    inter = max(0.0, x2 - x1) * max(0.0, y2 - y1)
+    union = (a[2] - a[0]) * (a[3] - a[1]) + (b[2] - b[0]) * (b[3] - b[1]) - inter
+    return inter / union if union > 0 else 0.0
+
+
+def match_persons(gt_persons, pred_persons):
+    """Emparejamiento voraz por IoU (mayor primero)"""
+    candidates = []
+    for gi, gt in enumerate(gt_persons):
+        for pi, pred in enumerate(pred_persons):
+            score = iou(gt['bbox'], pred['bbox'])
+            if score >= MATCH_IOU:
+                candidates.append((score, gi, pi))
+
+    used_gt, used_pred, pairs = set(), set(), []
+    for score, gi, pi in sorted(candidates, reverse=True):
+        if gi in used_gt or pi in used_pred:
+            continue
+        used_gt.add(gi)
+        used_pred.add(pi)
+        pairs.append((gi, pi))
+    return pairs
+
+
+# ============================================
+# WORKERS
+# ============================================
+_checker = None
+_ready = None
+
+
+def _init_worker(model_path, ready):
+    global _checker, _ready
+    _checker = EPPComplianceChecker(model_path)
+    _ready = ready
+
+
+def _wait_ready(_):
+    """Bloquea hasta que todos los workers terminaron de cargar el modelo"""
+    _ready.wait()
+
+
+def _evaluate_chunk(args):
+    """Analiza un lote de imágenes y lo compara con sus etiquetas"""
+    pairs, conf_threshold = args
+    analyses = _checker.detect_compliance_batch([image for image, _ in pairs], conf_threshold)
+
+    outcomes = []
+    for (image_path, label_path), analysis in zip(pairs, analyses):
+        h, w = analysis['orig_shape']
+        predicted = [
+            {**p, 'bbox': np.asarray(p['bbox']) / np.array([w, h, w, h])}
+            for p in analysis['compliance_results']
+        ]
+        outcomes.append(compare(load_ground_truth(label_path), predicted))
+    return outcomes
+
+
+def compare(gt_persons, pred_persons):
+    """Cuenta aciertos por EPP y veredicto para una imagen"""
+    counts = {
+        'gt_persons': len(gt_persons),
+        'pred_persons': len(pred_persons),
+        'matched': 0,
+        'verdict_correct': 0,
+        'items': {key: {'tp': 0, 'fp': 0, 'fn': 0, 'tn': 0} for key in ITEMS}
+    }
+
+    for gi, pi in match_persons(gt_persons, pred_persons):
+        gt, pred = gt_persons[gi], pred_persons[pi]
+        counts['matched'] += 1
+        counts['verdict_correct'] += int(gt['complies'] == pred['complies'])
+        for key in ITEMS:
+            outcome = ('t' if gt[key] == pred[key] else 'f') + ('p' if pred[key] else 'n')
+            counts['items'][key][outcome] += 1
+
+    return counts
+
+
+def aggregate(outcomes, seconds):
+    """Combina los conteos por imagen en métricas finales"""
+    totals = {'gt_persons': 0, 'pred_persons': 0, 'matched': 0, 'verdict_correct': 0}
+    items = {key: {'tp': 0, 'fp': 0, 'fn': 0, 'tn': 0} for key in ITEMS}
+
+    for o in outcomes:
+        for key in totals:
+            totals[key] += o[key]
+        for key in ITEMS:
+            for k in items[key]:
+                items[key][k] += o['items'][key][k]
+
+    def ratio(a, b):
+        return a / b if b else 0.0
+
+    return {
+        'images': len(outcomes),
+        'seconds': seconds,
+        'images_per_sec': ratio(len(outcomes), seconds),
+        'person_recall': ratio(totals['matched'], totals['gt_persons']),
+        'person_precision': ratio(totals['matched'], totals['pred_persons']),
+        'verdict_accuracy': ratio(totals['verdict_correct'], totals['matched']),
+        'items': {
+            ITEMS[key]: {
+                'precision': ratio(c['tp'], c['tp'] + c['fp']),
+                'recall': ratio(c['tp'], c['tp'] + c['fn']),
+                **c
+            }
+            for key, c in items.items()
+        },
+        **totals
+    }
+
+
+def evaluate(model_path, images_dir, labels_dir=None, workers=2, batch_size=8, conf_threshold=0.25):
+    """
+    Evalúa el modelo sobre un split etiquetado
+
+    Returns:
+        dict: Métricas agregadas (ver aggregate)
+    """
+    if labels_dir is None:
+        labels_dir = images_dir.replace('images', 'labels', 1)
+
+    pairs = [
+        (os.path.join(images_dir, name), os.path.join(labels_dir, os.path.splitext(name)[0] + '.txt'))
+        for name in sorted(os.listdir(images_dir))
+        if name.lower().endswith(IMAGE_EXTENSIONS)
+    ]
+    chunks = [(pairs[i:i + batch_size], conf_threshold) for i in range(0, len(pairs), batch_size)]
+
+    outcomes = []
+    # Una tarea por worker que espera en la barrera: solo se completan cuando
+    # todos los workers arrancaron y cargaron el modelo
+    ctx = multiprocessing.get_context()
+    ready = ctx.Barrier(workers)
+    with ProcessPoolExecutor(max_workers=workers, mp_context=ctx, initializer=_init_worker,
+                             initargs=(model_path, ready)) as pool:
+        list(pool.map(_wait_ready, range(workers)))
+        start = time.perf_counter()
+        for chunk_outcomes in pool.map(_evaluate_chunk, chunks):
+            outcomes.extend(chunk_outcomes)
+        seconds = time.perf_counter() - start
+
+    return aggregate(outcomes, seconds)
+
+
+def print_evaluation(metrics, split):
+    print("\n" + "="*70)
+    print(f"🧪 EVALUACIÓN DE CUMPLIMIENTO - split {split}")
+    print("="*70)
+    print(f"🖼️  Imágenes: {metrics['images']} ({metrics['images_per_sec']:.1f} img/s)")
+    print(f"👥 Personas: {metrics['gt_persons']} reales, {metrics['pred_persons']} detectadas, "
+          f"{metrics['matched']} emparejadas")
+    print(f"   ├─ Recall de personas: {metrics['person_recall']:.2%}")
+    print(f"   └─ Precisión de personas: {metrics['person_precision']:.2%}")
+    print(f"⚖️  Exactitud del veredicto: {metrics['verdict_accuracy']:.2%}")
+    print("-"*70)
+    print(f"   {'EPP':<10} {'Precisión':<12} {'Recall':<10} {'TP':<6} {'FP':<6} {'FN':<6}")
+    for name, m in metrics['items'].items():
+        print(f"   {name:<10} {m['precision']:<12.2%} {m['recall']:<10.2%} {m['tp']:<6} {m['fp']:<6} {m['fn']:<6}")
+    print("="*70)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Evaluación de cumplimiento EPP en splits etiquetados")
+    parser.add_argument('--model', default='../runs/detect/train10/weights/best.pt')
+    parser.add_argument('--root', default='../datasets', help="Raíz del dataset")
+    parser.add_argument('--split', default='val', choices=['val', 'test'])
+    parser.add_argument('--workers', type=int, default=2)
+    parser.add_argument('--batch-size', type=int, default=8)
+    parser.add_argument('--conf', type=float, default=0.25)
+    parser.add_argument('--output', default=None, help="Guardar métricas en JSON")
+    parser.add_argument('--min-verdict-accuracy', type=float, default=None,
+                        help="Falla (exit 1) si la exactitud del veredicto queda por debajo")
+    args = parser.parse_args()
+
+    metrics = evaluate(
+        args.model,
+        os.path.join(args.root, 'images', args.split),
+        os.path.join(args.root, 'labels', args.split),
+        workers=args.workers,
+        batch_size=args.batch_size,
+        conf_threshold=args.conf
+    )
+    print_evaluation(metrics, args.split)
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump({'model': args.model, 'split': args.split, **metrics}, f, indent=2)
+        print(f"💾 Métricas guardadas en: {args.output}")
+
+    if args.min_verdict_accuracy is not None and metrics['verdict_accuracy'] < args.min_verdict_accuracy:
+        print(f"❌ Exactitud {metrics['verdict_accuracy']:.2%} por debajo de {args.min_verdict_accuracy:.2%}")
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
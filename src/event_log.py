@@ -0,0 +1,141 @@
+import json
+import logging
+import os
+import socket
+import sys
+import threading
+import time
+
+
+# Intervalo mínimo (segundos) entre eventos del mismo tipo.
+# Los eventos suprimidos se cuentan y se informan en el siguiente emitido.
+DEFAULT_RATE_LIMITS = {
+    'video_progress': 5.0,
+    'frame': 1.0,
+    'violation': 1.0,
+}
+
+WORKER_ID = f"{socket.gethostname()}:{os.getpid()}"
+
+
+class JsonLinesFormatter(logging.Formatter):
+    """Formatea cada evento como una línea JSON"""
+
+    def format(self, record):
+        data = {
+            'ts': round(record.created, 6),
+            'level': record.levelname,
+            'event': record.getMessage(),
+            'worker': WORKER_ID,
+        }
+        data.update(getattr(record, 'fields', {}))
+        return json.dumps(data, ensure_ascii=False, default=str)
+
+
+class RateLimitFilter(logging.Filter):
+    """Limita la frecuencia de emisión por nombre de evento"""
+
+    def __init__(self, limits=None):
+        super().__init__()
+        self.limits = dict(DEFAULT_RATE_LIMITS if limits is None else limits)
+        self._last = {}
+        self._suppressed = {}
+        self._lock = threading.Lock()
+
+    def filter(self, record):
+        interval = self.limits.get(record.msg)
+        if not interval:
+            return True
+
+        now = time.monotonic()
+        with self._lock:
+            last = self._last.get(record.msg)
+            if last is not None and now - last < interval:
+                self._suppressed[record.msg] = self._suppressed.get(record.msg, 0) + 1
+                return False
+            self._last[record.msg] = now
+            suppressed = self._suppressed.pop(record.msg, 0)
+
+        if suppressed:
+            record.fields = dict(getattr(record, 'fields', {}), suppressed=suppressed)
+        return True
+
+
+class EventLogger:
+    """
+    Log estructurado de eventos (JSON lines) sobre `logging`
+
+    ============================================
+    USO:
+    ============================================
+    log = get_event_logger()
+    log.info('model_loaded', model='best.pt')
+    log.debug('frame', frame=120, stages={'predict': 0.031})
+    ============================================
+    """
+
+    def __init__(self, logger):
+        self.logger = logger
+
+    def enabled(self, level):
+        """Permite evitar construir eventos costosos que no se emitirán"""
+        return self.logger.isEnabledFor(level)
+
+    def event(self, level, name, **fields):
+        if self.logger.isEnabledFor(level):
+            self.logger.log(level, name, extra={'fields': fields})
+
+    def debug(self, name, **fields):
+        self.event(logging.DEBUG, name, **fields)
+
+    def info(self, name, **fields):
+        self.event(logging.INFO, name, **fields)
+
+    def warning(self, name, **fields):
+        self.event(logging.WARNING, name, **fields)
+
+    def error(self, name, **fields):
+        self.event(logging.ERROR, name, **fields)
+
+
+def configure_event_log(path=None, level=None, rate_limits=None, stream=None):
+    """
+    Configura el destino del log de eventos
+
+    Args:
+        path: Archivo JSON lines (por defecto $EPP_EVENT_LOG, si no stderr)
+        level: Nivel mínimo ('DEBUG', 'INFO', ...; por defecto $EPP_LOG_LEVEL o INFO)
+        rate_limits: {evento: segundos} (None usa DEFAULT_RATE_LIMITS, {} desactiva)
+        stream: Stream alternativo cuando no se usa archivo
+
+    Returns:
+        EventLogger: Logger configurado
+    """
+    logger = logging.getLogger('epp')
+    for handler in list(logger.handlers):
+        logger.removeHandler(handler)
+        handler.close()
+
+    path = path or os.environ.get('EPP_EVENT_LOG')
+    level = level or os.environ.get('EPP_LOG_LEVEL', 'INFO')
+
+    if path:
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        handler = logging.FileHandler(path, encoding='utf-8')
+    else:
+        handler = logging.StreamHandler(stream or sys.stderr)
+
+    handler.setFormatter(JsonLinesFormatter())
+    handler.addFilter(RateLimitFilter(rate_limits))
+    logger.addHandler(handler)
+    logger.setLevel(level.upper() if isinstance(level, str) else level)
+    logger.propagate = False
+    return EventLogger(logger)
+
+
+def get_event_logger():
+    """Logger de eventos del proceso (se configura en el primer uso)"""
+    logger = logging.getLogger('epp')
+    if not logger.handlers:
+        return configure_event_log()
+    return EventLogger(logger)
@@ -0,0 +1,465 @@
+import csv
+import json
+import os
+
+
+# ============================================
+# FORMATOS Y TABLAS
+# ============================================
+# JSON se escribe como JSON lines (una fila por línea) para poder hacer
+# escritura en streaming; CSV y Parquet se escriben por lotes.
+FORMATS = ('json', 'csv', 'parquet')
+EXTENSIONS = {'json': '.jsonl', 'csv': '.csv', 'parquet': '.parquet'}
+SUMMARY_FILE = 'summary.json'
+
+# Filas acumuladas antes de escribir un row group Parquet
+PARQUET_ROW_GROUP = 4096
+
+# Columnas de cada tabla (orden fijo para CSV / Parquet)
+TABLES = {
+    'persons': ['image', 'person_id', 'complies', 'has_helmet', 'has_vest', 'has_gloves',
+                'has_goggles', 'has_boots', 'missing_items', 'confidence', 'total_detections', 'zones'],
+    'frames': ['frame', 'time', 'complies', 'persons', 'helmets', 'vests', 'gloves',
+               'goggles', 'boots'],
+    'events': ['event_id', 'start_frame', 'end_frame', 'start_time', 'end_time',
+               'duration', 'frames', 'max_persons', 'missing_helmets', 'missing_vests',
+               'missing_gloves', 'missing_goggles'],
+}
+
+
+def _open_at(path, offset, **kwargs):
+    """Abre para escribir; con offset se descarta lo escrito después de él (reanudar)"""
+    if offset is None:
+        return open(path, 'w', encoding='utf-8', **kwargs)
+    f = open(path, 'a', encoding='utf-8', **kwargs)
+    f.truncate(offset)
+    f.seek(0, os.SEEK_END)
+    return f
+
+
+class _JsonLinesTable:
+    def __init__(self, path, columns, offset=None):
+        self.f = _open_at(path, offset)
+
+    def write(self, row):
+        self.f.write(json.dumps(row, ensure_ascii=False, default=float) + '\n')
+
+    def sync(self):
+        """Vacía a disco y devuelve el offset para reanudar"""
+        self.f.flush()
+        return self.f.tell()
+
+    def close(self):
+        self.f.close()
+
+
+class _CsvTable:
+    def __init__(self, path, columns, offset=None):
+        self.f = _open_at(path, offset, newline='')
+        self.writer = csv.DictWriter(self.f, fieldnames=columns, extrasaction='ignore')
+        if offset is None:
+            self.writer.writeheader()
+
+    def write(self, row):
+        self.writer.writerow(row)
+
+    def sync(self):
+        self.f.flush()
+        return self.f.tell()
+
+    def close(self):
+        self.f.close()
+
+
+class _ParquetTable:
+    def __init__(self, path, columns, offset=None):
+        if offset is not None:
+            raise ValueError("Parquet no se puede reanudar desde un checkpoint: exportar en json o csv")
+        try:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+        except ImportError:
+            raise ImportError("Exportar a Parquet requiere pyarrow: pip install pyarrow")
+        self.pa = pa
+        self.pq = pq
+        self.path = path
+        self.columns = columns
+        self.buffer = []
+        self.writer = None
+
+    def write(self, row):
+        self.buffer.append(row)
+        if len(self.buffer) >= PARQUET_ROW_GROUP:
+            self._flush()
+
+    def sync(self):
+        # Un archivo Parquet sin cerrar no tiene footer: no hay offset válido
+        raise ValueError("Parquet no admite checkpoints: exportar en json o csv")
+
+    def _flush(self):
+        if not self.buffer:
+            return
+        table = self.pa.Table.from_pydict({
+            col: [row.get(col) for row in self.buffer] for col in self.columns
+        })
+        if self.writer is None:
+            self.writer = self.pq.ParquetWriter(self.path, table.schema)
+        self.writer.write_table(table)
+        self.buffer = []
+
+    def close(self):
+        self._flush()
+        if self.writer is not None:
+            self.writer.close()
+
+
+_WRITERS = {'json': _JsonLinesTable, 'csv': _CsvTable, 'parquet': _ParquetTable}
+
+
+class ViolationSegmenter:
+    """
+    Agrupa frames consecutivos con violación en eventos
+
+    Cada evento guarda su rango de frames/tiempo, el máximo de personas y
+    el máximo de personas sin cada EPP obligatorio durante el tramo.
+    """
+
+    def __init__(self):
+        self.count = 0
+        self._open = None
+
+    def update(self, frame, time, complies, counts):
+        """
+        Procesa un frame
+
+        Returns:
+            dict | None: Evento cerrado por este frame, si lo hay
+        """
+        if not complies and counts['persons'] > 0:
+            self._extend(frame, time, counts)
+            return None
+        return self.flush()
+
+    def state(self):
+        """Contador y evento abierto (para checkpoints)"""
+        return {'count': self.count, 'open': dict(self._open) if self._open else None}
+
+    def restore(self, state):
+        self.count = state['count']
+        self._open = dict(state['open']) if state['open'] else None
+
+    def flush(self):
+        """Cierra y devuelve el evento abierto (o None)"""
+        event = self._open
+        if event is None:
+            return None
+        event['duration'] = event['end_time'] - event['start_time']
+        self._open = None
+        return event
+
+    def _extend(self, frame, time, counts):
+        persons = counts['persons']
+        missing = {
+            'missing_helmets': max(persons - counts['helmets'], 0),
+            'missing_vests': max(persons - counts['vests'], 0),
+            'missing_gloves': max(persons - counts['gloves'], 0),
+            'missing_goggles': max(persons - counts['goggles'], 0),
+        }
+        event = self._open
+        if event is None:
+            self.count += 1
+            self._open = {
+                'event_id': self.count,
+                'start_frame': frame,
+                'end_frame': frame,
+                'start_time': time,
+                'end_time': time,
+                'frames': 1,
+                'max_persons': persons,
+                **missing
+            }
+            return
+
+        event['end_frame'] = frame
+        event['end_time'] = time
+        event['frames'] += 1
+        event['max_persons'] = max(event['max_persons'], persons)
+        for key, value in missing.items():
+            event[key] = max(event[key], value)
+
+
+def segment_violations(violations, stride=1):
+    """
+    Eventos a partir de la lista `violations` de VideoEPPAnalyzer
+    (solo contiene frames con violación, así que un salto de frame cierra el evento)
+
+    Args:
+        stride: Muestreo del análisis; los frames analizados distan `stride`,
+            así que solo un salto mayor cierra el evento
+    """
+    segmenter = ViolationSegmenter()
+    events = []
+    last_frame = None
+    for v in violations:
+        if last_frame is not None and v['frame'] - last_frame > stride:
+            event = segmenter.flush()
+            if event is not None:
+                events.append(event)
+        segmenter.update(v['frame'], v['time'], False, v)
+        last_frame = v['frame']
+
+    event = segmenter.flush()
+    if event is not None:
+        events.append(event)
+    return events
+
+
+class ResultExporter:
+    """
+    Exporta resultados por persona, por frame y por evento a JSON/CSV/Parquet
+
+    ============================================
+    ESTRUCTURA DE SALIDA:
+    ============================================
+    <output_dir>/
+        summary.json        Resumen + lista de archivos
+        persons.<ext>       Una fila por persona (imágenes)
+        frames.<ext>        Una fila por frame (videos)
+        events.<ext>        Un evento por tramo continuo de violación
+    ============================================
+    Las filas se escriben a medida que llegan (streaming), por lo que un
+    video largo no necesita mantener todos sus frames en memoria.
+    """
+
+    def __init__(self, output_dir, formats=('json', 'csv')):
+        unknown = [f for f in formats if f not in FORMATS]
+        if unknown:
+            raise ValueError(f"Formatos no soportados: {unknown} (opciones: {FORMATS})")
+
+        self.output_dir = output_dir
+        self.formats = tuple(formats)
+        self._tables = {}
+        self._files = {}
+        self._segmenter = ViolationSegmenter()
+        # Offsets por tabla/formato de un checkpoint restaurado (se aplican al reabrir)
+        self._offsets = {}
+        os.makedirs(output_dir, exist_ok=True)
+
+    def _table(self, name):
+        if name not in self._tables:
+            writers = []
+            offsets = self._offsets.get(name, {})
+            for fmt in self.formats:
+                path = os.path.join(self.output_dir, name + EXTENSIONS[fmt])
+                writers.append(_WRITERS[fmt](path, TABLES[name], offsets.get(fmt)))
+                self._files.setdefault(name, {})[fmt] = os.path.basename(path)
+            self._tables[name] = writers
+        return self._tables[name]
+
+    # ------------------------------------------
+    # Checkpoints
+    # ------------------------------------------
+    def checkpoint(self):
+        """
+        Vacía las tablas abiertas y devuelve el estado para reanudar
+
+        Returns:
+            dict: offsets por tabla/formato y evento abierto (serializable a JSON)
+        """
+        offsets = {
+            name: {fmt: writer.sync() for fmt, writer in zip(self.formats, writers)}
+            for name, writers in self._tables.items()
+        }
+        return {'offsets': offsets, 'segmenter': self._segmenter.state()}
+
+    def restore(self, state):
+        """
+        Continúa un export interrumpido: las filas escritas después del
+        checkpoint se descartan al reabrir cada tabla
+        """
+        if self._tables:
+            raise RuntimeError("restore() debe llamarse antes de escribir filas")
+        self._offsets = {name: dict(offsets) for name, offsets in state['offsets'].items()}
+        self._segmenter.restore(state['segmenter'])
+        for name in self._offsets:
+            self._table(name)
+
+    def _write(self, name, row):
+        for writer in self._table(name):
+            writer.write(row)
+
+    # ------------------------------------------
+    # Imágenes
+    # ------------------------------------------
+    def write_image(self, compliance_data):
+        """Escribe una fila por persona de un resultado de detect_compliance"""
+        for person in compliance_data['compliance_results']:
+            self._write('persons', {
+                'image': str(compliance_data['image']),
+                'person_id': person['person_id'],
+                'complies': bool(person['complies']),
+                'has_helmet': bool(person['has_helmet']),
+                'has_vest': bool(person['has_vest']),
+                'has_gloves': bool(person['has_gloves']),
+                'has_goggles': bool(person['has_goggles']),
+                'has_boots': bool(person['has_boots']),
+                'missing_items': ';'.join(person['missing_items']),
+                'confidence': float(person['confidence']),
+                'total_detections': compliance_data['total_detections'],
+                'zones': ';'.join(person.get('zones', []))
+            })
+
+    # ------------------------------------------
+    # Videos
+    # ------------------------------------------
+    def write_frame(self, frame, time, complies, counts):
+        """
+        Escribe una fila por frame y agrupa frames con violación en eventos
+
+        Args:
+            frame: Índice del frame (1-based)
+            time: Segundo del video
+            complies: Si el frame cumple
+            counts: Conteos por tipo de EPP (persons, helmets, ...)
+        """
+        self._write('frames', {'frame': frame, 'time': time, 'complies': bool(complies), **counts})
+
+        event = self._segmenter.update(frame, time, complies, counts)
+        if event is not None:
+            self._write('events', event)
+
+    def close(self, summary=None):
+        """
+        Cierra los archivos y escribe summary.json
+
+        Args:
+            summary: Dict con el resumen del análisis (p. ej. report.to_dict())
+
+        Returns:
+            str: Ruta de summary.json
+        """
+        event = self._segmenter.flush()
+        if event is not None:
+            self._write('events', event)
+
+        for writers in self._tables.values():
+            for writer in writers:
+                writer.close()
+
+        summary = dict(summary or {})
+        summary.pop('violations', None)
+        summary.pop('persons', None)
+
+        path = os.path.join(self.output_dir, SUMMARY_FILE)
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump({
+                'summary': summary,
+                'files': self._files,
+                'events': self._segmenter.count
+            }, f, ensure_ascii=False, indent=2, default=float)
+        return path
+
+
+def export_images(results, output_dir, formats=('json', 'csv')):
+    """
+    Exporta una lista de resultados de detect_compliance
+
+    Returns:
+        str: Ruta de summary.json
+    """
+    exporter = ResultExporter(output_dir, formats)
+    total_persons = 0
+    compliant = 0
+    for data in results:
+        exporter.write_image(data)
+        total_persons += data['total_persons']
+        compliant += data['summary']['compliant']
+
+    return exporter.close({
+        'kind': 'images',
+        'images': len(results),
+        'total_persons': total_persons,
+        'compliant': compliant,
+        'non_compliant': total_persons - compliant
+    })
+
+
+# ============================================
+# CARGA
+# ============================================
+def load_results(path, tables=None, prefer=('parquet', 'csv', 'json')):
+    """
+    Reabre resultados exportados sin re-analizar
+
+    Args:
+        path: Directorio de resultados o ruta de summary.json
+        tables: Tablas a cargar (por defecto todas las disponibles)
+        prefer: Orden de preferencia de formato al leer
+
+    Returns:
+        dict: {'summary': dict, 'persons'|'frames'|'events': pandas.DataFrame}
+    """
+    import pandas as pd
+
+    if os.path.isdir(path):
+        path = os.path.join(path, SUMMARY_FILE)
+    base_dir = os.path.dirname(path)
+
+    with open(path, 'r', encoding='utf-8') as f:
+        manifest = json.load(f)
+
+    loaded = {'summary': manifest.get('summary', {})}
+    for name, files in manifest.get('files', {}).items():
+        if tables is not None and name not in tables:
+            continue
+        fmt = next((f for f in prefer if f in files), None)
+        if fmt is None:
+            continue
+
+        file_path = os.path.join(base_dir, files[fmt])
+        if fmt == 'parquet':
+            loaded[name] = pd.read_parquet(file_path)
+        elif fmt == 'csv':
+            loaded[name] = pd.read_csv(file_path)
+        else:
+            loaded[name] = pd.read_json(file_path, lines=True)
+
+    return loaded
+
+
+def image_analysis_from_rows(rows, image=None):
+    """
+    Reconstruye el dict de detect_compliance desde filas de `persons`
+    (útil para que el chatbot responda sobre un análisis exportado)
+    """
+    if image is not None:
+        rows = [r for r in rows if r['image'] == image]
+    if rows and image is None:
+        image = rows[0]['image']
+        rows = [r for r in rows if r['image'] == image]
+
+    results = []
+    for r in rows:
+        missing = r.get('missing_items')
+        results.append({
+            'person_id': int(r['person_id']),
+            'complies': bool(r['complies']),
+            'has_helmet': bool(r['has_helmet']),
+            'has_vest': bool(r['has_vest']),
+            'has_boots': bool(r['has_boots']),
+            'has_goggles': bool(r['has_goggles']),
+            'has_gloves': bool(r['has_gloves']),
+            'missing_items': missing.split(';') if isinstance(missing, str) and missing else [],
+            'confidence': float(r['confidence'])
+        })
+
+    return {
+        'image': image,
+        'total_persons': len(results),
+        'total_detections': int(rows[0]['total_detections']) if rows else 0,
+        'compliance_results': results,
+        'summary': {
+            'compliant': sum(1 for r in results if r['complies']),
+            'non_compliant': sum(1 for r in results if not r['complies'])
+        }
+    }
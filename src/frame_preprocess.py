@@ -0,0 +1,96 @@
+"""
+Preprocesado con buffers preasignados para video de resolución fija
+
+`model.predict` sobre arrays de NumPy reserva en cada llamada los buffers
+de redimensionado, relleno, transposición y normalización. Para un
+stream de resolución constante, LetterboxPreprocessor los reserva una vez
+y entrega al modelo un tensor ya listo (RGB, CHW, 0-1); las cajas se
+devuelven a coordenadas del frame original con el mismo letterbox.
+"""
+import cv2
+import numpy as np
+
+from dataset_cache import PAD_VALUE, letterbox_geometry
+
+
+class LetterboxPreprocessor:
+    """
+    Letterbox + BGR→RGB + HWC→CHW + normalización sobre buffers reutilizados
+
+    ============================================
+    POR LLAMADA (resolución ya vista):
+    ============================================
+    1. cv2.resize hacia un buffer fijo del tamaño escalado
+    2. Una sola copia que transpone, invierte canales y pega en el lienzo
+       (el relleno se pintó al reservar y no se vuelve a escribir)
+    3. Copia uint8 → float32 sobre el tensor reservado y división in situ
+    ============================================
+    Si cambia la resolución de entrada o el tamaño del lote, los buffers
+    se reservan de nuevo (correcto, pero sin la ventaja).
+    """
+
+    def __init__(self, imgsz=640):
+        if imgsz % 32:
+            raise ValueError(f"imgsz debe ser múltiplo de 32 (stride del modelo): {imgsz}")
+        self.imgsz = imgsz
+        self._key = None
+        self.allocations = 0
+
+    def _allocate(self, shape, batch):
+        import torch
+
+        h, w = shape[:2]
+        self.ratio, (new_w, new_h), (pad_x, pad_y) = letterbox_geometry(h, w, self.imgsz)
+        self.pad = (pad_x, pad_y)
+        self._size = (new_w, new_h)
+        self._resized = np.empty((new_h, new_w, 3), dtype=np.uint8)
+        self._canvas = np.full((batch, 3, self.imgsz, self.imgsz), PAD_VALUE, dtype=np.uint8)
+        self._inner = self._canvas[:, :, pad_y:pad_y + new_h, pad_x:pad_x + new_w]
+        self._canvas_tensor = torch.from_numpy(self._canvas)
+        self._tensor = torch.empty((batch, 3, self.imgsz, self.imgsz), dtype=torch.float32)
+        self._key = (shape, batch)
+        self.allocations += 1
+
+    def __call__(self, frames):
+        """
+        Args:
+            frames: Lista de frames BGR uint8 de la misma resolución
+
+        Returns:
+            torch.Tensor: (B, 3, imgsz, imgsz) float32 en [0, 1]
+        """
+        key = (frames[0].shape, len(frames))
+        if key != self._key:
+            self._allocate(*key)
+
+        for i, frame in enumerate(frames):
+            if frame.shape != key[0]:
+                raise ValueError(f"Resoluciones distintas en el lote: {frame.shape} != {key[0]}")
+            cv2.resize(frame, self._size, dst=self._resized, interpolation=cv2.INTER_LINEAR)
+            # HWC BGR → CHW RGB directamente en el lienzo
+            np.copyto(self._inner[i], self._resized.transpose(2, 0, 1)[::-1])
+
+        self._tensor.copy_(self._canvas_tensor)
+        return self._tensor.div_(255.0)
+
+    def unscale(self, results, frame):
+        """Results en el espacio letterbox → coordenadas del frame original"""
+        from ultralytics.engine.results import Results
+
+        h, w = frame.shape[:2]
+        pad_x, pad_y = self.pad
+        data = results.boxes.data.clone()
+        data[:, [0, 2]] = ((data[:, [0, 2]] - pad_x) / self.ratio).clamp_(0, w)
+        data[:, [1, 3]] = ((data[:, [1, 3]] - pad_y) / self.ratio).clamp_(0, h)
+        return Results(orig_img=frame, path=results.path, names=results.names, boxes=data, speed=results.speed)
+
+    def predict(self, model, frames, **predict_kwargs):
+        """
+        model.predict sobre el tensor preparado
+
+        Returns:
+            list: Results en coordenadas de cada frame
+        """
+        tensor = self(frames)
+        results = model.predict(source=tensor, **predict_kwargs)
+        return [self.unscale(r, frame) for r, frame in zip(results, frames)]
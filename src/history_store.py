@@ -0,0 +1,249 @@
+import datetime
+import os
+import sqlite3
+import threading
+import time
+
+from exporters import segment_violations
+
+
+DEFAULT_DB_PATH = 'results/history.db'
+
+# EPP obligatorios (mismos nombres que `missing_items`)
+ITEMS = ('casco', 'chaleco', 'guantes', 'gafas')
+
+# Columnas de eventos de video → item
+EVENT_ITEMS = {
+    'missing_helmets': 'casco',
+    'missing_vests': 'chaleco',
+    'missing_gloves': 'guantes',
+    'missing_goggles': 'gafas',
+}
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS analyses (
+    id INTEGER PRIMARY KEY,
+    kind TEXT NOT NULL,
+    source TEXT NOT NULL,
+    camera TEXT NOT NULL,
+    ts REAL NOT NULL,
+    verdict TEXT NOT NULL,
+    total_persons INTEGER,
+    compliant INTEGER,
+    non_compliant INTEGER,
+    total_frames INTEGER,
+    compliant_frames INTEGER,
+    violation_frames INTEGER,
+    compliance_rate REAL
+);
+CREATE TABLE IF NOT EXISTS violations (
+    id INTEGER PRIMARY KEY,
+    analysis_id INTEGER NOT NULL REFERENCES analyses(id) ON DELETE CASCADE,
+    kind TEXT NOT NULL,
+    camera TEXT NOT NULL,
+    ts REAL NOT NULL,
+    item TEXT NOT NULL,
+    count INTEGER NOT NULL,
+    person_id INTEGER,
+    start_frame INTEGER,
+    end_frame INTEGER
+);
+CREATE INDEX IF NOT EXISTS idx_analyses_ts ON analyses(ts);
+CREATE INDEX IF NOT EXISTS idx_analyses_camera_ts ON analyses(camera, ts);
+CREATE INDEX IF NOT EXISTS idx_analyses_verdict_ts ON analyses(verdict, ts);
+CREATE INDEX IF NOT EXISTS idx_analyses_kind_violations ON analyses(kind, violation_frames);
+CREATE INDEX IF NOT EXISTS idx_violations_item_ts ON violations(item, ts);
+CREATE INDEX IF NOT EXISTS idx_violations_camera_ts ON violations(camera, ts);
+CREATE INDEX IF NOT EXISTS idx_violations_analysis ON violations(analysis_id);
+"""
+
+
+def time_range(period, now=None):
+    """
+    Rango [desde, hasta) en epoch para un periodo con nombre
+
+    Args:
+        period: 'hoy', 'ayer', 'semana', 'mes' o None (todo el historial)
+
+    Returns:
+        tuple: (desde, hasta) o (None, None)
+    """
+    now = now or time.time()
+    today = datetime.datetime.fromtimestamp(now).replace(hour=0, minute=0, second=0, microsecond=0)
+
+    if period == 'hoy':
+        start = today
+    elif period == 'ayer':
+        start = today - datetime.timedelta(days=1)
+        return start.timestamp(), today.timestamp()
+    elif period == 'semana':
+        start = today - datetime.timedelta(days=today.weekday())
+    elif period == 'mes':
+        start = today.replace(day=1)
+    else:
+        return None, None
+    return start.timestamp(), now + 1
+
+
+class HistoryStore:
+    """
+    Historial local de análisis (SQLite con índices)
+
+    ============================================
+    TABLAS:
+    ============================================
+    analyses:   Un registro por imagen / video analizado
+    violations: Un registro por EPP faltante (persona en imágenes,
+                tramo continuo de violación en videos)
+    ============================================
+    Índices por cámara, tiempo, item y veredicto para que las consultas
+    agregadas no recorran todo el historial.
+    """
+
+    def __init__(self, db_path=DEFAULT_DB_PATH):
+        self.db_path = db_path
+        if db_path != ':memory:':
+            os.makedirs(os.path.dirname(os.path.abspath(db_path)), exist_ok=True)
+        # Streamlit ejecuta en varios hilos; se serializa el acceso con un lock
+        self._lock = threading.Lock()
+        self.conn = sqlite3.connect(db_path, check_same_thread=False)
+        self.conn.row_factory = sqlite3.Row
+        with self._lock, self.conn:
+            self.conn.execute("PRAGMA journal_mode=WAL")
+            self.conn.execute("PRAGMA foreign_keys=ON")
+            self.conn.executescript(SCHEMA)
+
+    def close(self):
+        self.conn.close()
+
+    # ------------------------------------------
+    # Escritura
+    # ------------------------------------------
+    def record_image(self, compliance_data, camera='default', ts=None):
+        """
+        Guarda un resultado de detect_compliance
+
+        Returns:
+            int: Id del análisis
+        """
+        ts = ts or time.time()
+        total = compliance_data['total_persons']
+        compliant = compliance_data['summary']['compliant']
+        non_compliant = compliance_data['summary']['non_compliant']
+
+        with self._lock, self.conn:
+            cur = self.conn.execute(
+                "INSERT INTO analyses (kind, source, camera, ts, verdict, total_persons, "
+                "compliant, non_compliant, compliance_rate) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                ('image', str(compliance_data['image']), camera, ts,
+                 'no_cumple' if non_compliant else 'cumple',
+                 total, compliant, non_compliant,
+                 (compliant / total * 100) if total else None)
+            )
+            analysis_id = cur.lastrowid
+
+            rows = [
+                (analysis_id, 'image', camera, ts, item, 1, person['person_id'])
+                for person in compliance_data['compliance_results']
+                for item in person['missing_items'] if item in ITEMS
+            ]
+            self.conn.executemany(
+                "INSERT INTO violations (analysis_id, kind, camera, ts, item, count, person_id) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                rows
+            )
+        return analysis_id
+
+    def record_video(self, report, camera='default', ts=None):
+        """
+        Guarda un VideoReport; las violaciones se agrupan en tramos continuos
+
+        Returns:
+            int: Id del análisis
+        """
+        ts = ts or time.time()
+
+        with self._lock, self.conn:
+            cur = self.conn.execute(
+                "INSERT INTO analyses (kind, source, camera, ts, verdict, total_frames, "
+                "compliant_frames, violation_frames, compliance_rate) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                ('video', os.path.basename(report.input_video), camera, ts,
+                 'no_cumple' if report.violation_frames else 'cumple',
+                 report.total_frames, report.compliant_frames,
+                 report.violation_frames, report.compliance_rate)
+            )
+            analysis_id = cur.lastrowid
+
+            rows = []
+            for event in segment_violations(report.violations, report.stride):
+                for column, item in EVENT_ITEMS.items():
+                    if event[column] > 0:
+                        rows.append((analysis_id, 'video', camera, ts + event['start_time'],
+                                     item, event[column], event['start_frame'], event['end_frame']))
+            self.conn.executemany(
+                "INSERT INTO violations (analysis_id, kind, camera, ts, item, count, "
+                "start_frame, end_frame) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                rows
+            )
+        return analysis_id
+
+    # ------------------------------------------
+    # Consultas
+    # ------------------------------------------
+    def _query(self, sql, params=()):
+        with self._lock:
+            return [dict(r) for r in self.conn.execute(sql, params).fetchall()]
+
+    @staticmethod
+    def _filters(item=None, camera=None, since=None, until=None, kind=None, prefix=''):
+        clauses, params = [], []
+        for column, value, op in (('item', item, '='), ('camera', camera, '='), ('kind', kind, '='),
+                                  ('ts', since, '>='), ('ts', until, '<')):
+            if value is not None:
+                clauses.append(f"{prefix}{column} {op} ?")
+                params.append(value)
+        where = (' WHERE ' + ' AND '.join(clauses)) if clauses else ''
+        return where, params
+
+    def count_violations(self, item=None, camera=None, since=None, until=None):
+        """
+        Total de violaciones (opcionalmente de un item / cámara / periodo)
+
+        Returns:
+            dict: {item: total}
+        """
+        where, params = self._filters(item=item, camera=camera, since=since, until=until)
+        rows = self._query(
+            f"SELECT item, SUM(count) AS total FROM violations{where} GROUP BY item",
+            params
+        )
+        return {r['item']: r['total'] for r in rows}
+
+    def top_videos(self, limit=1, camera=None, since=None, until=None):
+        """Videos con más frames en violación"""
+        where, params = self._filters(camera=camera, since=since, until=until, kind='video')
+        return self._query(
+            f"SELECT * FROM analyses{where} ORDER BY violation_frames DESC LIMIT ?",
+            params + [limit]
+        )
+
+    def verdict_counts(self, camera=None, since=None, until=None):
+        """Análisis por veredicto: {'cumple': n, 'no_cumple': m}"""
+        where, params = self._filters(camera=camera, since=since, until=until)
+        rows = self._query(
+            f"SELECT verdict, COUNT(*) AS total FROM analyses{where} GROUP BY verdict",
+            params
+        )
+        return {r['verdict']: r['total'] for r in rows}
+
+    def cameras(self):
+        """Cámaras registradas"""
+        return [r['camera'] for r in self._query("SELECT DISTINCT camera FROM analyses ORDER BY camera")]
+
+    def recent(self, limit=20, camera=None):
+        """Últimos análisis"""
+        where, params = self._filters(camera=camera)
+        return self._query(
+            f"SELECT * FROM analyses{where} ORDER BY ts DESC LIMIT ?",
+            params + [limit]
+        )
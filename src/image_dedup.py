@@ -0,0 +1,112 @@
+import cv2
+import numpy as np
+
+
+HASH_METHODS = ('dhash', 'phash')
+
+# Bits activos por byte, para la distancia de Hamming vectorizada
+_POPCOUNT = np.array([bin(i).count('1') for i in range(256)], dtype=np.uint8)
+
+
+def _thumbnail(image, size):
+    """Miniatura en grises; las rutas se decodifican ya reducidas (1/8) por libjpeg"""
+    if isinstance(image, str):
+        gray = cv2.imread(image, cv2.IMREAD_REDUCED_GRAYSCALE_8)
+        if gray is None:
+            raise FileNotFoundError(f"No se pudo leer la imagen: {image}")
+    else:
+        gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY) if image.ndim == 3 else image
+    return cv2.resize(gray, size, interpolation=cv2.INTER_AREA).astype(np.float32)
+
+
+def _pack(bits):
+    return int(np.packbits(bits.ravel().astype(np.uint8)).view('>u8')[0])
+
+
+def dhash(image):
+    """Hash de diferencias (64 bits): gradiente horizontal de una miniatura 9x8"""
+    thumb = _thumbnail(image, (9, 8))
+    return _pack(thumb[:, 1:] > thumb[:, :-1])
+
+
+def phash(image):
+    """Hash perceptual (64 bits): DCT 32x32, coeficientes 8x8 de baja frecuencia vs su mediana"""
+    coeffs = cv2.dct(_thumbnail(image, (32, 32)))[:8, :8]
+    return _pack(coeffs > np.median(coeffs.ravel()[1:]))
+
+
+def image_hash(image, method='dhash'):
+    if method not in HASH_METHODS:
+        raise ValueError(f"Método de hash desconocido: {method} (opciones: {HASH_METHODS})")
+    return dhash(image) if method == 'dhash' else phash(image)
+
+
+def hamming(a, b):
+    """Distancia de Hamming entre un hash y un array de hashes (uint64)"""
+    x = np.bitwise_xor(np.asarray(b, dtype=np.uint64), np.uint64(a))
+    return _POPCOUNT[x.view(np.uint8)].reshape(-1, 8).sum(axis=1)
+
+
+class HashIndex:
+    """
+    Índice de hashes de imágenes representativas
+
+    La búsqueda compara contra todos los hashes a la vez (XOR + popcount
+    vectorizado), suficiente para decenas de miles de imágenes por lote.
+    """
+
+    def __init__(self, max_distance=4, capacity=1024):
+        self.max_distance = max_distance
+        self._hashes = np.zeros(capacity, dtype=np.uint64)
+        self.keys = []
+
+    def __len__(self):
+        return len(self.keys)
+
+    def add(self, value, key):
+        n = len(self.keys)
+        if n == len(self._hashes):
+            self._hashes = np.concatenate([self._hashes, np.zeros(n, dtype=np.uint64)])
+        self._hashes[n] = np.uint64(value)
+        self.keys.append(key)
+
+    def query(self, value):
+        """
+        Clave del representante más cercano dentro de max_distance
+
+        Returns:
+            tuple: (clave, distancia) o (None, None)
+        """
+        if not self.keys:
+            return None, None
+        distances = hamming(value, self._hashes[:len(self.keys)])
+        best = int(np.argmin(distances))
+        if distances[best] <= self.max_distance:
+            return self.keys[best], int(distances[best])
+        return None, None
+
+
+def group_near_duplicates(hashes, max_distance=4):
+    """
+    Agrupa imágenes casi idénticas (en orden: la primera de cada grupo es
+    la representante)
+
+    Args:
+        hashes: Lista de (clave, hash); hash None = no se pudo calcular
+
+    Returns:
+        tuple: (representantes, {duplicada: representante})
+    """
+    index = HashIndex(max_distance)
+    representatives, duplicates = [], {}
+    for key, value in hashes:
+        if value is None:
+            representatives.append(key)
+            continue
+        match, _ = index.query(value)
+        if match is None:
+            index.add(value, key)
+            representatives.append(key)
+        else:
+            duplicates[key] = match
+    return representatives, duplicates
@@ -0,0 +1,341 @@
+"""
+Servicio local de inferencia con micro-batching
+
+Las peticiones concurrentes se encolan y se agrupan en lotes pequeños
+(hasta --max-batch imágenes o --max-wait-ms de espera) que se reparten
+entre varias réplicas del modelo. Cada petición recibe su propio
+resultado de cumplimiento.
+
+Endpoints (HTTP en localhost):
+    POST /detect?name=foto.jpg   cuerpo = bytes de la imagen (JPG/PNG)
+    GET  /health                 estado, réplicas y cola
+    GET  /stats                  lotes, tamaño medio y latencias p50/p95/p99
+
+Uso:
+    python inference_service.py --replicas 2 --max-batch 8 --max-wait-ms 10
+    curl --data-binary @foto.jpg "http://127.0.0.1:8765/detect?name=foto.jpg"
+"""
+import argparse
+import asyncio
+import collections
+import json
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import parse_qs, urlsplit
+
+from event_log import get_event_logger
+from metrics import METRICS
+from reports import build_image_report
+
+
+# Latencias recientes usadas para los percentiles de /stats
+LATENCY_WINDOW = 2048
+
+# Tamaño máximo del cuerpo de una petición (bytes)
+MAX_BODY = 32 * 1024 * 1024
+
+STATUS_TEXT = {200: 'OK', 400: 'Bad Request', 404: 'Not Found', 413: 'Payload Too Large',
+               500: 'Internal Server Error', 503: 'Service Unavailable'}
+
+
+def _json_default(value):
+    return value.tolist() if hasattr(value, 'tolist') else float(value)
+
+
+def percentile(values, q):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(q / 100 * (len(ordered) - 1))))]
+
+
+class MicroBatcher:
+    """
+    Cola asíncrona que agrupa peticiones en lotes para un pool de réplicas
+
+    ============================================
+    POLÍTICA DE LOTES:
+    ============================================
+    - Una réplica libre toma la primera petición de la cola
+    - Espera como mucho max_wait_ms a que lleguen más (hasta max_batch)
+    - Ejecuta el lote en su propio hilo (la inferencia libera el GIL)
+    ============================================
+    """
+
+    def __init__(self, checkers, max_batch=8, max_wait_ms=10, conf_threshold=0.25,
+                 max_queue=256, metrics=None):
+        """
+        Args:
+            checkers: Una instancia de EPPComplianceChecker por réplica
+            max_batch: Imágenes máximas por lote
+            max_wait_ms: Presupuesto de espera para completar un lote
+            conf_threshold: Umbral de confianza del detector
+            max_queue: Peticiones en cola antes de responder 503
+        """
+        self.checkers = list(checkers)
+        self.max_batch = max_batch
+        self.max_wait = max_wait_ms / 1000
+        self.conf_threshold = conf_threshold
+        self.max_queue = max_queue
+        self.metrics = metrics or METRICS
+        self.latencies = collections.deque(maxlen=LATENCY_WINDOW)
+        self.batches = 0
+        self.batched_requests = 0
+        self._queue = None
+        self._tasks = []
+        self._executors = []
+
+    @property
+    def pending(self):
+        return self._queue.qsize() if self._queue is not None else 0
+
+    def start(self):
+        self._queue = asyncio.Queue(maxsize=self.max_queue)
+        for i, checker in enumerate(self.checkers):
+            executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix=f'epp-replica-{i}')
+            self._executors.append(executor)
+            self._tasks.append(asyncio.create_task(self._replica(checker, executor)))
+
+    async def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        for executor in self._executors:
+            executor.shutdown(wait=False)
+
+    async def submit(self, image, name):
+        """
+        Encola una imagen y espera su análisis
+
+        Raises:
+            asyncio.QueueFull: Si la cola está llena (backpressure)
+        """
+        future = asyncio.get_running_loop().create_future()
+        self._queue.put_nowait((image, name, future, time.perf_counter()))
+        return await future
+
+    async def _collect(self):
+        """Primera petición + las que lleguen dentro del presupuesto de espera"""
+        batch = [await self._queue.get()]
+        deadline = time.perf_counter() + self.max_wait
+        while len(batch) < self.max_batch:
+            remaining = deadline - time.perf_counter()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(self._queue.get(), remaining))
+            except asyncio.TimeoutError:
+                break
+        return batch
+
+    async def _replica(self, checker, executor):
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = await self._collect()
+            images = [image for image, _, _, _ in batch]
+
+            try:
+                analyses = await loop.run_in_executor(
+                    executor, checker.detect_compliance_batch, images, self.conf_threshold
+                )
+            except Exception as e:
+                for _, _, future, _ in batch:
+                    if not future.done():
+                        future.set_exception(e)
+                continue
+
+            self.batches += 1
+            self.batched_requests += len(batch)
+            self.metrics.inc('service_batches_total', component='service')
+            self.metrics.inc('service_requests_total', len(batch), component='service')
+
+            now = time.perf_counter()
+            for (_, name, future, enqueued), analysis in zip(batch, analyses):
+                analysis['image'] = name
+                latency = now - enqueued
+                self.latencies.append(latency)
+                self.metrics.observe('service_latency_seconds', latency, component='service')
+                if not future.done():
+                    future.set_result(analysis)
+
+    def stats(self):
+        latencies = list(self.latencies)
+        return {
+            'replicas': len(self.checkers),
+            'pending': self.pending,
+            'batches': self.batches,
+            'requests': self.batched_requests,
+            'mean_batch_size': self.batched_requests / self.batches if self.batches else 0.0,
+            'latency_ms': {
+                'p50': percentile(latencies, 50) * 1000,
+                'p95': percentile(latencies, 95) * 1000,
+                'p99': percentile(latencies, 99) * 1000
+            }
+        }
+
+
+# ============================================
+# SERVIDOR HTTP (asyncio)
+# ============================================
+class InferenceService:
+    """Servidor HTTP/1.1 mínimo (keep-alive) delante de un MicroBatcher"""
+
+    def __init__(self, batcher, host='127.0.0.1', port=8765):
+        self.batcher = batcher
+        self.host = host
+        self.port = port
+        self.log = get_event_logger()
+        self._server = None
+
+    async def start(self):
+        self.batcher.start()
+        self._server = await asyncio.start_server(self._handle, self.host, self.port)
+        self.log.info('service_started', host=self.host, port=self.port,
+                      replicas=len(self.batcher.checkers), max_batch=self.batcher.max_batch)
+        return self
+
+    async def serve_forever(self):
+        await self.start()
+        async with self._server:
+            await self._server.serve_forever()
+
+    async def stop(self):
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+        await self.batcher.stop()
+
+    async def _handle(self, reader, writer):
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line:
+                    break
+                method, target, version = request_line.decode('latin-1').split()
+
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b'\r\n', b'\n', b''):
+                        break
+                    key, _, value = line.decode('latin-1').partition(':')
+                    headers[key.strip().lower()] = value.strip()
+
+                length = int(headers.get('content-length', 0))
+                if length > MAX_BODY:
+                    await self._respond(writer, 413, {'error': 'Imagen demasiado grande'}, keep_alive=False)
+                    break
+                body = await reader.readexactly(length) if length else b''
+
+                status, payload = await self._route(method, target, body)
+                keep_alive = headers.get('connection', '').lower() != 'close' and version == 'HTTP/1.1'
+                await self._respond(writer, status, payload, keep_alive)
+                if not keep_alive:
+                    break
+        except (ValueError, asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            writer.close()
+
+    async def _route(self, method, target, body):
+        url = urlsplit(target)
+        if method == 'GET' and url.path == '/health':
+            return 200, {'status': 'ok', 'replicas': len(self.batcher.checkers), 'pending': self.batcher.pending}
+        if method == 'GET' and url.path == '/stats':
+            return 200, self.batcher.stats()
+        if method != 'POST' or url.path != '/detect':
+            return 404, {'error': f'Ruta no encontrada: {method} {url.path}'}
+        if not body:
+            return 400, {'error': 'Cuerpo vacío: enviar los bytes de la imagen'}
+
+        name = parse_qs(url.query).get('name', ['imagen'])[0]
+        image = await asyncio.get_running_loop().run_in_executor(None, _decode_image, body)
+        if image is None:
+            return 400, {'error': 'No se pudo decodificar la imagen'}
+
+        try:
+            analysis = await self.batcher.submit(image, name)
+        except asyncio.QueueFull:
+            return 503, {'error': 'Servicio saturado, reintentar'}
+        except Exception as e:
+            self.log.error('service_error', error=str(e))
+            return 500, {'error': str(e)}
+        return 200, build_image_report(analysis).to_dict()
+
+    async def _respond(self, writer, status, payload, keep_alive=True):
+        body = json.dumps(payload, ensure_ascii=False, default=_json_default).encode('utf-8')
+        head = (
+            f"HTTP/1.1 {status} {STATUS_TEXT.get(status, '')}\r\n"
+            f"Content-Type: application/json; charset=utf-8\r\n"
+            f"Content-Length: {len(body)}\r\n"
+            f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n"
+        )
+        writer.write(head.encode('latin-1') + body)
+        await writer.drain()
+
+
+def _decode_image(data):
+    import cv2
+    import numpy as np
+    return cv2.imdecode(np.frombuffer(data, dtype=np.uint8), cv2.IMREAD_COLOR)
+
+
+def detect_remote(image_path, url='http://127.0.0.1:8765', timeout=30):
+    """
+    Cliente mínimo para integraciones: envía una imagen al servicio
+
+    Returns:
+        dict: Reporte de la imagen (ImageReport.to_dict)
+    """
+    import os
+    from urllib.parse import quote
+    from urllib.request import Request, urlopen
+
+    with open(image_path, 'rb') as f:
+        data = f.read()
+    request = Request(f"{url}/detect?name={quote(os.path.basename(image_path))}", data=data, method='POST')
+    with urlopen(request, timeout=timeout) as response:
+        return json.loads(response.read().decode('utf-8'))
+
+
+def build_service(model_path, replicas=2, max_batch=8, max_wait_ms=10, conf_threshold=0.25,
+                  host='127.0.0.1', port=8765, warmup=True):
+    """Carga las réplicas (con calentamiento) y arma el servicio"""
+    from compliance_checker import EPPComplianceChecker
+    from startup import warmup_model, warmup_sizes_from_env
+
+    checkers = []
+    for i in range(replicas):
+        checker = EPPComplianceChecker(model_path)
+        if warmup:
+            warmup_model(checker.model, warmup_sizes_from_env())
+        checkers.append(checker)
+
+    batcher = MicroBatcher(checkers, max_batch=max_batch, max_wait_ms=max_wait_ms, conf_threshold=conf_threshold)
+    return InferenceService(batcher, host=host, port=port)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Servicio local de inferencia EPP con micro-batching")
+    parser.add_argument('--model', default='../runs/detect/train10/weights/best.pt')
+    parser.add_argument('--replicas', type=int, default=2, help="Copias del modelo atendiendo lotes en paralelo")
+    parser.add_argument('--max-batch', type=int, default=8)
+    parser.add_argument('--max-wait-ms', type=float, default=10, help="Espera máxima para completar un lote")
+    parser.add_argument('--conf', type=float, default=0.25)
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8765)
+    args = parser.parse_args()
+
+    print(f"⏳ Cargando {args.replicas} réplica(s) del modelo...")
+    service = build_service(args.model, args.replicas, args.max_batch, args.max_wait_ms,
+                            args.conf, args.host, args.port)
+    print(f"🚀 Servicio en http://{args.host}:{args.port} (lotes de hasta {args.max_batch}, "
+          f"espera máx. {args.max_wait_ms:g} ms)")
+    try:
+        asyncio.run(service.serve_forever())
+    except KeyboardInterrupt:
+        print("\n👋 Servicio detenido")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,249 @@
+import functools
+import os
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from event_log import get_event_logger
+
+
+# Buckets por defecto para tiempos de etapa (segundos)
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+def _label_key(labels):
+    return tuple(sorted(labels.items())) if labels else ()
+
+
+def _format_labels(key):
+    if not key:
+        return ''
+    return '{' + ','.join(f'{k}="{v}"' for k, v in key) + '}'
+
+
+class Histogram:
+    """Histograma acumulativo con buckets fijos (compatible con Prometheus)"""
+
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * len(self.buckets)
+        self.count = 0
+        self.sum = 0.0
+        self.min = None
+        self.max = None
+
+    def observe(self, value):
+        self.count += 1
+        self.sum += value
+        self.min = value if self.min is None else min(self.min, value)
+        self.max = value if self.max is None else max(self.max, value)
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[i] += 1
+                break
+
+    def cumulative(self):
+        total = 0
+        out = []
+        for c in self.counts:
+            total += c
+            out.append(total)
+        return out
+
+    def summary(self):
+        return {
+            'count': self.count,
+            'sum': self.sum,
+            'mean': self.sum / self.count if self.count else 0.0,
+            'min': self.min or 0.0,
+            'max': self.max or 0.0
+        }
+
+
+class MetricsRegistry:
+    """
+    Registro en proceso de contadores, histogramas y timers por etapa
+
+    ============================================
+    USO:
+    ============================================
+    with metrics.timer('inference', component='video'):
+        ...
+    @metrics.timed('model_load')
+    def cargar(): ...
+    metrics.inc('frames_total', component='video')
+    ============================================
+    Todas las métricas se exportan con prefijo `epp_`.
+    """
+
+    def __init__(self, prefix='epp', enabled=True):
+        self.prefix = prefix
+        self.enabled = enabled
+        self._lock = threading.Lock()
+        self._counters = {}
+        self._histograms = {}
+
+    # ------------------------------------------
+    # Registro de valores
+    # ------------------------------------------
+    def inc(self, name, value=1, **labels):
+        """Incrementa un contador"""
+        if not self.enabled:
+            return
+        key = (name, _label_key(labels))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + value
+
+    def observe(self, name, value, **labels):
+        """Registra un valor en un histograma"""
+        if not self.enabled:
+            return
+        key = (name, _label_key(labels))
+        with self._lock:
+            hist = self._histograms.get(key)
+            if hist is None:
+                hist = self._histograms[key] = Histogram()
+            hist.observe(value)
+
+    def observe_stage(self, stage, seconds, **labels):
+        """Registra la duración de una etapa del pipeline"""
+        self.observe('stage_seconds', seconds, stage=stage, **labels)
+
+    def timer(self, stage, **labels):
+        """Context manager que mide la duración de una etapa"""
+        return _Timer(self, stage, labels)
+
+    def timed(self, stage, **labels):
+        """Decorador que mide cada llamada a la función como una etapa"""
+        def decorator(func):
+            @functools.wraps(func)
+            def wrapper(*args, **kwargs):
+                with self.timer(stage, **labels):
+                    return func(*args, **kwargs)
+            return wrapper
+        return decorator
+
+    def reset(self):
+        """Borra todas las métricas acumuladas"""
+        with self._lock:
+            self._counters.clear()
+            self._histograms.clear()
+
+    # ------------------------------------------
+    # Exportación
+    # ------------------------------------------
+    def snapshot(self):
+        """
+        Estado actual como dict serializable
+
+        Returns:
+            dict: {'counters': [...], 'stages': [...], 'histograms': [...]}
+        """
+        with self._lock:
+            counters = [
+                {'name': name, 'labels': dict(key), 'value': value}
+                for (name, key), value in sorted(self._counters.items())
+            ]
+            histograms = [
+                {'name': name, 'labels': dict(key), **hist.summary()}
+                for (name, key), hist in sorted(self._histograms.items())
+            ]
+        stages = [h for h in histograms if h['name'] == 'stage_seconds']
+        return {'counters': counters, 'stages': stages, 'histograms': histograms}
+
+    def to_prometheus(self):
+        """Texto en formato de exposición de Prometheus"""
+        lines = []
+        with self._lock:
+            seen = set()
+            for (name, key), value in sorted(self._counters.items()):
+                full = f"{self.prefix}_{name}"
+                if full not in seen:
+                    lines.append(f"# TYPE {full} counter")
+                    seen.add(full)
+                lines.append(f"{full}{_format_labels(key)} {value}")
+
+            for (name, key), hist in sorted(self._histograms.items()):
+                full = f"{self.prefix}_{name}"
+                if full not in seen:
+                    lines.append(f"# TYPE {full} histogram")
+                    seen.add(full)
+                for bound, cum in zip(hist.buckets, hist.cumulative()):
+                    bucket_key = key + (('le', repr(bound)),)
+                    lines.append(f"{full}_bucket{_format_labels(bucket_key)} {cum}")
+                lines.append(f"{full}_bucket{_format_labels(key + (('le', '+Inf'),))} {hist.count}")
+                lines.append(f"{full}_sum{_format_labels(key)} {hist.sum}")
+                lines.append(f"{full}_count{_format_labels(key)} {hist.count}")
+        return '\n'.join(lines) + '\n'
+
+    def write_prometheus(self, path):
+        """Escribe las métricas a un archivo (p. ej. para node_exporter textfile)"""
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            f.write(self.to_prometheus())
+        # Reemplazo atómico para que el scraper nunca lea un archivo a medias
+        os.replace(tmp_path, path)
+        return path
+
+    def serve(self, port=9108, host='127.0.0.1'):
+        """
+        Expone /metrics por HTTP en un hilo en segundo plano
+
+        Returns:
+            ThreadingHTTPServer: Servidor en ejecución (usar .shutdown() para detenerlo)
+        """
+        registry = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.rstrip('/') != '/metrics':
+                    self.send_error(404)
+                    return
+                body = registry.to_prometheus().encode('utf-8')
+                self.send_response(200)
+                self.send_header('Content-Type', 'text/plain; version=0.0.4')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        server = ThreadingHTTPServer((host, port), Handler)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        get_event_logger().info('metrics_serving', url=f"http://{host}:{port}/metrics")
+        return server
+
+
+class _Timer:
+    """Context manager devuelto por MetricsRegistry.timer"""
+
+    def __init__(self, registry, stage, labels):
+        self.registry = registry
+        self.stage = stage
+        self.labels = labels
+        self.elapsed = 0.0
+
+    def __enter__(self):
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.elapsed = time.perf_counter() - self._start
+        self.registry.observe_stage(self.stage, self.elapsed, **self.labels)
+        return False
+
+
+# Registro global por defecto del proceso
+METRICS = MetricsRegistry()
+
+
+def record_predict_speed(registry, results, **labels):
+    """
+    Registra los tiempos internos de Ultralytics (`results.speed`, en ms)
+    como etapas preprocess / inference / postprocess.
+    """
+    speed = getattr(results, 'speed', None) or {}
+    for stage in ('preprocess', 'inference', 'postprocess'):
+        if speed.get(stage) is not None:
+            registry.observe_stage(stage, speed[stage] / 1000.0, **labels)
@@ -0,0 +1,255 @@
+import json
+import os
+
+
+# ============================================
+# CONFIGURACIÓN DE VARIANTES CUANTIZADAS
+# ============================================
+# Cada variante indica el formato de exportación de Ultralytics y los
+# argumentos extra. FP16 usa ONNX en media precisión y INT8 usa OpenVINO
+# con calibración sobre el dataset (requiere `data`).
+VARIANTS = {
+    'fp16': {'format': 'onnx', 'half': True},
+    'int8': {'format': 'openvino', 'int8': True},
+}
+
+# Clases críticas para el veredicto de cumplimiento
+CRITICAL_CLASSES = ['goggles', 'gloves', 'helmet']
+
+# Tolerancias máximas de regresión frente al modelo float (puntos absolutos)
+DEFAULT_TOLERANCE = {
+    'map50': 0.02,
+    'map': 0.02,
+    'recall': 0.03,
+}
+
+# Archivo que indica qué variante está activa (junto a los pesos base)
+REGISTRY_NAME = 'active_model.json'
+
+
+def registry_path(model_path):
+    """Ruta del registro de variante activa para unos pesos base"""
+    return os.path.join(os.path.dirname(os.path.abspath(model_path)), REGISTRY_NAME)
+
+
+def weights_signature(model_path):
+    """Firma de los pesos base (tamaño + mtime) para detectar un reentrenamiento"""
+    stat = os.stat(model_path)
+    return {'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns}
+
+
+def resolve_model_path(model_path):
+    """
+    Devuelve la ruta del modelo a cargar: la variante activa si existe
+    un registro válido junto a los pesos, o los pesos originales.
+
+    El registro solo es válido si la firma de los pesos base coincide con
+    la guardada al activar; tras reentrenar se vuelve a los pesos nuevos.
+    """
+    path = registry_path(model_path)
+    if not os.path.exists(path):
+        return model_path
+
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            active = json.load(f)
+    except (OSError, ValueError):
+        return model_path
+
+    try:
+        current = weights_signature(model_path)
+    except OSError:
+        return model_path
+    if active.get('base_signature') != current:
+        return model_path
+
+    variant_path = active.get('path')
+    if variant_path and os.path.exists(variant_path):
+        return variant_path
+    return model_path
+
+
+def _onnx_is_fp16(path):
+    """True si la entrada del modelo ONNX es FP16 y sus pesos incluyen tensores FP16"""
+    import onnx
+
+    graph = onnx.load(path).graph
+    FLOAT16 = onnx.TensorProto.FLOAT16
+    if graph.input[0].type.tensor_type.elem_type != FLOAT16:
+        return False
+    # Algunas constantes auxiliares (escalas de Resize) siguen en FP32
+    return any(t.data_type == FLOAT16 for t in graph.initializer)
+
+
+class ModelQuantizer:
+    """
+    Genera variantes cuantizadas (FP16 / INT8) del detector y solo activa
+    las que no empeoran la precisión más allá de la tolerancia configurada.
+
+    ============================================
+    GUARDA DE PRECISIÓN:
+    ============================================
+    - mAP50 y mAP50-95 sobre datasets/images/val
+    - Recall por clase (goggles, gloves, helmet)
+    Comparados contra el modelo float original
+    ============================================
+    """
+
+    def __init__(self, model_path, data_yaml='ppe_data.yaml', imgsz=640, tolerance=None):
+        self.model_path = model_path
+        self.data_yaml = data_yaml
+        self.imgsz = imgsz
+        self.tolerance = dict(DEFAULT_TOLERANCE)
+        if tolerance:
+            self.tolerance.update(tolerance)
+        self.baseline = None
+
+    def export_variant(self, variant):
+        """
+        Exporta una variante cuantizada del modelo base
+
+        Args:
+            variant: Nombre de la variante ('fp16', 'int8')
+
+        Returns:
+            str: Ruta del modelo exportado
+        """
+        if variant not in VARIANTS:
+            raise ValueError(f"Variante desconocida: {variant} (opciones: {list(VARIANTS)})")
+
+        options = dict(VARIANTS[variant])
+        if options.get('int8'):
+            # La calibración INT8 necesita imágenes representativas
+            options['data'] = self.data_yaml
+        if options.get('half'):
+            # Ultralytics ignora half en CPU (exporta FP32 con solo un aviso)
+            import torch
+            if not torch.cuda.is_available():
+                raise RuntimeError("La exportación FP16 requiere una GPU CUDA")
+            options['device'] = 0
+
+        from ultralytics import YOLO
+        model = YOLO(self.model_path)
+        print(f"📦 Exportando variante {variant} ({options['format']})...")
+        exported = str(model.export(imgsz=self.imgsz, **options))
+        if options.get('half') and not _onnx_is_fp16(exported):
+            raise RuntimeError(f"La variante {variant} no quedó en FP16: {exported}")
+        print(f"✅ Variante exportada: {exported}")
+        return exported
+
+    def validate(self, model_path, split='val'):
+        """
+        Mide mAP y recall por clase de un modelo sobre el split indicado
+
+        Args:
+            model_path: Ruta del modelo (.pt o exportado)
+            split: Split del dataset ('val' o 'test')
+
+        Returns:
+            dict: {'map50', 'map', 'recall': {clase: recall}}
+        """
+        from ultralytics import YOLO
+        model = YOLO(model_path, task='detect')
+        metrics = model.val(
+            data=self.data_yaml,
+            split=split,
+            imgsz=self.imgsz,
+            batch=1,
+            verbose=False,
+            plots=False
+        )
+
+        recall = {}
+        for i, class_id in enumerate(metrics.ap_class_index):
+            class_name = metrics.names[int(class_id)]
+            recall[class_name] = float(metrics.box.r[i])
+
+        return {
+            'map50': float(metrics.box.map50),
+            'map': float(metrics.box.map),
+            'recall': recall
+        }
+
+    def compare(self, baseline, candidate):
+        """
+        Compara las métricas de una variante contra el modelo float
+
+        Returns:
+            tuple: (aceptada, lista de regresiones)
+        """
+        regressions = []
+
+        for key in ('map50', 'map'):
+            drop = baseline[key] - candidate[key]
+            if drop > self.tolerance[key]:
+                regressions.append(f"{key}: {baseline[key]:.3f} → {candidate[key]:.3f}")
+
+        for class_name in CRITICAL_CLASSES:
+            base_r = baseline['recall'].get(class_name)
+            cand_r = candidate['recall'].get(class_name, 0.0)
+            if base_r is None:
+                continue
+            if base_r - cand_r > self.tolerance['recall']:
+                regressions.append(f"recall {class_name}: {base_r:.3f} → {cand_r:.3f}")
+
+        return len(regressions) == 0, regressions
+
+    def activate(self, variant, variant_path, metrics):
+        """Registra la variante como activa junto a los pesos base"""
+        with open(registry_path(self.model_path), 'w', encoding='utf-8') as f:
+            json.dump({
+                'variant': variant,
+                'path': os.path.abspath(variant_path),
+                'base_model': os.path.abspath(self.model_path),
+                'base_signature': weights_signature(self.model_path),
+                'metrics': metrics,
+                'baseline': self.baseline
+            }, f, indent=2)
+        print(f"🚀 Variante activa: {variant} ({variant_path})")
+
+    def deactivate(self):
+        """Vuelve a usar el modelo float original"""
+        path = registry_path(self.model_path)
+        if os.path.exists(path):
+            os.remove(path)
+            print("↩️  Registro eliminado, se usará el modelo float")
+
+    def build_and_select(self, variants=('int8', 'fp16')):
+        """
+        Exporta y valida cada variante en orden de preferencia y activa la
+        primera que respeta la tolerancia.
+
+        Returns:
+            str | None: Variante activada, o None si ninguna pasó la guarda
+        """
+        print(f"📏 Validando modelo float: {self.model_path}")
+        self.baseline = self.validate(self.model_path)
+
+        for variant in variants:
+            try:
+                variant_path = self.export_variant(variant)
+            except Exception as e:
+                print(f"⚠️  No se pudo exportar {variant}: {e}")
+                continue
+
+            print(f"📏 Validando variante {variant}...")
+            metrics = self.validate(variant_path)
+            accepted, regressions = self.compare(self.baseline, metrics)
+
+            if accepted:
+                self.activate(variant, variant_path, metrics)
+                return variant
+
+            print(f"❌ Variante {variant} rechazada por regresión:")
+            for r in regressions:
+                print(f"   - {r}")
+
+        print("💡 Ninguna variante pasó la guarda, se mantiene el modelo float")
+        self.deactivate()
+        return None
+
+
+# Ejemplo de uso
+if __name__ == "__main__":
+    quantizer = ModelQuantizer('../runs/detect/train10/weights/best.pt', data_yaml='../ppe_data.yaml')
+    quantizer.build_and_select()
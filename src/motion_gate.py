@@ -0,0 +1,87 @@
+import cv2
+import numpy as np
+
+
+class MotionGate:
+    """
+    Detector de cambios barato para decidir si un frame necesita inferencia
+
+    Trabaja sobre frames reducidos en escala de grises. Compara contra el
+    último frame que pasó por el modelo (no contra el anterior), así los
+    cambios lentos se acumulan hasta disparar una nueva inferencia.
+
+    ============================================
+    MÉTODOS:
+    ============================================
+    diff: diferencia absoluta contra el frame de referencia
+    mog2: sustracción de fondo (cv2.createBackgroundSubtractorMOG2)
+    ============================================
+    """
+
+    def __init__(self, method='diff', width=160, pixel_threshold=25, min_changed_ratio=0.002,
+                 max_skip=30, blur=5):
+        """
+        Args:
+            method: 'diff' o 'mog2'
+            width: Ancho del frame reducido (se mantiene la proporción)
+            pixel_threshold: Diferencia de gris para considerar un píxel cambiado
+            min_changed_ratio: Fracción de píxeles cambiados que dispara inferencia
+            max_skip: Máximo de frames seguidos sin inferencia (refresco forzado)
+            blur: Kernel del desenfoque gaussiano contra ruido del sensor (0 = sin desenfoque)
+        """
+        if method not in ('diff', 'mog2'):
+            raise ValueError(f"Método desconocido: {method} (opciones: diff, mog2)")
+        self.method = method
+        self.width = width
+        self.pixel_threshold = pixel_threshold
+        self.min_changed_ratio = min_changed_ratio
+        self.max_skip = max_skip
+        self.blur = blur
+        self.reset()
+
+    def reset(self):
+        """Olvida el estado (llamar al empezar un video nuevo)"""
+        self._reference = None
+        self._subtractor = None
+        self._skipped = 0
+        self.last_ratio = 1.0
+        if self.method == 'mog2':
+            self._subtractor = cv2.createBackgroundSubtractorMOG2(detectShadows=False)
+
+    def _small_gray(self, frame):
+        h, w = frame.shape[:2]
+        height = max(1, int(h * self.width / w))
+        small = cv2.resize(frame, (self.width, height), interpolation=cv2.INTER_AREA)
+        gray = cv2.cvtColor(small, cv2.COLOR_BGR2GRAY) if small.ndim == 3 else small
+        if self.blur:
+            gray = cv2.GaussianBlur(gray, (self.blur, self.blur), 0)
+        return gray
+
+    def should_infer(self, frame):
+        """
+        Decide si el frame debe pasar por el detector
+
+        Returns:
+            bool: True si hubo cambios (o toca refresco); False para reutilizar
+            los resultados del último frame analizado
+        """
+        gray = self._small_gray(frame)
+
+        if self.method == 'mog2':
+            mask = self._subtractor.apply(gray)
+            self.last_ratio = np.count_nonzero(mask) / mask.size
+            changed = self.last_ratio >= self.min_changed_ratio
+        elif self._reference is None:
+            changed = True
+        else:
+            diff = cv2.absdiff(gray, self._reference)
+            self.last_ratio = np.count_nonzero(diff > self.pixel_threshold) / diff.size
+            changed = self.last_ratio >= self.min_changed_ratio
+
+        if changed or self._skipped >= self.max_skip:
+            self._reference = gray
+            self._skipped = 0
+            return True
+
+        self._skipped += 1
+        return False
@@ -0,0 +1,112 @@
+"""
+Cascada de presencia de personas
+
+Una primera pasada barata responde "¿hay alguien?" y el modelo completo
+de EPP (11 clases, resolución completa) solo corre donde la respuesta es
+sí. Sirve tanto un modelo pequeño de personas (p. ej. yolov8n COCO) como
+el mismo modelo de EPP a baja resolución restringido a la clase persona.
+
+El umbral de la cascada es más bajo que el del detector completo: un
+falso positivo solo cuesta una inferencia de más, un falso negativo
+pierde una persona.
+"""
+import cv2
+
+from metrics import METRICS
+from safety_zones import predict_in_zones
+
+
+def person_class_id(names):
+    """Índice de la clase persona ('Person' en el modelo EPP, 'person' en COCO)"""
+    for class_id, name in names.items():
+        if name.lower() == 'person':
+            return class_id
+    raise ValueError(f"El modelo de la cascada no tiene clase persona: {list(names.values())}")
+
+
+def load_cascade(spec, model=None, imgsz=320, conf=0.15, metrics=None):
+    """
+    Crea la cascada desde la opción de línea de comandos
+
+    Args:
+        spec: 'self' (mismo modelo a baja resolución) o ruta de un modelo de personas
+        model: Modelo de EPP ya cargado (para 'self')
+    """
+    if spec == 'self':
+        cascade_model = model
+    else:
+        from ultralytics import YOLO
+        cascade_model = YOLO(spec, task='detect')
+    return PersonCascade(cascade_model, imgsz=imgsz, conf=conf, metrics=metrics)
+
+
+class PersonCascade:
+    """
+    Etapa previa de detección de personas
+
+    ============================================
+    MÉTRICAS:
+    ============================================
+    checked:   Imágenes / frames evaluados por la cascada
+    positive:  Con alguna persona (pasan al modelo completo)
+    hit_rate:  positive / checked (fracción que paga la inferencia completa)
+    ============================================
+    """
+
+    def __init__(self, model, imgsz=320, conf=0.15, metrics=None):
+        """
+        Args:
+            model: Modelo YOLO con una clase persona
+            imgsz: Resolución de la pasada (más baja = más barata)
+            conf: Umbral de confianza de persona
+        """
+        self.model = model
+        self.imgsz = imgsz
+        self.conf = conf
+        self.metrics = metrics or METRICS
+        self.person_class = person_class_id(model.names)
+        self.checked = 0
+        self.positive = 0
+
+    @staticmethod
+    def load(sources):
+        """
+        Decodifica las rutas una sola vez para ambas etapas
+
+        Las que no se pueden leer se dejan como ruta (el modelo informará el error).
+        """
+        images = []
+        for source in sources:
+            image = cv2.imread(source) if isinstance(source, str) else source
+            images.append(source if image is None else image)
+        return images
+
+    def detect(self, sources, zones=None, component='image'):
+        """
+        Pasada de personas (respeta el recorte de zonas, igual que el detector completo)
+
+        Returns:
+            list: Results por fuente; sin cajas = sin personas
+        """
+        results = predict_in_zones(
+            self.model,
+            sources,
+            zones,
+            imgsz=self.imgsz,
+            conf=self.conf,
+            classes=[self.person_class],
+            verbose=False
+        )
+        positive = sum(1 for r in results if len(r.boxes))
+        self.checked += len(results)
+        self.positive += positive
+        self.metrics.inc('cascade_checked_total', len(results), component=component)
+        self.metrics.inc('cascade_positive_total', positive, component=component)
+        return results
+
+    @property
+    def hit_rate(self):
+        return self.positive / self.checked if self.checked else 0.0
+
+    def stats(self):
+        return {'checked': self.checked, 'positive': self.positive, 'hit_rate': self.hit_rate}
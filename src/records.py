@@ -0,0 +1,246 @@
+"""
+Registros compactos de resultados (arrays estructurados de NumPy)
+
+Personas y frames con violación se guardan como filas de arrays
+estructurados, con los EPP presentes codificados en una máscara de bits.
+Las vistas (PersonView, FrameView) se comportan como los dicts de antes
+(`p['complies']`, `p.get(...)`, `dict(p)`, `{**p}`), así que los
+consumidores existentes no cambian.
+"""
+from collections.abc import Mapping, Sequence
+
+import numpy as np
+
+
+# ============================================
+# MÁSCARA DE BITS DE EPP
+# ============================================
+HELMET, VEST, GLOVES, GOGGLES, BOOTS = 1, 2, 4, 8, 16
+
+ITEM_BITS = {'helmet': HELMET, 'vest': VEST, 'gloves': GLOVES, 'goggles': GOGGLES, 'boots': BOOTS}
+
+# Obligatorios: casco + chaleco + guantes + gafas (botas recomendadas)
+REQUIRED = HELMET | VEST | GLOVES | GOGGLES
+
+# Nombres en missing_items, en el orden de siempre
+MISSING_LABELS = (
+    (HELMET, 'casco'),
+    (VEST, 'chaleco'),
+    (GLOVES, 'guantes'),
+    (GOGGLES, 'gafas'),
+    (BOOTS, 'botas (recomendado)'),
+)
+
+
+def complies(present):
+    """Cumplimiento a partir de la máscara (escalar o array)"""
+    return (present & REQUIRED) == REQUIRED
+
+
+def missing_items(present):
+    return [label for bit, label in MISSING_LABELS if not present & bit]
+
+
+# ============================================
+# PERSONAS (por imagen)
+# ============================================
+PERSON_DTYPE = np.dtype([
+    ('person_id', '<u2'),
+    ('present', 'u1'),
+    ('confidence', '<f4'),
+    ('bbox', '<f4', (4,)),
+    ('zones', '<u4'),
+])
+
+
+class PersonView(Mapping):
+    """Vista tipo dict de una fila de PersonRecords"""
+    __slots__ = ('_records', '_i')
+
+    KEYS = ('person_id', 'complies', 'has_helmet', 'has_vest', 'has_boots', 'has_goggles',
+            'has_gloves', 'missing_items', 'confidence', 'bbox', 'zones')
+
+    def __init__(self, records, i):
+        self._records = records
+        self._i = i
+
+    def __getitem__(self, key):
+        if not isinstance(key, str):
+            raise KeyError(key)
+        row = self._records.data[self._i]
+        if key.startswith('has_') and key[4:] in ITEM_BITS:
+            return bool(row['present'] & ITEM_BITS[key[4:]])
+        if key == 'complies':
+            return bool(complies(int(row['present'])))
+        if key == 'missing_items':
+            return missing_items(int(row['present']))
+        if key == 'person_id':
+            return int(row['person_id'])
+        if key == 'confidence':
+            return float(row['confidence'])
+        if key == 'bbox':
+            return row['bbox']
+        if key == 'zones':
+            return self._records.zone_names(int(row['zones']))
+        raise KeyError(key)
+
+    def __iter__(self):
+        return iter(self.KEYS)
+
+    def __len__(self):
+        return len(self.KEYS)
+
+    def __repr__(self):
+        return repr(dict(self))
+
+
+class PersonRecords(Sequence):
+    """
+    Personas analizadas de una imagen (array estructurado PERSON_DTYPE)
+
+    Args:
+        data: Array estructurado (o None para vacío)
+        zone_names: Nombres de las zonas, en el orden de sus bits
+    """
+    __slots__ = ('data', 'zone_labels')
+
+    def __init__(self, data=None, zone_names=()):
+        self.data = np.zeros(0, dtype=PERSON_DTYPE) if data is None else data
+        self.zone_labels = tuple(zone_names)
+
+    @classmethod
+    def build(cls, present, confidences, bboxes, zones=None, zone_names=()):
+        """Crea los registros a partir de listas paralelas"""
+        n = len(present)
+        data = np.zeros(n, dtype=PERSON_DTYPE)
+        if n:
+            data['person_id'] = np.arange(1, n + 1)
+            data['present'] = present
+            data['confidence'] = confidences
+            data['bbox'] = np.asarray(bboxes, dtype=np.float32).reshape(n, 4)
+            if zones is not None:
+                data['zones'] = zones
+        return cls(data, zone_names)
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return PersonRecords(self.data[i], self.zone_labels)
+        if i < 0:
+            i += len(self.data)
+        if not 0 <= i < len(self.data):
+            raise IndexError(i)
+        return PersonView(self, i)
+
+    def __len__(self):
+        return len(self.data)
+
+    @property
+    def compliant(self):
+        """Array bool de cumplimiento por persona"""
+        return complies(self.data['present'])
+
+    def zone_names(self, label):
+        return [name for i, name in enumerate(self.zone_labels) if label >> i & 1]
+
+    def to_dicts(self):
+        return [dict(p) for p in self]
+
+
+# ============================================
+# FRAMES CON VIOLACIÓN (por video)
+# ============================================
+FRAME_DTYPE = np.dtype([
+    ('frame', '<u4'),
+    ('time', '<f4'),
+    ('persons', '<u2'),
+    ('helmets', '<u2'),
+    ('vests', '<u2'),
+    ('gloves', '<u2'),
+    ('goggles', '<u2'),
+    ('boots', '<u2'),
+])
+
+
+class FrameView(Mapping):
+    """Vista tipo dict de una fila de FrameRecords"""
+    __slots__ = ('_records', '_i')
+
+    def __init__(self, records, i):
+        self._records = records
+        self._i = i
+
+    def __getitem__(self, key):
+        # Claves desconocidas: KeyError (contrato de Mapping para get / in), no el ValueError de NumPy
+        if key not in FRAME_DTYPE.names:
+            raise KeyError(key)
+        value = self._records.data[self._i][key]
+        return float(value) if key == 'time' else int(value)
+
+    def __iter__(self):
+        return iter(FRAME_DTYPE.names)
+
+    def __len__(self):
+        return len(FRAME_DTYPE.names)
+
+    def __repr__(self):
+        return repr(dict(self))
+
+
+class FrameRecords(Sequence):
+    """
+    Lista de frames (FRAME_DTYPE) que crece por duplicación
+
+    `append(frame=..., time=..., **conteos)` reemplaza a
+    `violations.append({'frame': ..., 'time': ..., **conteos})`.
+    """
+    __slots__ = ('_data', '_size')
+
+    def __init__(self, data=None, capacity=256):
+        if data is None:
+            self._data = np.zeros(capacity, dtype=FRAME_DTYPE)
+            self._size = 0
+        else:
+            self._data = data
+            self._size = len(data)
+
+    @property
+    def data(self):
+        return self._data[:self._size]
+
+    def append(self, frame, time, **counts):
+        if self._size == len(self._data):
+            grown = np.zeros(max(256, len(self._data) * 2), dtype=FRAME_DTYPE)
+            grown[:self._size] = self._data[:self._size]
+            self._data = grown
+        row = self._data[self._size]
+        row['frame'] = frame
+        row['time'] = time
+        for key, value in counts.items():
+            row[key] = value
+        self._size += 1
+
+    def copy(self):
+        return FrameRecords(self.data.copy())
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return FrameRecords(self.data[i])
+        if i < 0:
+            i += self._size
+        if not 0 <= i < self._size:
+            raise IndexError(i)
+        return FrameView(self, i)
+
+    def __len__(self):
+        return self._size
+
+    def __getstate__(self):
+        # Al serializar (pickle entre procesos) solo viajan las filas usadas
+        return self.data.copy(), None
+
+    def __setstate__(self, state):
+        self._data = state[0]
+        self._size = len(state[0])
+
+    def to_dicts(self):
+        return [dict(v) for v in self]
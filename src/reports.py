@@ -0,0 +1,229 @@
+from dataclasses import dataclass, field, fields
+import json
+import os
+
+
+# ============================================
+# OBJETOS DE REPORTE
+# ============================================
+@dataclass
+class ImageReport:
+    """Reporte de cumplimiento de una imagen"""
+    image: str
+    total_persons: int
+    total_detections: int
+    compliant: int
+    non_compliant: int
+    persons: list = field(default_factory=list)
+
+    @property
+    def compliance_rate(self):
+        return (self.compliant / self.total_persons * 100) if self.total_persons > 0 else 0
+
+    def to_dict(self):
+        # persons puede ser records.PersonRecords: se convierte fila a fila (sin deepcopy)
+        data = {f.name: getattr(self, f.name) for f in fields(self)}
+        data['persons'] = [dict(p) for p in self.persons]
+        return data
+
+
+@dataclass
+class VideoReport:
+    """Reporte de cumplimiento de un video"""
+    input_video: str
+    output_video: str
+    total_frames: int
+    compliant_frames: int
+    violations: list = field(default_factory=list)
+    # Muestreo del análisis (frames consecutivos analizados distan `stride`)
+    stride: int = 1
+
+    @property
+    def violation_frames(self):
+        return len(self.violations)
+
+    @property
+    def compliance_rate(self):
+        return (self.compliant_frames / self.total_frames) * 100 if self.total_frames > 0 else 0
+
+    @property
+    def violation_rate(self):
+        return 100 - self.compliance_rate
+
+    @property
+    def rating(self):
+        rate = self.compliance_rate
+        return 'ALTA' if rate > 80 else 'MEDIA' if rate > 50 else 'BAJA'
+
+    @property
+    def recommendation(self):
+        return 'Mantener prácticas actuales' if self.compliance_rate > 90 else 'Reforzar capacitación en EPP'
+
+    def to_dict(self, include_violations=True):
+        data = {f.name: getattr(self, f.name) for f in fields(self)}
+        if include_violations:
+            data['violations'] = [dict(v) for v in self.violations]
+        else:
+            data.pop('violations')
+        data.update({
+            'violation_frames': self.violation_frames,
+            'compliance_rate': self.compliance_rate,
+            'violation_rate': self.violation_rate,
+            'rating': self.rating,
+            'recommendation': self.recommendation
+        })
+        return data
+
+
+def build_image_report(compliance_data):
+    """Crea un ImageReport a partir del dict de detect_compliance"""
+    return ImageReport(
+        image=str(compliance_data['image']),
+        total_persons=compliance_data['total_persons'],
+        total_detections=compliance_data['total_detections'],
+        compliant=compliance_data['summary']['compliant'],
+        non_compliant=compliance_data['summary']['non_compliant'],
+        persons=compliance_data['compliance_results']
+    )
+
+
+# ============================================
+# RENDERIZADORES
+# ============================================
+def _render_image_text(report):
+    lines = []
+    lines.append("\n" + "="*70)
+    lines.append("📋 REPORTE DE CUMPLIMIENTO DE EPP")
+    lines.append("="*70)
+    lines.append(f"📁 Imagen: {report.image}")
+    lines.append(f"👥 Personas detectadas: {report.total_persons}")
+    lines.append(f"📦 Total de detecciones: {report.total_detections}")
+    lines.append(f"✅ Personas en cumplimiento: {report.compliant}")
+    lines.append(f"❌ Personas sin cumplimiento: {report.non_compliant}")
+
+    lines.append("\n" + "📌 CRITERIOS DE CUMPLIMIENTO".center(70))
+    lines.append("Obligatorios: Casco + Chaleco + Guantes + Gafas")
+    lines.append("Recomendados: Botas")
+    lines.append("-"*70)
+
+    for result in report.persons:
+        status = "✅ CUMPLE" if result['complies'] else "❌ NO CUMPLE"
+        lines.append(f"\n👤 Persona {result['person_id']}: {status}")
+        lines.append(f"   Confianza: {result['confidence']:.2%}")
+        lines.append(f"   {'='*50}")
+        lines.append(f"   ⛑️  Casco:    {'✓ Detectado' if result['has_helmet'] else '✗ FALTA'}")
+        lines.append(f"   🦺 Chaleco:  {'✓ Detectado' if result['has_vest'] else '✗ FALTA'}")
+        lines.append(f"   🧤 Guantes:  {'✓ Detectado' if result['has_gloves'] else '✗ FALTA'}")
+        lines.append(f"   🥽 Gafas:    {'✓ Detectado' if result['has_goggles'] else '✗ FALTA'}")
+        lines.append(f"   🥾 Botas:    {'✓ Detectado' if result['has_boots'] else '○ No detectado (opcional)'}")
+
+        if result['missing_items']:
+            obligatorios = [x for x in result['missing_items'] if 'recomendado' not in x]
+            recomendados = [x for x in result['missing_items'] if 'recomendado' in x]
+
+            if obligatorios:
+                lines.append(f"   ⚠️  FALTA (obligatorio): {', '.join(obligatorios)}")
+            if recomendados:
+                lines.append(f"   💡 Recomendado: {', '.join(recomendados)}")
+
+    lines.append("\n" + "="*70)
+    return '\n'.join(lines)
+
+
+def _render_video_text(report):
+    rating_icon = {'ALTA': '✅ ALTA', 'MEDIA': '⚠️ MEDIA', 'BAJA': '❌ BAJA'}[report.rating]
+
+    lines = []
+    lines.append("\n" + "="*70)
+    lines.append("📊 REPORTE DE ANÁLISIS DE VIDEO - CUMPLIMIENTO EPP")
+    lines.append("="*70)
+    lines.append(f"📁 Video original: {os.path.basename(report.input_video)}")
+    lines.append(f"💾 Video analizado: {os.path.basename(report.output_video)}")
+
+    lines.append("\n" + "📌 CRITERIOS DE CUMPLIMIENTO".center(70))
+    lines.append("Obligatorios: Casco + Chaleco + Guantes + Gafas")
+    lines.append("Recomendados: Botas")
+    lines.append("-"*70)
+
+    lines.append(f"\n📈 ESTADÍSTICAS GENERALES:")
+    lines.append(f"   ├─ Total de frames procesados: {report.total_frames}")
+    lines.append(f"   ├─ Frames con cumplimiento: {report.compliant_frames} ({report.compliance_rate:.2f}%)")
+    lines.append(f"   ├─ Frames con violaciones: {report.violation_frames} ({report.violation_rate:.2f}%)")
+    lines.append(f"   └─ Tasa de cumplimiento: {rating_icon}")
+
+    if report.violations:
+        lines.append(f"\n⚠️  VIOLACIONES DETECTADAS ({report.violation_frames} frames):")
+        lines.append(f"   Mostrando primeras 10 violaciones:")
+        lines.append(f"   {'Frame':<8} {'Tiempo':<10} {'Pers':<6} {'Casco':<7} {'Chaleco':<9} {'Guantes':<9} {'Gafas'}")
+        lines.append(f"   {'-'*65}")
+
+        for v in report.violations[:10]:
+            lines.append(f"   {v['frame']:<8} {v['time']:.2f}s{' '*4} "
+                         f"{v['persons']:<6} {v['helmets']:<7} {v['vests']:<9} "
+                         f"{v.get('gloves', 0):<9} {v.get('goggles', 0)}")
+
+        if report.violation_frames > 10:
+            lines.append(f"   ... y {report.violation_frames - 10} violaciones más")
+    else:
+        lines.append(f"\n✅ ¡EXCELENTE! No se detectaron violaciones de EPP")
+
+    lines.append("="*70)
+    lines.append(f"💡 Recomendación: {report.recommendation}")
+    lines.append("="*70 + "\n")
+    return '\n'.join(lines)
+
+
+def render_text(report):
+    """Reporte legible como texto"""
+    if isinstance(report, VideoReport):
+        return _render_video_text(report)
+    return _render_image_text(report)
+
+
+def render_console(report):
+    """Imprime el reporte en consola"""
+    print(render_text(report))
+
+
+def _json_default(value):
+    # Arrays de NumPy (p. ej. bbox) y escalares NumPy
+    return value.tolist() if hasattr(value, 'tolist') else float(value)
+
+
+def render_file(report, path):
+    """
+    Guarda el reporte en disco: JSON si la ruta termina en .json,
+    texto legible en cualquier otro caso.
+    """
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    with open(path, 'w', encoding='utf-8') as f:
+        if path.endswith('.json'):
+            json.dump(report.to_dict(), f, ensure_ascii=False, indent=2, default=_json_default)
+        else:
+            f.write(render_text(report))
+    return path
+
+
+def render_streamlit(report, st=None):
+    """Muestra las métricas principales del reporte en Streamlit"""
+    if st is None:
+        import streamlit as st
+
+    col1, col2, col3, col4 = st.columns(4)
+
+    if isinstance(report, VideoReport):
+        col1.metric("🎬 Frames", report.total_frames)
+        col2.metric("✅ Cumplimiento", report.compliant_frames)
+        col3.metric("❌ Violaciones", report.violation_frames)
+        col4.metric("📈 Tasa", f"{report.compliance_rate:.1f}%")
+    else:
+        col1.metric("👥 Personas", report.total_persons, help="Total de personas detectadas")
+        col2.metric("✅ Cumplimiento", report.compliant, help="Personas que cumplen normativas")
+        col3.metric(
+            "❌ Violaciones",
+            report.non_compliant,
+            delta=f"-{report.non_compliant}",
+            delta_color="inverse",
+            help="Personas con violaciones"
+        )
+        col4.metric("📈 Tasa", f"{report.compliance_rate:.0f}%", help="Porcentaje de cumplimiento")
@@ -0,0 +1,201 @@
+import numpy as np
+
+
+# Campos acumulados por intervalo (enteros)
+FIELDS = ('frames', 'compliant', 'violations', 'persons', 'persons_max',
+          'missing_helmets', 'missing_vests', 'missing_gloves', 'missing_goggles')
+
+# Conteo del frame → campo de faltantes (personas - EPP detectados)
+MISSING = {
+    'missing_helmets': 'helmets',
+    'missing_vests': 'vests',
+    'missing_gloves': 'gloves',
+    'missing_goggles': 'goggles',
+}
+
+# Resoluciones mantenidas durante el análisis (segundos por intervalo)
+RESOLUTIONS = (1, 60)
+
+
+class _Buckets:
+    """Arrays por intervalo que crecen por duplicación (amortizado O(1))"""
+
+    def __init__(self, resolution, capacity=64):
+        self.resolution = resolution
+        self.size = 0
+        self.data = np.zeros((len(FIELDS), capacity), dtype=np.int32)
+
+    def _ensure(self, index):
+        if index >= self.data.shape[1]:
+            capacity = max(index + 1, self.data.shape[1] * 2)
+            grown = np.zeros((len(FIELDS), capacity), dtype=np.int32)
+            grown[:, :self.data.shape[1]] = self.data
+            self.data = grown
+        self.size = max(self.size, index + 1)
+
+    def add(self, time, values):
+        index = int(time // self.resolution)
+        self._ensure(index)
+        column = self.data[:, index]
+        column += values
+        # persons_max es máximo, no suma
+        column[_MAX] = max(column[_MAX] - values[_MAX], values[_MAX])
+
+    def add_many(self, times, values):
+        """Acumula varios frames a la vez (values: campos x frames)"""
+        if values.shape[1] == 0:
+            return
+        index = (np.asarray(times) // self.resolution).astype(np.int64)
+        self._ensure(int(index.max()))
+        for i in range(len(FIELDS)):
+            if i == _MAX:
+                np.maximum.at(self.data[i], index, values[i])
+            else:
+                np.add.at(self.data[i], index, values[i])
+
+    def view(self):
+        return self.data[:, :self.size]
+
+
+_MAX = FIELDS.index('persons_max')
+
+
+class ComplianceRollup:
+    """
+    Resúmenes de cumplimiento por segundo y por minuto, calculados frame a
+    frame durante el análisis y guardados como arrays compactos (int32)
+
+    ============================================
+    POR INTERVALO:
+    ============================================
+    frames, compliant, violations: frames totales / que cumplen / con violación
+    persons, persons_max:          suma y máximo de personas por frame
+    missing_*:                     EPP faltantes acumulados (personas - detectados)
+    ============================================
+    """
+
+    def __init__(self, fps=30, resolutions=RESOLUTIONS):
+        self.fps = fps
+        self._buckets = {r: _Buckets(r) for r in resolutions}
+
+    def update(self, time, complies, counts):
+        """
+        Acumula un frame
+
+        Args:
+            time: Segundo del frame en el video
+            complies: Veredicto del frame
+            counts: Conteos por tipo (persons, helmets, vests, gloves, goggles)
+        """
+        persons = counts['persons']
+        values = np.array([
+            1,
+            int(complies),
+            int(not complies and persons > 0),
+            persons,
+            persons,
+            *(max(0, persons - counts.get(item, 0)) for item in MISSING.values())
+        ], dtype=np.int32)
+        for buckets in self._buckets.values():
+            buckets.add(time, values)
+
+    def update_many(self, times, complies, counts):
+        """
+        Acumula muchos frames de forma vectorizada (re-evaluación desde un almacén)
+
+        Args:
+            times: Array con el segundo de cada frame
+            complies: Array bool con el veredicto de cada frame
+            counts: Dict tipo → array de conteos por frame
+        """
+        persons = np.asarray(counts['persons'], dtype=np.int32)
+        complies = np.asarray(complies, dtype=bool)
+        values = np.stack([
+            np.ones_like(persons),
+            complies.astype(np.int32),
+            (~complies & (persons > 0)).astype(np.int32),
+            persons,
+            persons,
+            *(np.maximum(0, persons - np.asarray(counts[item], dtype=np.int32)) for item in MISSING.values())
+        ]).astype(np.int32)
+        for buckets in self._buckets.values():
+            buckets.add_many(times, values)
+
+    def series(self, resolution=1):
+        """
+        Arrays de un nivel de resolución
+
+        Returns:
+            dict: campo → array, más 'start' (segundo de inicio) y
+            'compliance_rate' (% de frames que cumplen, NaN sin frames)
+        """
+        view = self._buckets[resolution].view()
+        out = {name: view[i] for i, name in enumerate(FIELDS)}
+        out['start'] = np.arange(view.shape[1]) * resolution
+        with np.errstate(divide='ignore', invalid='ignore'):
+            out['compliance_rate'] = np.where(out['frames'] > 0, out['compliant'] / out['frames'] * 100, np.nan)
+        return out
+
+    @property
+    def duration(self):
+        """Duración cubierta en segundos"""
+        buckets = self._buckets[min(self._buckets)]
+        return buckets.size * buckets.resolution
+
+    def violation_segments(self, resolution=1, max_gap=1):
+        """
+        Tramos continuos con violaciones (para saltar a ellos en el video)
+
+        Args:
+            max_gap: Intervalos sin violación que todavía unen dos tramos
+
+        Returns:
+            list: [{'start', 'end', 'violations', 'missing_*'}] en segundos
+        """
+        series = self.series(resolution)
+        active = np.flatnonzero(series['violations'] > 0)
+        if len(active) == 0:
+            return []
+
+        breaks = np.flatnonzero(np.diff(active) > max_gap + 1)
+        starts = np.concatenate(([active[0]], active[breaks + 1]))
+        ends = np.concatenate((active[breaks], [active[-1]]))
+
+        segments = []
+        for s, e in zip(starts, ends):
+            segment = {
+                'start': float(s * resolution),
+                'end': float((e + 1) * resolution),
+                'violations': int(series['violations'][s:e + 1].sum())
+            }
+            for name in MISSING:
+                segment[name] = int(series[name][s:e + 1].sum())
+            segments.append(segment)
+        return segments
+
+    def arrays(self):
+        """Arrays por resolución ('r1', 'r60', ...), para guardar o incluir en un checkpoint"""
+        return {f"r{r}": b.view() for r, b in self._buckets.items()}
+
+    @classmethod
+    def from_arrays(cls, fps, arrays):
+        resolutions = sorted(int(k[1:]) for k in arrays)
+        rollup = cls(fps, resolutions)
+        for r in resolutions:
+            view = arrays[f"r{r}"]
+            buckets = rollup._buckets[r]
+            buckets.data = np.array(view, dtype=np.int32)
+            buckets.size = view.shape[1]
+        return rollup
+
+    def save(self, path):
+        """Guarda todas las resoluciones en un .npz comprimido"""
+        np.savez_compressed(path, fps=self.fps, fields=np.array(FIELDS), **self.arrays())
+        return path
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path) as data:
+            if tuple(data['fields']) != FIELDS:
+                raise ValueError(f"Campos de rollup incompatibles en {path}")
+            return cls.from_arrays(float(data['fps']), {k: data[k] for k in data.files if k.startswith('r')})
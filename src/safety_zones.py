@@ -0,0 +1,255 @@
+"""
+Zonas de seguridad poligonales por cámara
+
+Formato del archivo (JSON), coordenadas normalizadas 0-1 salvo
+"units": "pixels":
+
+    {
+      "cam-01": {
+        "crop": true,
+        "zones": [
+          {"name": "andamio", "kind": "restricted", "points": [[0.1, 0.2], [0.6, 0.2], [0.6, 0.9], [0.1, 0.9]]},
+          {"name": "oficina", "kind": "excluded", "points": [[0.7, 0.0], [1.0, 0.0], [1.0, 0.4], [0.7, 0.4]]}
+        ]
+      }
+    }
+
+Tipos: restricted y walkway delimitan dónde se exige EPP; excluded se
+ignora siempre. Si una cámara solo tiene zonas excluded, se evalúa el
+resto del frame.
+"""
+import json
+import os
+from dataclasses import dataclass
+
+import cv2
+import numpy as np
+
+
+ZONE_KINDS = ('restricted', 'walkway', 'excluded')
+
+# Máximo de zonas por cámara (un bit por zona en el mapa de etiquetas)
+MAX_ZONES = 32
+
+
+@dataclass
+class Zone:
+    """Polígono con nombre y tipo"""
+    name: str
+    kind: str
+    points: list
+    units: str = 'normalized'
+
+    def polygon(self, shape):
+        """Vértices en píxeles (int32) para un frame de tamaño `shape`"""
+        pts = np.asarray(self.points, dtype=np.float64)
+        if self.units == 'normalized':
+            h, w = shape[:2]
+            pts = pts * (w, h)
+        return np.round(pts).astype(np.int32)
+
+
+@dataclass
+class _Raster:
+    labels: np.ndarray
+    include: np.ndarray
+    rect: tuple = None
+
+
+class ZoneMap:
+    """
+    Zonas de una cámara rasterizadas en máscaras (una vez por tamaño de frame)
+
+    ============================================
+    MÁSCARAS:
+    ============================================
+    labels:  uint32, bit i activo si el píxel está en la zona i
+    include: bool, píxeles donde se evalúa el cumplimiento
+    rect:    rectángulo (x1, y1, x2, y2) que contiene `include`
+    ============================================
+    """
+
+    def __init__(self, zones, crop=True, margin=16):
+        """
+        Args:
+            zones: Lista de Zone
+            crop: Limitar la inferencia al rectángulo de las zonas activas
+            margin: Margen en píxeles alrededor del rectángulo de recorte
+        """
+        if len(zones) > MAX_ZONES:
+            raise ValueError(f"Máximo {MAX_ZONES} zonas por cámara ({len(zones)} definidas)")
+        for zone in zones:
+            if zone.kind not in ZONE_KINDS:
+                raise ValueError(f"Tipo de zona desconocido: {zone.kind} (opciones: {ZONE_KINDS})")
+        self.zones = list(zones)
+        self.crop = crop
+        self.margin = margin
+        self._rasters = {}
+
+    def raster(self, shape):
+        """Máscaras para un tamaño de frame (se calculan una sola vez)"""
+        key = tuple(shape[:2])
+        raster = self._rasters.get(key)
+        if raster is not None:
+            return raster
+
+        h, w = key
+        labels = np.zeros((h, w), dtype=np.uint32)
+        active = np.zeros((h, w), dtype=np.uint8)
+        excluded = np.zeros((h, w), dtype=np.uint8)
+        has_active = False
+
+        for i, zone in enumerate(self.zones):
+            mask = np.zeros((h, w), dtype=np.uint8)
+            cv2.fillPoly(mask, [zone.polygon(key)], 1)
+            labels |= mask.astype(np.uint32) << i
+            if zone.kind == 'excluded':
+                excluded |= mask
+            else:
+                active |= mask
+                has_active = True
+
+        include = (active.astype(bool) if has_active else np.ones((h, w), dtype=bool)) & ~excluded.astype(bool)
+
+        rect = None
+        if has_active and include.any():
+            x, y, rw, rh = cv2.boundingRect(include.astype(np.uint8))
+            rect = (max(0, x - self.margin), max(0, y - self.margin),
+                    min(w, x + rw + self.margin), min(h, y + rh + self.margin))
+
+        raster = _Raster(labels=labels, include=include, rect=rect)
+        self._rasters[key] = raster
+        return raster
+
+    def locate(self, boxes, shape, anchor_bottom=True):
+        """
+        Ubica cajas en las zonas de forma vectorizada
+
+        El punto de referencia es el centro inferior de la caja (los pies
+        de la persona) o el centro si anchor_bottom=False; puede ser un
+        array booleano por caja.
+
+        Args:
+            boxes: Array (N, 4) xyxy en píxeles del frame
+            shape: Forma del frame (h, w)
+
+        Returns:
+            tuple: (dentro: bool (N,), etiquetas: uint32 (N,))
+        """
+        raster = self.raster(shape)
+        boxes = np.asarray(boxes, dtype=np.float64).reshape(-1, 4)
+        if len(boxes) == 0:
+            return np.zeros(0, dtype=bool), np.zeros(0, dtype=np.uint32)
+
+        h, w = raster.include.shape
+        xs = (boxes[:, 0] + boxes[:, 2]) / 2
+        ys = np.where(anchor_bottom, boxes[:, 3] - 1, (boxes[:, 1] + boxes[:, 3]) / 2)
+        xs = np.clip(xs.astype(np.int64), 0, w - 1)
+        ys = np.clip(ys.astype(np.int64), 0, h - 1)
+        return raster.include[ys, xs], raster.labels[ys, xs]
+
+    def zone_names(self, label):
+        """Nombres de las zonas codificadas en una etiqueta"""
+        return [zone.name for i, zone in enumerate(self.zones) if int(label) >> i & 1]
+
+    def draw(self, image):
+        """Dibuja los contornos de las zonas (rojo: excluidas, amarillo: activas)"""
+        for zone in self.zones:
+            color = (0, 0, 255) if zone.kind == 'excluded' else (0, 255, 255)
+            cv2.polylines(image, [zone.polygon(image.shape)], True, color, 2)
+        return image
+
+    def crop_rect(self, shape):
+        """Rectángulo de recorte para la inferencia, o None si no aplica"""
+        if not self.crop:
+            return None
+        rect = self.raster(shape).rect
+        h, w = shape[:2]
+        if rect is None or rect == (0, 0, w, h):
+            return None
+        return rect
+
+
+def load_zones(path, camera='default', margin=16):
+    """
+    Carga las zonas de una cámara
+
+    Returns:
+        ZoneMap | None: None si el archivo no existe o la cámara no tiene zonas
+    """
+    if not path or not os.path.exists(path):
+        return None
+    with open(path, 'r', encoding='utf-8') as f:
+        config = json.load(f)
+
+    camera_config = config.get(camera)
+    if not camera_config or not camera_config.get('zones'):
+        return None
+
+    units = camera_config.get('units', 'normalized')
+    zones = [
+        Zone(name=z['name'], kind=z.get('kind', 'restricted'), points=z['points'], units=z.get('units', units))
+        for z in camera_config['zones']
+    ]
+    return ZoneMap(zones, crop=camera_config.get('crop', True), margin=margin)
+
+
+# ============================================
+# INFERENCIA RECORTADA A LAS ZONAS
+# ============================================
+def shift_results(results, image, offset):
+    """Results de un recorte expresados en coordenadas de la imagen completa"""
+    from ultralytics.engine.results import Results
+
+    data = results.boxes.data.clone()
+    data[:, [0, 2]] += offset[0]
+    data[:, [1, 3]] += offset[1]
+    return Results(orig_img=image, path=results.path, names=results.names, boxes=data, speed=results.speed)
+
+
+def _predict(model, sources, preprocessor, predict_kwargs):
+    """model.predict, por el LetterboxPreprocessor si todas las fuentes son arrays del mismo tamaño"""
+    if preprocessor is not None and predict_kwargs.get('imgsz', preprocessor.imgsz) == preprocessor.imgsz \
+            and all(isinstance(s, np.ndarray) and s.shape == sources[0].shape for s in sources):
+        kwargs = {k: v for k, v in predict_kwargs.items() if k != 'imgsz'}
+        return preprocessor.predict(model, sources, **kwargs)
+    return model.predict(source=sources, **predict_kwargs)
+
+
+def predict_in_zones(model, sources, zone_map, preprocessor=None, **predict_kwargs):
+    """
+    model.predict limitado al rectángulo de las zonas activas
+
+    Args:
+        model: Modelo YOLO
+        sources: Imagen (ruta o array BGR) o lista de imágenes
+        zone_map: ZoneMap o None (predicción normal)
+        preprocessor: LetterboxPreprocessor opcional (buffers reutilizados para
+            frames de resolución fija)
+
+    Returns:
+        list: Results en coordenadas de la imagen completa
+    """
+    sources = sources if isinstance(sources, list) else [sources]
+    if zone_map is None or not zone_map.crop:
+        return _predict(model, sources, preprocessor, predict_kwargs)
+
+    images = [cv2.imread(str(s)) if isinstance(s, (str, os.PathLike)) else s for s in sources]
+    crops, offsets = [], []
+    for source, image in zip(sources, images):
+        if image is None:
+            raise FileNotFoundError(f"No se pudo leer la imagen: {source}")
+        rect = zone_map.crop_rect(image.shape)
+        if rect is None:
+            crops.append(image)
+            offsets.append(None)
+        else:
+            x1, y1, x2, y2 = rect
+            crops.append(np.ascontiguousarray(image[y1:y2, x1:x2]))
+            offsets.append((x1, y1))
+
+    results = _predict(model, crops, preprocessor, predict_kwargs)
+    return [
+        r if offset is None else shift_results(r, image, offset)
+        for r, image, offset in zip(results, images, offsets)
+    ]
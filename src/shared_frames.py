@@ -0,0 +1,164 @@
+"""
+Anillo de frames en memoria compartida entre procesos
+
+Un proceso decodificador escribe frames BGR en ranuras de tamaño fijo de
+un bloque `multiprocessing.shared_memory`; el proceso de inferencia los
+lee como arrays de NumPy sobre ese mismo bloque, sin pickle ni copias.
+
+============================================
+PROTOCOLO (un productor, un consumidor):
+============================================
+- `free` cuenta ranuras libres y `filled` ranuras listas (semáforos)
+- El productor toma una ranura libre, copia el frame y escribe su
+  cabecera (índice de origen, estado) antes de liberar `filled`
+- El consumidor usa la ranura en sitio y la devuelve con release()
+- Las ranuras se recorren en orden circular, así que el orden de los
+  frames se conserva
+============================================
+"""
+import time
+from multiprocessing import shared_memory
+
+import numpy as np
+
+
+# Estado de una ranura en su cabecera
+FRAME, END, FAILED = 1, 0, -1
+
+# Espera máxima por intento antes de revisar si el otro lado sigue vivo
+POLL_SECONDS = 0.1
+
+
+def _attach(name):
+    """Abre un bloque existente sin registrarlo de nuevo en el resource tracker (3.13+)"""
+    try:
+        return shared_memory.SharedMemory(name=name, track=False)
+    except TypeError:
+        return shared_memory.SharedMemory(name=name)
+
+
+class SharedFrameRing:
+    """
+    Ranuras de frames (slots, h, w, 3) uint8 en memoria compartida
+
+    El anillo se crea en el proceso padre y se pasa como argumento al
+    proceso hijo (los semáforos solo se pueden heredar al crear el proceso).
+    """
+
+    def __init__(self, slots, shape, ctx):
+        """
+        Args:
+            slots: Número de ranuras (frames en vuelo como máximo)
+            shape: Forma de un frame (alto, ancho, 3)
+            ctx: Contexto de multiprocessing con el que se creará el productor
+        """
+        self.slots = int(slots)
+        self.shape = tuple(shape)
+        size = self._header_bytes + self.slots * int(np.prod(self.shape))
+        self.shm = shared_memory.SharedMemory(create=True, size=size)
+        self.free = ctx.Semaphore(self.slots)
+        self.filled = ctx.Semaphore(0)
+        self._owner = True
+        self._map()
+
+    @property
+    def _header_bytes(self):
+        return self.slots * 2 * 8
+
+    def _map(self):
+        self.meta = np.ndarray((self.slots, 2), dtype=np.int64, buffer=self.shm.buf)
+        self.frames = np.ndarray((self.slots, *self.shape), dtype=np.uint8,
+                                 buffer=self.shm.buf, offset=self._header_bytes)
+        self._head = 0
+        self._tail = 0
+
+    def __getstate__(self):
+        return {'name': self.shm.name, 'slots': self.slots, 'shape': self.shape,
+                'free': self.free, 'filled': self.filled}
+
+    def __setstate__(self, state):
+        self.slots = state['slots']
+        self.shape = state['shape']
+        self.free = state['free']
+        self.filled = state['filled']
+        self.shm = _attach(state['name'])
+        self._owner = False
+        self._map()
+
+    # ------------------------------------------
+    # Productor
+    # ------------------------------------------
+    def acquire_write(self, stop=None):
+        """
+        Espera una ranura libre
+
+        Args:
+            stop: Event opcional; si se activa se deja de esperar
+
+        Returns:
+            int | None: Ranura a llenar (None si se pidió detener)
+        """
+        while not self.free.acquire(timeout=POLL_SECONDS):
+            if stop is not None and stop.is_set():
+                return None
+        slot = self._head % self.slots
+        self._head += 1
+        return slot
+
+    def commit(self, slot, index, status=FRAME):
+        """Publica la ranura para el consumidor"""
+        self.meta[slot] = (index, status)
+        self.filled.release()
+
+    def finish(self, status=END, stop=None):
+        """Marca el fin del stream (o un fallo) en una ranura propia"""
+        slot = self.acquire_write(stop)
+        if slot is not None:
+            self.commit(slot, 0, status)
+
+    # ------------------------------------------
+    # Consumidor
+    # ------------------------------------------
+    def acquire_read(self, alive=None, timeout=None):
+        """
+        Espera la siguiente ranura publicada
+
+        Args:
+            alive: Callable opcional; si devuelve False (productor caído) se deja de esperar
+            timeout: Espera máxima total en segundos (None = sin límite)
+
+        Returns:
+            tuple | None: (ranura, índice, estado) o None si no llegó nada
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while not self.filled.acquire(timeout=POLL_SECONDS):
+            if alive is not None and not alive():
+                # Último intento: pudo publicar justo antes de terminar
+                if not self.filled.acquire(block=False):
+                    return None
+                break
+            if deadline is not None and time.monotonic() >= deadline:
+                return None
+        slot = self._tail % self.slots
+        self._tail += 1
+        index, status = (int(v) for v in self.meta[slot])
+        return slot, index, status
+
+    def release(self, slot):
+        """Devuelve una ranura leída al productor"""
+        self.free.release()
+
+    # ------------------------------------------
+    # Limpieza
+    # ------------------------------------------
+    def close(self):
+        # Los arrays apuntan al buffer: soltarlos antes de cerrar el bloque
+        self.meta = self.frames = None
+        try:
+            self.shm.close()
+        except BufferError:
+            # Algún frame entregado sigue referenciado (p. ej. en un Results);
+            # el mapeo se libera cuando ese array se recolecte
+            pass
+        if self._owner:
+            self.shm.unlink()
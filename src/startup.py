@@ -0,0 +1,142 @@
+import contextlib
+import os
+import threading
+
+from event_log import get_event_logger
+from metrics import METRICS
+
+
+# Tamaños de entrada a calentar (EPP_WARMUP_SIZES="640,1280")
+DEFAULT_WARMUP_SIZES = (640,)
+
+
+def warmup_sizes_from_env():
+    value = os.environ.get('EPP_WARMUP_SIZES')
+    if not value:
+        return DEFAULT_WARMUP_SIZES
+    return tuple(int(x) for x in value.split(',') if x.strip())
+
+
+def warmup_model(model, sizes=DEFAULT_WARMUP_SIZES, runs=1):
+    """
+    Inferencia con imágenes vacías para pagar fuera de una petición real
+    la inicialización del grafo, los kernels y el allocator.
+
+    Args:
+        model: Modelo YOLO cargado
+        sizes: Tamaños de entrada (lado) a calentar
+        runs: Repeticiones por tamaño
+    """
+    import numpy as np
+
+    for size in sizes:
+        dummy = np.zeros((size, size, 3), dtype=np.uint8)
+        for _ in range(runs):
+            model.predict(dummy, imgsz=size, verbose=False)
+
+
+class SharedModel:
+    """
+    Modelo YOLO compartido entre hilos (sesiones de Streamlit)
+
+    El predictor de Ultralytics guarda estado por llamada y no es seguro
+    entre hilos: `predict` se serializa con el lock del ModelLoader. El
+    resto de atributos (names, ...) se delegan al modelo.
+    """
+
+    def __init__(self, model, lock):
+        self._model = model
+        self._lock = lock
+
+    def predict(self, *args, **kwargs):
+        with self._lock:
+            return self._model.predict(*args, **kwargs)
+
+    __call__ = predict
+
+    def __getattr__(self, name):
+        return getattr(self._model, name)
+
+
+class ModelLoader:
+    """
+    Carga diferida del modelo con calentamiento, opcionalmente en segundo plano
+
+    ============================================
+    FASES (tiempos en `timings`, en segundos):
+    ============================================
+    import:     importar ultralytics / torch
+    model_load: leer los pesos (o la variante activa)
+    warmup:     inferencias de calentamiento
+    ============================================
+    El modelo se entrega como SharedModel: las inferencias de distintos
+    hilos se serializan con `inference_lock`.
+    """
+
+    def __init__(self, model_path, warmup_sizes=None, metrics=None):
+        self.model_path = model_path
+        self.warmup_sizes = warmup_sizes_from_env() if warmup_sizes is None else tuple(warmup_sizes)
+        self.metrics = metrics or METRICS
+        self.model = None
+        self.error = None
+        self.timings = {}
+        self._ready = threading.Event()
+        self._started = False
+        self._lock = threading.Lock()
+        self.inference_lock = threading.Lock()
+
+    @property
+    def ready(self):
+        return self._ready.is_set()
+
+    def start(self, background=True):
+        """Inicia la carga (en un hilo si background=True). Idempotente."""
+        with self._lock:
+            if self._started:
+                return self
+            self._started = True
+
+        if background:
+            threading.Thread(target=self._load, name='epp-model-loader', daemon=True).start()
+        else:
+            self._load()
+        return self
+
+    def get(self, timeout=None):
+        """Devuelve el modelo, esperando a que termine la carga si hace falta"""
+        self.start(background=False)
+        if not self._ready.wait(timeout):
+            raise TimeoutError("El modelo aún se está cargando")
+        if self.error is not None:
+            raise self.error
+        return self.model
+
+    @contextlib.contextmanager
+    def _phase(self, name):
+        """Etapa de arranque: timer de metrics.py y copia en `timings`"""
+        with self.metrics.timer(name, component='startup') as t:
+            yield
+        self.timings[name] = t.elapsed
+
+    def _load(self):
+        log = get_event_logger()
+        try:
+            with self._phase('import'):
+                from ultralytics import YOLO
+                from model_quantizer import resolve_model_path
+
+            with self._phase('model_load'):
+                model = YOLO(resolve_model_path(self.model_path), task='detect')
+
+            if self.warmup_sizes:
+                with self._phase('warmup'):
+                    warmup_model(model, self.warmup_sizes)
+
+            self.model = SharedModel(model, self.inference_lock)
+            log.info('startup_ready', model=self.model_path,
+                     timings={k: round(v, 3) for k, v in self.timings.items()})
+        except Exception as e:
+            self.error = e
+            log.error('startup_failed', model=self.model_path, error=str(e))
+        finally:
+            self._ready.set()
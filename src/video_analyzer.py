@@ -1,6 +1,69 @@
-from ultralytics import YOLO
 import cv2
+import logging
+import numpy as np
 import os
+import time
+
+from detection_store import DetectionStore, DetectionStoreWriter, store_path
+from event_log import get_event_logger
+from metrics import METRICS, record_predict_speed
+from model_quantizer import resolve_model_path
+from records import FRAME_DTYPE, FrameRecords
+from reports import VideoReport, render_console
+from rollups import ComplianceRollup
+from safety_zones import predict_in_zones
+from video_checkpoint import checkpoint_path, load_checkpoint, merge_segments, save_checkpoint, segment_path
+from video_decoder import open_decoder
+
+
+# Umbral de confianza de la inferencia (y piso de la re-evaluación desde el almacén)
+CONF_THRESHOLD = 0.25
+
+# Conteo del frame → clase del modelo
+COUNT_CLASSES = {
+    'persons': 'Person',
+    'helmets': 'helmet',
+    'vests': 'vest',
+    'gloves': 'gloves',
+    'goggles': 'goggles',
+    'boots': 'boots',
+}
+
+
+def frame_complies(counts):
+    """
+    Veredicto del frame a partir de sus conteos
+
+    Sirve con enteros (un frame) o con arrays (todos los frames de un
+    almacén de detecciones a la vez).
+
+    ============================================
+    CRITERIO: casco + chaleco + guantes + gafas
+    ============================================
+    """
+    persons = counts['persons']
+    return ((persons > 0) &
+            (counts['helmets'] >= persons) &
+            (counts['vests'] >= persons) &
+            (counts['gloves'] >= persons) &
+            (counts['goggles'] >= persons))
+
+
+def _wait_for_growth(path, known_size, poll_interval, idle_timeout):
+    """
+    Espera a que un archivo en grabación supere `known_size`
+
+    Returns:
+        bool: True si creció; False si no cambió en idle_timeout segundos
+    """
+    waited = 0.0
+    while True:
+        if os.path.getsize(path) > known_size:
+            return True
+        if waited >= idle_timeout:
+            return False
+        time.sleep(poll_interval)
+        waited += poll_interval
 
 
 class VideoEPPAnalyzer:
@@ -15,15 +78,63 @@ class VideoEPPAnalyzer:
     ============================================
     """
     
-    def __init__(self, model_path):
-        self.model = YOLO(model_path)
-        self.violations = []
+    def __init__(self, model_path, model=None, metrics=None, history=None, camera='default',
+                 motion_gate=None, propagator=None, decoder_options=None, zones=None, cascade=None,
+                 preprocessor=None, store_detections=True):
+        self.metrics = metrics or METRICS
+        # MotionGate opcional: omite la inferencia en frames sin cambios
+        self.motion_gate = motion_gate
+        # BoxPropagator opcional: detección solo en keyframes, cajas propagadas entre ellos
+        self.propagator = propagator
+        # Opciones de open_decoder (backend, width, threads, stride, prefetch, process)
+        self.decoder_options = decoder_options or {}
+        # ZoneMap opcional: solo cuentan detecciones dentro de las zonas y se infiere sobre su recorte
+        self.zones = zones
+        # PersonCascade opcional: el modelo completo solo corre en frames con personas
+        self.cascade = cascade
+        # LetterboxPreprocessor opcional: buffers de preprocesado reutilizados entre frames
+        self.preprocessor = preprocessor
+        # Guardar las detecciones en <video>_detections/ para re-evaluar sin inferir (reevaluate)
+        self.store_detections = store_detections
+        self.history = history
+        self.camera = camera
+        if model is None:
+            with self.metrics.timer('model_load', component='video'):
+                from ultralytics import YOLO
+                model_path = resolve_model_path(model_path)
+                model = YOLO(model_path, task='detect')
+        self.model = model
+        self.violations = FrameRecords()
         self.compliant_frames = 0
         self.total_frames = 0
-        print(f"✅ Modelo cargado: {model_path}")
+        self.inferred_frames = 0
+        self.cascade_skipped = 0
+        self.stride = 1
+        self.rollup = None
+        self.report = None
+        self.log = get_event_logger()
+        self.log.info('model_loaded', component='video', model=str(model_path))
     
-    def analyze_video(self, video_path, output_dir=None):
-        """Analiza video completo y genera reporte"""
+    def analyze_video(self, video_path, output_dir=None, exporter=None, checkpoint_interval=None,
+                      resume=False, follow=False, poll_interval=2.0, idle_timeout=60.0, output_name=None):
+        """
+        Analiza video completo y genera reporte
+        
+        Args:
+            video_path: Ruta del video
+            output_dir: Directorio del video anotado
+            exporter: ResultExporter opcional para escribir frames/eventos en streaming
+                (con checkpoints solo json/csv)
+            checkpoint_interval: Segundos entre checkpoints (None = sin checkpoints);
+                el video anotado se escribe en segmentos que se unen al terminar
+            resume: Continuar desde el checkpoint del video si existe
+            follow: Seguir un archivo que todavía se está grabando (.ts, .mkv,
+                MP4 fragmentado): al llegar al final espera frames nuevos
+            poll_interval: Segundos entre revisiones del tamaño del archivo (follow)
+            idle_timeout: Segundos sin crecimiento tras los que se da por terminado (follow)
+            output_name: Nombre base de las salidas (video anotado, checkpoint, almacén
+                de detecciones); por defecto el nombre del archivo sin extensión
+        """
         
         # Si no se especifica output_dir, crear uno por defecto
         if output_dir is None:
@@ -32,191 +143,490 @@ class VideoEPPAnalyzer:
         # Crear directorio de salida
         os.makedirs(output_dir, exist_ok=True)
         
-        video_name = os.path.basename(video_path).split('.')[0]
+        video_name = output_name or os.path.basename(video_path).split('.')[0]
         output_path = os.path.join(output_dir, f"{video_name}_analyzed.mp4")
         
+        # Checkpoint previo (solo si corresponde al mismo video y muestreo)
+        checkpointing = checkpoint_interval is not None
+        if checkpointing and exporter is not None and 'parquet' in exporter.formats:
+            raise ValueError("Los checkpoints requieren exportar en json o csv (no parquet)")
+        ckpt_path = checkpoint_path(output_dir, video_name)
+        config = {
+            'video': os.path.abspath(video_path),
+            'width': self.decoder_options.get('width'),
+            'stride': self.decoder_options.get('stride', 1)
+        }
+        checkpoint = load_checkpoint(ckpt_path) if resume else None
+        if checkpoint is not None and checkpoint[0]['config'] != config:
+            self.log.warning('checkpoint_ignored', video=video_path, checkpoint=ckpt_path)
+            checkpoint = None
+        start = checkpoint[0]['frame'] if checkpoint is not None else 0
+        
         # Abrir video
-        cap = cv2.VideoCapture(video_path)
+        with self.metrics.timer('io_open', component='video'):
+            opened_size = os.path.getsize(video_path) if follow else 0
+            cap = open_decoder(video_path, start=start, **self.decoder_options)
         
         if not cap.isOpened():
-            print(f"❌ Error: No se pudo abrir el video {video_path}")
+            self.log.error('video_open_failed', video=video_path)
+            cap.release()
             return None
         
-        # Configurar salida
-        fps = int(cap.get(cv2.CAP_PROP_FPS))
-        width = int(cap.get(cv2.CAP_PROP_FRAME_WIDTH))
-        height = int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
-        total_frames_video = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+        # Configurar salida (tamaño ya reducido por el decodificador si se pidió)
+        # fps real (29.97...) para los tiempos; redondeado solo para el writer y el progreso
+        fps = cap.fps
+        stride = self.stride = cap.stride
+        width = cap.width
+        height = cap.height
+        total_frames_video = cap.frame_count
         
-        # Usar codec mp4v para compatibilidad
+        # Usar codec mp4v para compatibilidad; con checkpoints, un segmento por checkpoint
         fourcc = cv2.VideoWriter_fourcc(*'mp4v')
-        out = cv2.VideoWriter(output_path, fourcc, fps, (width, height))
+        out_fps = max(1, round(fps / stride))
+        segment = checkpoint[0]['segment'] if checkpoint is not None else 0
+        writer_path = segment_path(output_dir, video_name, segment) if checkpointing else output_path
+        out = cv2.VideoWriter(writer_path, fourcc, out_fps, (width, height))
         
         # Verificar que el writer se abrió correctamente
         if not out.isOpened():
-            print(f"❌ Error: No se pudo crear el video de salida en {output_path}")
+            self.log.error('video_writer_failed', output=writer_path)
             cap.release()
             return None
         
-        print(f"\n📹 Procesando: {video_path}")
-        print(f"🎬 FPS: {fps} | Resolución: {width}x{height} | Frames: {total_frames_video}")
-        print(f"💾 Salida: {output_path}")
-        print("⏳ Procesando frames...")
+        # Almacén de detecciones (al reanudar, se recorta a lo que cubre el checkpoint)
+        store_writer = None
+        if self.store_detections:
+            store_writer = DetectionStoreWriter(store_path(output_dir, video_name), {
+                'video': config['video'],
+                'fps': fps,
+                'shape': [height, width],
+                'names': [self.model.names[i] for i in sorted(self.model.names)],
+                'stride': stride,
+                'width': config['width'],
+                'conf': CONF_THRESHOLD
+            }, counts=checkpoint[0].get('detections') if checkpoint is not None else None)
         
-        frame_count = 0
+        log = self.log
+        log.info('video_start', video=video_path, output=output_path, fps=fps,
+                 width=width, height=height, frames=total_frames_video, stride=stride)
+        frame_events = log.enabled(logging.DEBUG)
         
-        while cap.isOpened():
-            ret, frame = cap.read()
+        # Resúmenes por segundo / minuto para la línea de tiempo
+        self.rollup = ComplianceRollup(fps)
+        
+        frame_count = 0  # índice del frame en el video original
+        processed = 0
+        results = None
+        
+        # Descartar el estado de un análisis anterior con la misma instancia
+        self.violations = FrameRecords()
+        self.compliant_frames = 0
+        self.inferred_frames = 0
+        self.cascade_skipped = 0
+        
+        if checkpoint is not None:
+            state, violations, rollup_arrays = checkpoint
+            frame_count = state['frame']
+            processed = state['processed']
+            self.compliant_frames = state['compliant_frames']
+            self.inferred_frames = state['inferred_frames']
+            self.cascade_skipped = state.get('cascade_skipped', 0)
+            self.violations = FrameRecords(violations)
+            self.rollup = ComplianceRollup.from_arrays(fps, rollup_arrays)
+            if exporter is not None and state['exporter'] is not None:
+                exporter.restore(state['exporter'])
+            log.info('video_resumed', video=video_path, frame=frame_count, segment=segment)
+        last_checkpoint = time.monotonic()
+        
+        gate = self.motion_gate
+        if gate is not None:
+            gate.reset()
+        propagator = self.propagator
+        if propagator is not None:
+            propagator.clear()
+        
+        metrics = self.metrics
+        
+        while True:
+            with metrics.timer('decode', component='video') as t_decode:
+                ret, frame = cap.read()
             if not ret:
+                # Archivo en grabación: reabrir desde el último frame cuando crezca
+                if follow and _wait_for_growth(video_path, opened_size, poll_interval, idle_timeout):
+                    log.info('video_follow', video=video_path, frame=frame_count)
+                    cap.release()
+                    opened_size = os.path.getsize(video_path)
+                    cap = open_decoder(video_path, start=frame_count, **self.decoder_options)
+                    total_frames_video = cap.frame_count
+                    continue
                 break
             
-            frame_count += 1
-            
-            # Detectar EPP
-            results = self.model.predict(frame, conf=0.25, verbose=False)[0]
-            
-            # Contar detecciones por clase
-            detections = {}
-            for box in results.boxes:
-                class_id = int(box.cls[0])
-                class_name = self.model.names[class_id]
-                detections[class_name] = detections.get(class_name, 0) + 1
-            
-            # Verificar cumplimiento
-            persons = detections.get('Person', 0)
-            helmets = detections.get('helmet', 0)
-            vests = detections.get('vest', 0)
-            gloves = detections.get('gloves', 0)
-            goggles = detections.get('goggles', 0)
-            boots = detections.get('boots', 0)
-            
-            # ============================================
-            # CRITERIO: casco + chaleco + guantes + gafas
-            # ============================================
-            complies = (persons > 0 and 
-                       helmets >= persons and 
-                       vests >= persons and 
-                       gloves >= persons and 
-                       goggles >= persons)
+            frame_count = cap.index
+            processed += 1
+            metrics.inc('frames_total', component='video')
+            
+            # Sin cambios en escena: se arrastran detecciones y cumplimiento del último frame analizado
+            infer = True
+            if gate is not None:
+                with metrics.timer('motion', component='video'):
+                    infer = gate.should_infer(frame) or results is None
+            
+            predicted = False
+            if infer:
+                propagated = None
+                if propagator is not None:
+                    with metrics.timer('propagate', component='video'):
+                        propagated = propagator.propagate(frame)
+                
+                if propagated is not None:
+                    results = propagated
+                    metrics.inc('frames_propagated_total', component='video')
+                else:
+                    # Cascada: un frame sin personas no necesita el modelo completo
+                    results = None
+                    if self.cascade is not None:
+                        with metrics.timer('cascade', component='video'):
+                            results = self.cascade.detect(frame, self.zones, component='video')[0]
+                        if len(results.boxes):
+                            results = None
+                        else:
+                            self.cascade_skipped += 1
+                    
+                    # Detectar EPP (keyframe, o la propagación perdió confianza)
+                    if results is None:
+                        with metrics.timer('predict', component='video') as t_predict:
+                            results = predict_in_zones(self.model, frame, self.zones, preprocessor=self.preprocessor,
+                                                       conf=CONF_THRESHOLD, verbose=False)[0]
+                        record_predict_speed(metrics, results, component='video')
+                        self.inferred_frames += 1
+                        predicted = True
+                    if propagator is not None:
+                        propagator.reset(frame, results)
+                
+                # Verificar cumplimiento
+                with metrics.timer('association', component='video') as t_assoc:
+                    complies, counts = self._evaluate_frame(results)
+            else:
+                metrics.inc('frames_skipped_total', component='video')
+            
+            # Los frames sin inferir reutilizan el run anterior del almacén
+            if store_writer is not None:
+                store_writer.add(frame_count, results if infer else None)
             
             if complies:
                 self.compliant_frames += 1
             else:
-                if persons > 0:  # Solo registrar si hay personas
-                    self.violations.append({
-                        'frame': frame_count,
-                        'time': frame_count / fps,
-                        'persons': persons,
-                        'helmets': helmets,
-                        'vests': vests,
-                        'gloves': gloves,
-                        'goggles': goggles,
-                        'boots': boots
-                    })
+                if counts['persons'] > 0:  # Solo registrar si hay personas
+                    metrics.inc('violation_frames_total', component='video')
+                    self.violations.append(frame=frame_count, time=frame_count / fps, **counts)
+                    log.debug('violation', frame=frame_count, time=frame_count / fps, **counts)
+            
+            self.rollup.update((frame_count - 1) / fps, complies, counts)
+            
+            if exporter is not None:
+                with metrics.timer('export', component='video'):
+                    exporter.write_frame(frame_count, frame_count / fps, complies, counts)
             
             # Dibujar detecciones
-            annotated_frame = results.plot()
-            
-            # Agregar overlay con estado
-            status_text = "CUMPLE" if complies else "VIOLACION"
-            status_color = (0, 255, 0) if complies else (0, 0, 255)
-            
-            # Fondo semi-transparente para texto
-            overlay = annotated_frame.copy()
-            cv2.rectangle(overlay, (10, 10), (300, 100), (0, 0, 0), -1)
-            cv2.addWeighted(overlay, 0.3, annotated_frame, 0.7, 0, annotated_frame)
-            
-            # Texto de estado
-            cv2.putText(
-                annotated_frame, 
-                status_text, 
-                (20, 50), 
-                cv2.FONT_HERSHEY_DUPLEX,
-                1.2, 
-                status_color, 
-                3
-            )
-            
-            # Info del frame
-            cv2.putText(
-                annotated_frame, 
-                f"Frame: {frame_count}/{total_frames_video}", 
-                (20, 80), 
-                cv2.FONT_HERSHEY_SIMPLEX, 
-                0.6, 
-                (255, 255, 255), 
-                2
-            )
+            with metrics.timer('render', component='video') as t_render:
+                annotated_frame = self._annotate_frame(results, complies, frame_count, total_frames_video,
+                                                       frame=None if infer else frame)
             
             # Escribir frame procesado
-            out.write(annotated_frame)
+            with metrics.timer('encode', component='video') as t_encode:
+                out.write(annotated_frame)
+            
+            # Eventos por frame (solo si el nivel DEBUG está activo)
+            if frame_events:
+                log.debug('frame', frame=frame_count, complies=complies, inferred=infer, stages={
+                    'decode': t_decode.elapsed,
+                    'predict': t_predict.elapsed if predicted else 0.0,
+                    'association': t_assoc.elapsed if infer else 0.0,
+                    'render': t_render.elapsed,
+                    'encode': t_encode.elapsed
+                })
             
-            # Progreso cada segundo
-            if frame_count % fps == 0:
-                progress = (frame_count / total_frames_video) * 100
-                print(f"   {progress:.1f}% completado ({frame_count}/{total_frames_video} frames)")
+            # Progreso cada segundo (limitado en frecuencia por el log)
+            if fps and frame_count % max(1, round(fps)) < stride:
+                log.info('video_progress', frame=frame_count, total=total_frames_video,
+                         progress=round(frame_count / total_frames_video * 100, 1) if total_frames_video else None)
+            
+            # Checkpoint: cerrar el segmento actual, guardar estado y abrir el siguiente
+            if checkpointing and time.monotonic() - last_checkpoint >= checkpoint_interval:
+                with metrics.timer('checkpoint', component='video'):
+                    out.release()
+                    segment += 1
+                    save_checkpoint(ckpt_path, {
+                        'config': config,
+                        'frame': frame_count,
+                        'processed': processed,
+                        'compliant_frames': self.compliant_frames,
+                        'inferred_frames': self.inferred_frames,
+                        'cascade_skipped': self.cascade_skipped,
+                        'segment': segment,
+                        'detections': store_writer.checkpoint() if store_writer is not None else None,
+                        'exporter': exporter.checkpoint() if exporter is not None else None
+                    }, self.violations.data, self.rollup.arrays())
+                    out = cv2.VideoWriter(segment_path(output_dir, video_name, segment), fourcc,
+                                          out_fps, (width, height))
+                metrics.inc('checkpoints_total', component='video')
+                log.info('checkpoint_saved', video=video_path, frame=frame_count, segment=segment)
+                last_checkpoint = time.monotonic()
         
-        self.total_frames = frame_count
+        self.total_frames = processed
         
         # Cerrar archivos
-        cap.release()
-        out.release()
+        with self.metrics.timer('io_close', component='video'):
+            cap.release()
+            out.release()
+            if store_writer is not None:
+                store_writer.close()
+        
+        # Unir los segmentos anotados; el checkpoint ya no hace falta
+        if checkpointing:
+            segments = [segment_path(output_dir, video_name, i) for i in range(segment + 1)]
+            with self.metrics.timer('merge_segments', component='video'):
+                merged = merge_segments(segments, output_path, out_fps, (width, height))
+            if merged:
+                for path in segments + [ckpt_path]:
+                    if os.path.exists(path):
+                        os.remove(path)
         
         # Verificar que el archivo se creó
         if os.path.exists(output_path):
             file_size = os.path.getsize(output_path)
-            print(f"\n✅ Video procesado guardado en: {output_path}")
-            print(f"📁 Tamaño: {file_size / (1024*1024):.2f} MB")
+            log.info('video_saved', output=output_path, size_mb=round(file_size / (1024*1024), 2))
         else:
-            print(f"\n❌ Error: El archivo no se creó en {output_path}")
+            log.error('video_missing', output=output_path)
             return None
         
-        # Generar y mostrar reporte
-        self.generate_report(video_path, output_path)
+        # Generar reporte (los renderizadores lo presentan después)
+        self.report = self.generate_report(video_path, output_path, renderer=None)
+        if self.history is not None:
+            with self.metrics.timer('history', component='video'):
+                self.history.record_video(self.report, camera=self.camera)
+        if exporter is not None:
+            self.rollup.save(os.path.join(exporter.output_dir, 'rollup.npz'))
+            summary_path = exporter.close({'kind': 'video', **self.report.to_dict(include_violations=False)})
+            log.info('video_exported', summary=summary_path)
+        log.info('video_report', video=video_path, frames=self.report.total_frames,
+                 compliant_frames=self.report.compliant_frames,
+                 violation_frames=self.report.violation_frames,
+                 inferred_frames=self.inferred_frames,
+                 cascade_skipped=self.cascade_skipped,
+                 compliance_rate=round(self.report.compliance_rate, 2))
         
         return output_path  # ← IMPORTANTE: Retornar la ruta
     
-    def generate_report(self, input_video, output_video):
-        """Genera reporte detallado del análisis"""
-        compliance_rate = (self.compliant_frames / self.total_frames) * 100 if self.total_frames > 0 else 0
-        violation_rate = 100 - compliance_rate
-        
-        print("\n" + "="*70)
-        print("📊 REPORTE DE ANÁLISIS DE VIDEO - CUMPLIMIENTO EPP")
-        print("="*70)
-        print(f"📁 Video original: {os.path.basename(input_video)}")
-        print(f"💾 Video analizado: {os.path.basename(output_video)}")
-        
-        print("\n" + "📌 CRITERIOS DE CUMPLIMIENTO".center(70))
-        print("Obligatorios: Casco + Chaleco + Guantes + Gafas")
-        print("Recomendados: Botas")
-        print("-"*70)
-        
-        print(f"\n📈 ESTADÍSTICAS GENERALES:")
-        print(f"   ├─ Total de frames procesados: {self.total_frames}")
-        print(f"   ├─ Frames con cumplimiento: {self.compliant_frames} ({compliance_rate:.2f}%)")
-        print(f"   ├─ Frames con violaciones: {len(self.violations)} ({violation_rate:.2f}%)")
-        print(f"   └─ Tasa de cumplimiento: {'✅ ALTA' if compliance_rate > 80 else '⚠️ MEDIA' if compliance_rate > 50 else '❌ BAJA'}")
-        
-        if self.violations:
-            print(f"\n⚠️  VIOLACIONES DETECTADAS ({len(self.violations)} frames):")
-            print(f"   Mostrando primeras 10 violaciones:")
-            print(f"   {'Frame':<8} {'Tiempo':<10} {'Pers':<6} {'Casco':<7} {'Chaleco':<9} {'Guantes':<9} {'Gafas'}")
-            print(f"   {'-'*65}")
-            
-            for i, v in enumerate(self.violations[:10], 1):
-                print(f"   {v['frame']:<8} {v['time']:.2f}s{' '*4} "
-                      f"{v['persons']:<6} {v['helmets']:<7} {v['vests']:<9} "
-                      f"{v.get('gloves', 0):<9} {v.get('goggles', 0)}")
-            
-            if len(self.violations) > 10:
-                print(f"   ... y {len(self.violations) - 10} violaciones más")
-        else:
-            print(f"\n✅ ¡EXCELENTE! No se detectaron violaciones de EPP")
+    def _evaluate_frame(self, results):
+        """
+        Cuenta detecciones por clase y verifica el cumplimiento del frame
+        
+        Returns:
+            tuple: (cumple, conteos por tipo de EPP)
+        """
+        class_ids = results.boxes.cls.cpu().numpy().astype(int)
+        
+        # Descartar detecciones fuera de las zonas (personas por los pies, EPP por el centro)
+        if self.zones is not None and len(class_ids):
+            is_person = np.array([self.model.names[c] == 'Person' for c in class_ids])
+            inside, _ = self.zones.locate(results.boxes.xyxy.cpu().numpy(), results.orig_shape,
+                                          anchor_bottom=is_person)
+            class_ids = class_ids[inside]
+        
+        # Contar detecciones por clase
+        detections = {}
+        for class_id in class_ids:
+            class_name = self.model.names[class_id]
+            detections[class_name] = detections.get(class_name, 0) + 1
+        
+        counts = {key: detections.get(name, 0) for key, name in COUNT_CLASSES.items()}
+        return bool(frame_complies(counts)), counts
+    
+    def reevaluate(self, store, conf=None, policy=frame_complies, output_video=None, exporter=None):
+        """
+        Recalcula el análisis de un video desde su almacén de detecciones,
+        sin decodificar ni inferir
+        
+        El conteo por frame se hace de forma vectorizada sobre todas las
+        cajas (umbral, zonas de self.zones y bincount por run), así que
+        una hora de video se re-evalúa en segundos.
+        
+        Args:
+            store: DetectionStore o ruta de <video>_detections/
+            conf: Nuevo umbral de confianza; no puede ser menor que el usado al
+                inferir (esas cajas no están en el almacén): ValueError
+            policy: Función conteos → veredicto; recibe arrays por frame (ver frame_complies)
+            output_video: Ruta para re-renderizar el video anotado (decodifica el
+                video original, pero no infiere), o None
+            exporter: ResultExporter opcional para escribir frames/eventos
+        
+        Returns:
+            VideoReport: Reporte recalculado (también queda en self.report)
+        """
+        if not isinstance(store, DetectionStore):
+            store = DetectionStore(store)
+        if conf is not None and conf < store.meta['conf']:
+            raise ValueError(f"conf={conf} es menor que el umbral de inferencia del almacén "
+                             f"({store.meta['conf']}): las cajas por debajo no se guardaron")
+        
+        with self.metrics.timer('reevaluate', component='video') as t_eval:
+            names = store.names
+            keep = np.ones(len(store.cls), dtype=bool)
+            if conf is not None:
+                keep &= store.conf >= conf
+            
+            # Mismo criterio de zonas que _evaluate_frame (personas por los pies, EPP por el centro)
+            if self.zones is not None and len(keep):
+                is_person = (np.array(names) == COUNT_CLASSES['persons'])[store.cls]
+                inside, _ = self.zones.locate(store.xyxy, store.shape, anchor_bottom=is_person)
+                keep &= inside
+            
+            # Conteos por run (clase x run) y después por frame
+            n_runs, n_classes = len(store.offsets) - 1, len(names)
+            flat = store.box_runs()[keep] * n_classes + store.cls[keep]
+            run_counts = np.bincount(flat, minlength=n_runs * n_classes).reshape(n_runs, n_classes)
+            frame_counts = run_counts[store.frames['run']]
+            counts = {
+                key: frame_counts[:, names.index(name)] if name in names else np.zeros(len(store), dtype=np.int64)
+                for key, name in COUNT_CLASSES.items()
+            }
+            
+            frames = store.frames['frame'].astype(np.int64)
+            fps = store.fps
+            complies = np.asarray(policy(counts), dtype=bool)
+            
+            # Violaciones: frames que no cumplen con alguna persona
+            flagged = ~complies & (counts['persons'] > 0)
+            violations = np.zeros(int(flagged.sum()), dtype=FRAME_DTYPE)
+            violations['frame'] = frames[flagged]
+            violations['time'] = frames[flagged] / fps
+            for key, values in counts.items():
+                violations[key] = values[flagged]
+            
+            self.violations = FrameRecords(violations)
+            self.compliant_frames = int(complies.sum())
+            self.total_frames = len(store)
+            self.stride = store.meta['stride']
+            self.rollup = ComplianceRollup(fps)
+            self.rollup.update_many((frames - 1) / fps, complies, counts)
+        
+        if exporter is not None:
+            with self.metrics.timer('export', component='video'):
+                for i, frame in enumerate(frames):
+                    exporter.write_frame(int(frame), frame / fps, bool(complies[i]),
+                                         {key: int(values[i]) for key, values in counts.items()})
+        
+        if output_video is not None:
+            with self.metrics.timer('render', component='video'):
+                output_video = self._rerender(store, keep, complies, output_video)
+        
+        self.report = self.generate_report(store.meta['video'], output_video, renderer=None)
+        if exporter is not None:
+            self.rollup.save(os.path.join(exporter.output_dir, 'rollup.npz'))
+            exporter.close({'kind': 'video', **self.report.to_dict(include_violations=False)})
+        self.log.info('video_reevaluated', video=store.meta['video'], frames=self.total_frames,
+                      boxes=int(keep.sum()), seconds=round(t_eval.elapsed, 3),
+                      compliance_rate=round(self.report.compliance_rate, 2))
+        return self.report
+    
+    def _rerender(self, store, keep, complies, output_video):
+        """Video anotado desde el almacén: se decodifica con el mismo muestreo, sin inferir"""
+        options = {**self.decoder_options, 'stride': store.meta['stride'], 'width': store.meta['width']}
+        cap = open_decoder(store.meta['video'], **options)
+        if not cap.isOpened():
+            self.log.error('video_open_failed', video=store.meta['video'])
+            cap.release()
+            return None
+        
+        height, width = store.shape
+        out_fps = max(1, round(store.fps / store.meta['stride']))
+        out = cv2.VideoWriter(output_video, cv2.VideoWriter_fourcc(*'mp4v'), out_fps, (width, height))
+        
+        frames = store.frames['frame']
+        i = 0
+        while i < len(store):
+            ret, image = cap.read()
+            if not ret:
+                break
+            # Frames del video que el análisis no cubrió (p. ej. antes de un checkpoint sin almacén)
+            if cap.index < frames[i]:
+                continue
+            results = store.results(i, image, keep)
+            out.write(self._annotate_frame(results, complies[i], int(frames[i]), cap.frame_count))
+            i += 1
+        
+        cap.release()
+        out.release()
+        return output_video
+    
+    def _annotate_frame(self, results, complies, frame_count, total_frames_video, frame=None):
+        """
+        Dibuja detecciones y el overlay de estado sobre el frame
+
+        Con `frame` se dibujan las detecciones arrastradas sobre la imagen
+        actual en lugar de la imagen con la que se obtuvieron.
+        """
+        annotated_frame = results.plot(img=frame) if frame is not None else results.plot()
+        if self.zones is not None:
+            self.zones.draw(annotated_frame)
+        
+        # Agregar overlay con estado
+        status_text = "CUMPLE" if complies else "VIOLACION"
+        status_color = (0, 255, 0) if complies else (0, 0, 255)
+        
+        # Fondo semi-transparente para texto
+        overlay = annotated_frame.copy()
+        cv2.rectangle(overlay, (10, 10), (300, 100), (0, 0, 0), -1)
+        cv2.addWeighted(overlay, 0.3, annotated_frame, 0.7, 0, annotated_frame)
+        
+        # Texto de estado
+        cv2.putText(
+            annotated_frame, 
+            status_text, 
+            (20, 50), 
+            cv2.FONT_HERSHEY_DUPLEX,
+            1.2, 
+            status_color, 
+            3
+        )
+        
+        # Info del frame
+        cv2.putText(
+            annotated_frame, 
+            f"Frame: {frame_count}/{total_frames_video}", 
+            (20, 80), 
+            cv2.FONT_HERSHEY_SIMPLEX, 
+            0.6, 
+            (255, 255, 255), 
+            2
+        )
+        
+        return annotated_frame
+    
+    def generate_report(self, input_video, output_video, renderer=render_console):
+        """
+        Genera reporte detallado del análisis
+        
+        Args:
+            input_video: Ruta del video original
+            output_video: Ruta del video anotado
+            renderer: Función que presenta el reporte (consola, Streamlit, archivo) o None
         
-        print("="*70)
-        print(f"💡 Recomendación: {'Mantener prácticas actuales' if compliance_rate > 90 else 'Reforzar capacitación en EPP'}")
-        print("="*70 + "\n")
+        Returns:
+            VideoReport: Reporte como objeto de datos
+        """
+        report = VideoReport(
+            input_video=input_video,
+            output_video=output_video,
+            total_frames=self.total_frames,
+            compliant_frames=self.compliant_frames,
+            violations=self.violations.copy(),
+            stride=self.stride
+        )
+        if renderer is not None:
+            renderer(report)
+        return report
 
 
 # EJEMPLO DE USO
@@ -240,6 +650,7 @@ if __name__ == "__main__":
         output = analyzer.analyze_video(video_path)
         
         if output:
+            render_console(analyzer.report)
             print(f"\n🎉 ¡Análisis completado exitosamente!")
             print(f"📹 Video guardado en: {output}")
         else:
@@ -0,0 +1,126 @@
+"""
+Checkpoints del análisis de video
+
+Cada checkpoint guarda lo necesario para continuar un análisis largo
+sin repetir lo ya procesado: último frame, contadores, frames con
+violación, resúmenes por segundo/minuto, offsets del export (incluido el
+evento de violación abierto) y el segmento de video anotado en curso.
+
+============================================
+ARCHIVOS (en el directorio del video anotado):
+============================================
+<video>.checkpoint.npz          Estado (JSON) + arrays
+<video>_analyzed.partNNNN.mp4   Segmentos anotados, uno por checkpoint
+<video>_analyzed.mp4            Unión de los segmentos al terminar
+============================================
+Un MP4 sin cerrar no es legible, por eso el video anotado se rota en
+cada checkpoint: los segmentos anteriores siempre quedan completos.
+"""
+import json
+import os
+import shutil
+import subprocess
+
+import cv2
+import numpy as np
+
+from records import FRAME_DTYPE
+
+
+# Incrementar si cambia el contenido del checkpoint
+CHECKPOINT_VERSION = 1
+
+
+def checkpoint_path(output_dir, video_name):
+    return os.path.join(output_dir, f"{video_name}.checkpoint.npz")
+
+
+def segment_path(output_dir, video_name, segment):
+    return os.path.join(output_dir, f"{video_name}_analyzed.part{segment:04d}.mp4")
+
+
+def save_checkpoint(path, state, violations, rollup_arrays):
+    """
+    Guarda el checkpoint de forma atómica (tmp + rename)
+
+    Args:
+        state: Dict serializable a JSON (frame, contadores, segmento, export)
+        violations: Array estructurado FRAME_DTYPE
+        rollup_arrays: ComplianceRollup.arrays()
+    """
+    tmp = path + '.tmp'
+    with open(tmp, 'wb') as f:
+        np.savez(
+            f,
+            state=np.array(json.dumps({'version': CHECKPOINT_VERSION, **state})),
+            violations=violations,
+            **{f"rollup_{key}": value for key, value in rollup_arrays.items()}
+        )
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, path)
+    return path
+
+
+def load_checkpoint(path):
+    """
+    Lee un checkpoint
+
+    Returns:
+        tuple | None: (state, violations, rollup_arrays), o None si no existe
+        o es de otra versión
+    """
+    if not os.path.exists(path):
+        return None
+    with np.load(path, allow_pickle=False) as data:
+        state = json.loads(str(data['state']))
+        if state.get('version') != CHECKPOINT_VERSION:
+            return None
+        violations = data['violations'].astype(FRAME_DTYPE)
+        rollup_arrays = {key[len('rollup_'):]: data[key] for key in data.files if key.startswith('rollup_')}
+    return state, violations, rollup_arrays
+
+
+def merge_segments(segments, output_path, fps, size):
+    """
+    Une los segmentos anotados en un solo video
+
+    Con ffmpeg se concatenan sin recodificar; si no está disponible se
+    reescriben con OpenCV.
+
+    Returns:
+        bool: True si el video final se escribió
+    """
+    segments = [s for s in segments if os.path.exists(s)]
+    if not segments:
+        return False
+
+    if shutil.which('ffmpeg'):
+        list_path = output_path + '.segments.txt'
+        with open(list_path, 'w', encoding='utf-8') as f:
+            for segment in segments:
+                f.write(f"file '{os.path.abspath(segment)}'\n")
+        try:
+            done = subprocess.run(
+                ['ffmpeg', '-nostdin', '-loglevel', 'error', '-y', '-f', 'concat', '-safe', '0',
+                 '-i', list_path, '-c', 'copy', output_path],
+                stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+            ).returncode == 0
+        finally:
+            os.remove(list_path)
+        if done:
+            return True
+
+    out = cv2.VideoWriter(output_path, cv2.VideoWriter_fourcc(*'mp4v'), fps, size)
+    if not out.isOpened():
+        return False
+    for segment in segments:
+        cap = cv2.VideoCapture(segment)
+        while True:
+            ret, frame = cap.read()
+            if not ret:
+                break
+            out.write(frame)
+        cap.release()
+    out.release()
+    return True
@@ -0,0 +1,447 @@
+import multiprocessing
+import queue
+import shutil
+import subprocess
+import threading
+
+import cv2
+import numpy as np
+
+from shared_frames import END, FAILED, FRAME, SharedFrameRing
+
+
+# ============================================
+# DECODIFICADORES DE VIDEO
+# ============================================
+# Todos exponen la misma interfaz que usa VideoEPPAnalyzer:
+#   fps, frame_count, width, height (tamaño de salida), index (frame de
+#   origen, base 1, del último frame leído), isOpened(), read(), release()
+# `stride` > 1 entrega solo uno de cada N frames; los descartados no se
+# convierten ni se escalan (grab sin retrieve). ThreadedDecoder y
+# ProcessDecoder envuelven a cualquiera de ellos (hilo / proceso aparte).
+BACKENDS = ('opencv', 'pyav', 'ffmpeg')
+
+
+def output_size(src_width, src_height, width=None):
+    """Tamaño de salida manteniendo la proporción (lados pares, sin ampliar)"""
+    if not width or width >= src_width:
+        return src_width, src_height
+    height = max(2, int(round(src_height * width / src_width / 2)) * 2)
+    return width - width % 2, height
+
+
+class VideoDecoder:
+    """Base común: muestreo por stride y contador de frames de origen"""
+
+    def __init__(self, stride=1):
+        self.stride = max(1, int(stride))
+        self.index = 0
+        self.fps = 0
+        self.frame_count = 0
+        self.src_width = self.src_height = 0
+        self.width = self.height = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.release()
+        return False
+
+    def grab(self):
+        """Avanza un frame sin convertirlo"""
+        raise NotImplementedError
+
+    def _read(self):
+        raise NotImplementedError
+
+    def read(self):
+        """
+        Siguiente frame muestreado
+
+        Returns:
+            tuple: (ok, frame BGR uint8 de width x height)
+        """
+        for _ in range(self.stride - 1 if self.index else 0):
+            if not self.grab():
+                return False, None
+            self.index += 1
+
+        ok, frame = self._read()
+        if ok:
+            self.index += 1
+        return ok, frame
+
+    def isOpened(self):
+        raise NotImplementedError
+
+    def release(self):
+        pass
+
+
+class OpenCVDecoder(VideoDecoder):
+    """cv2.VideoCapture con hilos de FFmpeg y reescalado tras decodificar"""
+
+    def __init__(self, path, width=None, threads=0, stride=1, start=0):
+        super().__init__(stride)
+        self.cap = cv2.VideoCapture(path)
+        if threads and hasattr(cv2, 'CAP_PROP_N_THREADS'):
+            self.cap.set(cv2.CAP_PROP_N_THREADS, threads)
+        if start:
+            self.cap.set(cv2.CAP_PROP_POS_FRAMES, start)
+            self.index = start
+
+        self.fps = self.cap.get(cv2.CAP_PROP_FPS)
+        self.frame_count = int(self.cap.get(cv2.CAP_PROP_FRAME_COUNT))
+        self.src_width = int(self.cap.get(cv2.CAP_PROP_FRAME_WIDTH))
+        self.src_height = int(self.cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
+        self.width, self.height = output_size(self.src_width, self.src_height, width)
+
+    def isOpened(self):
+        return self.cap.isOpened()
+
+    def grab(self):
+        return self.cap.grab()
+
+    def _read(self):
+        ok, frame = self.cap.read()
+        if ok and (self.width, self.height) != (self.src_width, self.src_height):
+            frame = cv2.resize(frame, (self.width, self.height), interpolation=cv2.INTER_AREA)
+        return ok, frame
+
+    def release(self):
+        self.cap.release()
+
+
+class PyAVDecoder(VideoDecoder):
+    """PyAV (libav) con decodificación multihilo y escalado en la conversión a BGR"""
+
+    def __init__(self, path, width=None, threads=0, stride=1, start=0):
+        super().__init__(stride)
+        import av
+
+        try:
+            self.container = av.open(path)
+        except Exception:
+            # Mismo comportamiento que VideoCapture: isOpened() == False
+            self.container = None
+            return
+        stream = self.container.streams.video[0]
+        stream.thread_type = 'AUTO'
+        if threads:
+            stream.codec_context.thread_count = threads
+
+        self.fps = float(stream.average_rate or 0)
+        self.frame_count = stream.frames
+        self.src_width = stream.codec_context.width
+        self.src_height = stream.codec_context.height
+        self.width, self.height = output_size(self.src_width, self.src_height, width)
+        self._frames = self.container.decode(stream)
+        # Sin búsqueda por índice exacta: se descartan los frames ya analizados
+        while self.index < start and self.grab():
+            self.index += 1
+
+    def isOpened(self):
+        return self.container is not None
+
+    def grab(self):
+        return next(self._frames, None) is not None
+
+    def _read(self):
+        frame = next(self._frames, None)
+        if frame is None:
+            return False, None
+        return True, frame.reformat(width=self.width, height=self.height, format='bgr24').to_ndarray()
+
+    def release(self):
+        if self.container is not None:
+            self.container.close()
+            self.container = None
+
+
+class FFmpegDecoder(VideoDecoder):
+    """
+    Proceso ffmpeg que entrega frames BGR crudos por un pipe
+
+    El escalado y el muestreo (filtro select) ocurren dentro de ffmpeg, así
+    que los frames descartados nunca se convierten ni cruzan el pipe.
+    """
+
+    def __init__(self, path, width=None, threads=0, stride=1, start=0):
+        super().__init__(stride)
+        self.proc = None
+        self.index = start
+
+        # Metadatos con OpenCV (evita depender de ffprobe)
+        probe = cv2.VideoCapture(path)
+        opened = probe.isOpened()
+        self.fps = probe.get(cv2.CAP_PROP_FPS)
+        self.frame_count = int(probe.get(cv2.CAP_PROP_FRAME_COUNT))
+        self.src_width = int(probe.get(cv2.CAP_PROP_FRAME_WIDTH))
+        self.src_height = int(probe.get(cv2.CAP_PROP_FRAME_HEIGHT))
+        probe.release()
+        if not opened or shutil.which('ffmpeg') is None:
+            return
+
+        self.width, self.height = output_size(self.src_width, self.src_height, width)
+        self._frame_bytes = self.width * self.height * 3
+
+        filters = []
+        if self.stride > 1:
+            filters.append(f"select=not(mod(n\\,{self.stride}))")
+        if (self.width, self.height) != (self.src_width, self.src_height):
+            filters.append(f"scale={self.width}:{self.height}:flags=area")
+
+        cmd = ['ffmpeg', '-nostdin', '-loglevel', 'error', '-threads', str(threads)]
+        if start and self.fps:
+            # Primer frame a entregar (base 0): el siguiente del muestreo tras `start`
+            cmd += ['-ss', f"{(start + self.stride - 1) / self.fps:.6f}"]
+        cmd += ['-i', path]
+        if filters:
+            cmd += ['-vf', ','.join(filters), '-vsync', '0']
+        cmd += ['-f', 'rawvideo', '-pix_fmt', 'bgr24', '-']
+        self.proc = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL,
+                                     bufsize=self._frame_bytes)
+
+    def isOpened(self):
+        return self.proc is not None
+
+    def read(self):
+        # El muestreo ya lo aplica ffmpeg
+        ok, frame = self._read()
+        if ok:
+            self.index += 1 if self.index == 0 else self.stride
+        return ok, frame
+
+    def _read(self):
+        buffer = bytearray(self._frame_bytes)
+        view = memoryview(buffer)
+        filled = 0
+        while filled < self._frame_bytes:
+            n = self.proc.stdout.readinto(view[filled:])
+            if not n:
+                return False, None
+            filled += n
+        return True, np.frombuffer(buffer, dtype=np.uint8).reshape(self.height, self.width, 3)
+
+    def release(self):
+        if self.proc is not None:
+            self.proc.stdout.close()
+            self.proc.terminate()
+            self.proc.wait()
+            self.proc = None
+
+
+class ThreadedDecoder:
+    """
+    Decodifica en un hilo aparte con una cola acotada, solapando la
+    decodificación con la inferencia del hilo principal
+    """
+
+    def __init__(self, decoder, prefetch=8):
+        self.decoder = decoder
+        self._queue = queue.Queue(maxsize=prefetch)
+        self._stop = threading.Event()
+        self.index = decoder.index
+        self._thread = threading.Thread(target=self._run, name='epp-decoder', daemon=True)
+        self._thread.start()
+
+    def __getattr__(self, name):
+        # fps, frame_count, width, height, isOpened... del decodificador real
+        return getattr(self.decoder, name)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.release()
+        return False
+
+    def _run(self):
+        while not self._stop.is_set():
+            ok, frame = self.decoder.read()
+            self._queue.put((ok, frame, self.decoder.index))
+            if not ok:
+                break
+
+    def read(self):
+        ok, frame, index = self._queue.get()
+        if ok:
+            self.index = index
+        else:
+            # Dejar el fin de stream para lecturas posteriores
+            self._queue.put((ok, frame, index))
+        return ok, frame
+
+    def release(self):
+        self._stop.set()
+        while self._thread.is_alive():
+            try:
+                self._queue.get_nowait()
+            except queue.Empty:
+                pass
+            self._thread.join(timeout=0.05)
+        self.decoder.release()
+
+
+class ProcessDecoder:
+    """
+    Decodifica en un proceso aparte y entrega los frames por memoria
+    compartida (SharedFrameRing), sin serializarlos con pickle
+
+    El frame devuelto por read() es una vista sobre su ranura del anillo;
+    sigue siendo válido hasta la siguiente llamada a read().
+    """
+
+    def __init__(self, path, backend='opencv', width=None, threads=0, stride=1, slots=8, start=0):
+        self.stride = max(1, int(stride))
+        self.index = start
+        self.ring = None
+        self._proc = None
+        self._slot = None
+        self._ended = False
+
+        # Metadatos en el padre: el tamaño de las ranuras se fija antes de arrancar el hijo
+        probe = cv2.VideoCapture(path)
+        opened = probe.isOpened()
+        self.fps = probe.get(cv2.CAP_PROP_FPS)
+        self.frame_count = int(probe.get(cv2.CAP_PROP_FRAME_COUNT))
+        self.src_width = int(probe.get(cv2.CAP_PROP_FRAME_WIDTH))
+        self.src_height = int(probe.get(cv2.CAP_PROP_FRAME_HEIGHT))
+        probe.release()
+        self.width, self.height = output_size(self.src_width, self.src_height, width)
+        if not opened:
+            return
+
+        # spawn: el hijo no hereda hilos de OpenCV/torch del padre
+        ctx = multiprocessing.get_context('spawn')
+        self.ring = SharedFrameRing(max(2, slots), (self.height, self.width, 3), ctx)
+        self._stop = ctx.Event()
+        self._proc = ctx.Process(
+            target=_decode_into_ring,
+            args=(self.ring, path, backend, width, threads, self.stride, start, self._stop),
+            name='epp-decoder',
+            daemon=True
+        )
+        self._proc.start()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.release()
+        return False
+
+    def isOpened(self):
+        return self._proc is not None
+
+    def read(self):
+        # La ranura del frame anterior vuelve al decodificador
+        if self._slot is not None:
+            self.ring.release(self._slot)
+            self._slot = None
+        if self._ended or self._proc is None:
+            return False, None
+
+        item = self.ring.acquire_read(alive=self._proc.is_alive)
+        if item is None:
+            self._ended = True
+            return False, None
+        slot, index, status = item
+        if status != FRAME:
+            self.ring.release(slot)
+            self._ended = True
+            return False, None
+
+        self._slot = slot
+        self.index = index
+        return True, self.ring.frames[slot]
+
+    def release(self):
+        if self._proc is None:
+            return
+        self._stop.set()
+        if self._slot is not None:
+            self.ring.release(self._slot)
+            self._slot = None
+        self._proc.join(timeout=5)
+        if self._proc.is_alive():
+            self._proc.terminate()
+            self._proc.join()
+        self._proc = None
+        self.ring.close()
+
+
+def _decode_into_ring(ring, path, backend, width, threads, stride, start, stop):
+    """Proceso decodificador: llena las ranuras del anillo en orden"""
+    decoder = open_decoder(path, backend=backend, width=width, threads=threads, stride=stride, start=start)
+    status = END
+    try:
+        if not decoder.isOpened():
+            status = FAILED
+            return
+        h, w = ring.shape[:2]
+        while not stop.is_set():
+            ok, frame = decoder.read()
+            if not ok:
+                break
+            slot = ring.acquire_write(stop)
+            if slot is None:
+                return
+            if frame.shape[:2] == (h, w):
+                ring.frames[slot] = frame
+            else:
+                cv2.resize(frame, (w, h), dst=ring.frames[slot], interpolation=cv2.INTER_AREA)
+            ring.commit(slot, decoder.index)
+    except Exception:
+        status = FAILED
+        raise
+    finally:
+        decoder.release()
+        if not stop.is_set():
+            ring.finish(status, stop)
+        ring.close()
+
+
+def open_decoder(path, backend='opencv', width=None, threads=0, stride=1, prefetch=0, process=False, start=0):
+    """
+    Abre un video con el decodificador indicado
+
+    Args:
+        path: Ruta del video
+        backend: 'opencv', 'pyav', 'ffmpeg' o 'auto' (ffmpeg > pyav > opencv)
+        width: Ancho de salida (None = resolución original)
+        threads: Hilos de decodificación (0 = automático)
+        stride: Entregar uno de cada N frames
+        prefetch: Frames a decodificar por adelantado en otro hilo (0 = sin hilo)
+        process: Decodificar en otro proceso (ranuras de memoria compartida;
+            prefetch fija el número de ranuras)
+        start: Frames ya analizados (índice base 1 del último); la lectura
+            continúa con el siguiente frame del muestreo
+
+    Returns:
+        VideoDecoder | ThreadedDecoder | ProcessDecoder
+    """
+    if backend == 'auto':
+        backend = 'opencv'
+        if shutil.which('ffmpeg'):
+            backend = 'ffmpeg'
+        else:
+            try:
+                import av  # noqa: F401
+                backend = 'pyav'
+            except ImportError:
+                pass
+
+    if backend not in BACKENDS:
+        raise ValueError(f"Backend desconocido: {backend} (opciones: {BACKENDS + ('auto',)})")
+
+    if process:
+        return ProcessDecoder(path, backend=backend, width=width, threads=threads, stride=stride,
+                              slots=prefetch or 8, start=start)
+
+    decoder_class = {'opencv': OpenCVDecoder, 'pyav': PyAVDecoder, 'ffmpeg': FFmpegDecoder}[backend]
+    decoder = decoder_class(path, width=width, threads=threads, stride=stride, start=start)
+    if prefetch and decoder.isOpened():
+        return ThreadedDecoder(decoder, prefetch=prefetch)
+    return decoder
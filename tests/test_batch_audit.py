@@ -0,0 +1,78 @@
+"""
+Nombres de salida estables entre ejecuciones (batch_audit + manifiesto)
+"""
+import os
+
+import pytest
+
+from audit_manifest import AuditManifest
+from batch_audit import output_names
+
+
+VERSION = {'model': 'best.pt', 'conf': 0.25}
+
+
+@pytest.fixture
+def inputs(tmp_path):
+    def make(*names):
+        paths = []
+        for name in names:
+            path = tmp_path / name
+            path.parent.mkdir(parents=True, exist_ok=True)
+            path.write_bytes(name.encode())
+            paths.append(str(path))
+        return sorted(paths)
+    return make
+
+
+def _run(manifest, paths):
+    """Una ejecución: nombres con lo reservado y registro de lo pendiente"""
+    names = output_names(paths, reserved=manifest.names())
+    for path in manifest.pending(paths):
+        manifest.update(path, [names[path] + '.json'], name=names[path])
+    manifest.save()
+    return names
+
+
+def test_unique_stems_keep_plain_names(inputs):
+    a, b = inputs('camA/x.jpg', 'camA/y.jpg')
+    assert output_names([a, b]) == {a: 'x', b: 'y'}
+
+
+def test_colliding_stems_do_not_depend_on_order(inputs):
+    a, b = inputs('camA/clip.mp4', 'camB/clip.mp4')
+    names = output_names([a, b])
+    assert names[a] != names[b]
+    assert output_names([b, a]) == names
+    assert all(n.startswith('clip_') for n in names.values())
+
+
+def test_names_stable_when_new_file_sorts_earlier(tmp_path, inputs):
+    manifest_path = str(tmp_path / 'manifest.json')
+    (b,) = inputs('camB/x.jpg')
+    first = _run(AuditManifest(manifest_path, VERSION), [b])
+    assert first[b] == 'x'
+
+    # Un archivo nuevo con el mismo stem que se ordena antes
+    (a,) = inputs('camA/x.jpg')
+    manifest = AuditManifest(manifest_path, VERSION)
+    assert manifest.pending([a, b]) == [a]
+    second = _run(manifest, [a, b])
+    assert second[b] == 'x'
+    assert second[a] not in ('x', 'x_1')
+
+    # Tercera ejecución: nada cambia
+    third = _run(AuditManifest(manifest_path, VERSION), [a, b])
+    assert third == second
+
+
+def test_reanalyzed_file_keeps_its_name(tmp_path, inputs):
+    manifest_path = str(tmp_path / 'manifest.json')
+    a, b = inputs('camA/x.jpg', 'camB/x.jpg')
+    first = _run(AuditManifest(manifest_path, VERSION), [a, b])
+
+    # Cambia la versión del análisis: todo se reanaliza con los mismos nombres
+    manifest = AuditManifest(manifest_path, {**VERSION, 'conf': 0.5})
+    assert manifest.pending([a, b]) == [a, b]
+    assert _run(manifest, [a, b]) == first
+    assert sorted(os.path.basename(p) for p in manifest.entries) == ['x.jpg', 'x.jpg']
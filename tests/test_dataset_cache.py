@@ -0,0 +1,73 @@
+"""
+Invalidación del cache pre-decodificado (imágenes y etiquetas)
+"""
+import os
+
+import cv2
+import numpy as np
+import pytest
+
+from dataset_cache import build_cache, open_cache
+
+
+@pytest.fixture
+def split(tmp_path):
+    images = tmp_path / 'images' / 'val'
+    labels = tmp_path / 'labels' / 'val'
+    images.mkdir(parents=True)
+    labels.mkdir(parents=True)
+    for i in range(3):
+        cv2.imwrite(str(images / f"img{i}.jpg"), np.full((48, 64, 3), 40 * i, dtype=np.uint8))
+        (labels / f"img{i}.txt").write_text(f"6 0.5 0.5 0.2 0.{i + 1}\n")
+    return str(images), str(labels), str(tmp_path / 'cache')
+
+
+def _touch_later(path):
+    stat = os.stat(path)
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+
+
+def test_fresh_cache_is_not_stale(split):
+    images, _, cache_dir = split
+    cache = build_cache(images, cache_dir, imgsz=64)
+    assert not cache.is_stale()
+    np.testing.assert_allclose(cache.labels(1), [[6, 0.5, 0.5, 0.2, 0.2]])
+
+
+@pytest.mark.parametrize('use_hash', [False, True])
+def test_label_edit_invalidates(split, use_hash):
+    images, labels, cache_dir = split
+    build_cache(images, cache_dir, imgsz=64, use_hash=use_hash)
+
+    path = os.path.join(labels, 'img1.txt')
+    with open(path, 'a') as f:
+        f.write("0 0.5 0.3 0.1 0.1\n")
+    _touch_later(path)
+
+    cache = open_cache(images, cache_dir, imgsz=64, use_hash=use_hash)
+    assert len(cache.labels(1)) == 2
+    assert not cache.is_stale()
+
+
+def test_label_added_or_removed_invalidates(split):
+    images, labels, cache_dir = split
+    os.remove(os.path.join(labels, 'img2.txt'))
+    cache = build_cache(images, cache_dir, imgsz=64)
+    assert len(cache.labels(2)) == 0
+
+    with open(os.path.join(labels, 'img2.txt'), 'w') as f:
+        f.write("6 0.5 0.5 0.2 0.2\n")
+    assert cache.is_stale()
+
+    os.remove(os.path.join(labels, 'img0.txt'))
+    cache = open_cache(images, cache_dir, imgsz=64)
+    assert len(cache.labels(0)) == 0 and len(cache.labels(2)) == 1
+
+
+def test_image_edit_invalidates(split):
+    images, _, cache_dir = split
+    cache = build_cache(images, cache_dir, imgsz=64)
+    path = os.path.join(images, 'img0.jpg')
+    cv2.imwrite(path, np.full((48, 64, 3), 200, dtype=np.uint8))
+    _touch_later(path)
+    assert cache.is_stale()
@@ -0,0 +1,152 @@
+"""
+Descarga reanudable y extracción en streaming contra un servidor HTTP local
+"""
+import hashlib
+import io
+import os
+import threading
+import zipfile
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from download_ppe import StreamingZipExtractor, download
+
+
+FILES = {
+    'construction-ppe/images/val/a.jpg': os.urandom(50_000),
+    'construction-ppe/labels/val/a.txt': b'6 0.5 0.5 0.2 0.4\n' * 200,
+    'construction-ppe/README.md': b'dataset de prueba\n',
+}
+
+
+class _Unseekable(io.RawIOBase):
+    """Destino no posicionable: zipfile escribe data descriptors"""
+
+    def __init__(self):
+        self.data = bytearray()
+
+    def writable(self):
+        return True
+
+    def write(self, b):
+        self.data.extend(b)
+        return len(b)
+
+
+def make_zip(descriptors=False):
+    target = _Unseekable() if descriptors else io.BytesIO()
+    with zipfile.ZipFile(target, 'w') as zf:
+        for name, data in FILES.items():
+            method = zipfile.ZIP_STORED if name.endswith('.md') and not descriptors else zipfile.ZIP_DEFLATED
+            zf.writestr(name, data, compress_type=method)
+    return bytes(target.data) if descriptors else target.getvalue()
+
+
+@pytest.fixture
+def server():
+    """Servidor con Range opcional; registra las cabeceras Range recibidas"""
+
+    class Handler(BaseHTTPRequestHandler):
+        payload = b''
+        ranges = True
+        requested = []
+
+        def do_GET(self):
+            header = self.headers.get('Range')
+            Handler.requested.append(header)
+            body, status = Handler.payload, 200
+            if header and Handler.ranges:
+                start = int(header.split('=')[1].rstrip('-'))
+                if start >= len(body):
+                    self.send_error(416)
+                    return
+                body, status = body[start:], 206
+            self.send_response(status)
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    httpd = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+    threading.Thread(target=httpd.serve_forever, daemon=True).start()
+    Handler.url = f"http://127.0.0.1:{httpd.server_port}/construction-ppe.zip"
+    yield Handler
+    httpd.shutdown()
+    httpd.server_close()
+
+
+def assert_extracted(dest):
+    for name, data in FILES.items():
+        with open(os.path.join(dest, name), 'rb') as f:
+            assert f.read() == data
+    assert not os.path.exists(os.path.normpath(dest) + '.partial')
+
+
+@pytest.mark.parametrize('descriptors', [False, True])
+def test_streaming_extractor(tmp_path, descriptors):
+    payload = make_zip(descriptors)
+    extractor = StreamingZipExtractor(tmp_path / 'out')
+    for i in range(0, len(payload), 777):
+        extractor.feed(payload[i:i + 777])
+    assert extractor.done and not extractor.failed
+    assert extractor.files == len(FILES)
+    assert_extracted(tmp_path / 'out')
+
+
+def test_resume_with_range(server, tmp_path):
+    server.payload = make_zip()
+    zip_path, dest = str(tmp_path / 'ppe.zip'), str(tmp_path / 'datasets')
+    with open(zip_path + '.part', 'wb') as f:
+        f.write(server.payload[:len(server.payload) // 2])
+
+    sha = hashlib.sha256(server.payload).hexdigest()
+    path, computed, extractor = download(server.url, zip_path, sha256=sha, extract_to=dest, chunk_size=4096)
+
+    assert server.requested == [f"bytes={len(server.payload) // 2}-"]
+    assert computed == sha and extractor.files == len(FILES)
+    with open(path, 'rb') as f:
+        assert f.read() == server.payload
+    assert_extracted(dest)
+
+
+def test_range_ignored(server, tmp_path):
+    server.payload = make_zip(descriptors=True)
+    server.ranges = False
+    zip_path, dest = str(tmp_path / 'ppe.zip'), str(tmp_path / 'datasets')
+    # .part con basura: el servidor responde 200 y se descarga desde cero
+    with open(zip_path + '.part', 'wb') as f:
+        f.write(b'x' * 1000)
+
+    path, computed, _ = download(server.url, zip_path, extract_to=dest, chunk_size=4096)
+
+    assert computed == hashlib.sha256(server.payload).hexdigest()
+    with open(path, 'rb') as f:
+        assert f.read() == server.payload
+    assert_extracted(dest)
+
+
+def test_already_complete(server, tmp_path):
+    server.payload = make_zip()
+    zip_path, dest = str(tmp_path / 'ppe.zip'), str(tmp_path / 'datasets')
+    with open(zip_path + '.part', 'wb') as f:
+        f.write(server.payload)
+
+    _, computed, _ = download(server.url, zip_path, extract_to=dest)
+
+    assert computed == hashlib.sha256(server.payload).hexdigest()
+    assert_extracted(dest)
+
+
+def test_bad_checksum(server, tmp_path):
+    server.payload = make_zip()
+    zip_path, dest = str(tmp_path / 'ppe.zip'), str(tmp_path / 'datasets')
+
+    with pytest.raises(ValueError, match='Checksum'):
+        download(server.url, zip_path, sha256='0' * 64, extract_to=dest)
+
+    assert not os.path.exists(dest)
+    assert not os.path.exists(dest + '.partial')
+    assert not os.path.exists(zip_path) and not os.path.exists(zip_path + '.part')
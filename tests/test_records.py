@@ -0,0 +1,80 @@
+"""
+Vistas tipo dict de PersonRecords / FrameRecords (contrato de Mapping)
+"""
+import pickle
+
+import numpy as np
+import pytest
+
+from records import BOOTS, GLOVES, GOGGLES, HELMET, REQUIRED, VEST, FrameRecords, PersonRecords
+
+
+@pytest.fixture
+def persons():
+    return PersonRecords.build(
+        present=[REQUIRED, HELMET | VEST | BOOTS],
+        confidences=[0.9, 0.6],
+        bboxes=[[0, 0, 10, 20], [5, 5, 15, 30]],
+        zones=[0b01, 0b10],
+        zone_names=('andamio', 'pasillo'),
+    )
+
+
+@pytest.fixture
+def frames():
+    records = FrameRecords(capacity=1)
+    records.append(frame=10, time=0.4, persons=2, helmets=2, vests=1, gloves=0, goggles=2, boots=0)
+    records.append(frame=11, time=0.44, persons=1)
+    return records
+
+
+def test_person_view_behaves_like_dict(persons):
+    first, second = persons
+    assert first['complies'] and not second['complies']
+    assert second['has_helmet'] and second['has_boots'] and not second['has_gloves']
+    assert second['missing_items'] == ['guantes', 'gafas']
+    assert first['zones'] == ['andamio'] and second['zones'] == ['pasillo']
+    assert second['person_id'] == 2 and second['confidence'] == pytest.approx(0.6)
+    assert {**first}.keys() == set(first.keys())
+    assert persons.compliant.tolist() == [True, False]
+
+
+@pytest.mark.parametrize('key', ['color', 'has_hat', 'has_', 3, None, ('bbox',)])
+def test_person_view_missing_keys(persons, key):
+    view = persons[0]
+    assert view.get(key) is None
+    assert view.get(key, 'x') == 'x'
+    assert key not in view
+    with pytest.raises(KeyError):
+        view[key]
+
+
+def test_frame_view_behaves_like_dict(frames):
+    assert len(frames) == 2
+    assert dict(frames[0]) == {'frame': 10, 'time': pytest.approx(0.4), 'persons': 2, 'helmets': 2,
+                               'vests': 1, 'gloves': 0, 'goggles': 2, 'boots': 0}
+    assert frames[-1]['frame'] == 11 and frames[-1]['helmets'] == 0
+    assert isinstance(frames[0]['time'], float) and isinstance(frames[0]['persons'], int)
+
+
+@pytest.mark.parametrize('key', ['missing', 0, None, 'FRAME'])
+def test_frame_view_missing_keys(frames, key):
+    view = frames[0]
+    assert view.get(key) is None
+    assert key not in view
+    with pytest.raises(KeyError):
+        view[key]
+
+
+def test_frame_records_copy_and_pickle(frames):
+    copy = frames.copy()
+    frames.append(frame=12, time=0.48, persons=1)
+    assert len(copy) == 2 and len(frames) == 3
+    restored = pickle.loads(pickle.dumps(copy))
+    assert np.array_equal(restored.data, copy.data)
+    assert [f['frame'] for f in restored] == [10, 11]
+
+
+def test_bits_are_distinct():
+    bits = [HELMET, VEST, GLOVES, GOGGLES, BOOTS]
+    assert len(set(bits)) == len(bits) and REQUIRED & BOOTS == 0